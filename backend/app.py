@@ -1,17 +1,48 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import BackgroundTasks, FastAPI, File, Form, Header, Request, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Union
+import asyncio
 import json
 import os
-import base64
 import shutil
+import tempfile
+import threading
+import uuid
+from functools import partial
+from . import archive
+from .catalog import PAGE_SIZE, Catalog, entry_from_archive, entry_from_record
+from .positions import MATCH_LIMIT, PositionIndex, archive_keys, record_keys
+from .explorer import OpeningExplorer
+from .executor import ExecutorBusy, ExecutorTimeout, LogicExecutor
+from .importer import ImportReport, import_pgn
+from .logic import analysis, record
+from .logic.analysis import MOVE_MAP_CACHE
 from .logic.game import Game
+from .logic.notation import NotationHandler
+from .protocol import ConnectionManager, init_message, move_delta, undo_delta
+from .bus import bus_from_env
+from . import metrics, profiling
+from .metrics import (ANALYZE_SECONDS, ARCHIVE_SECONDS, LEGAL_MOVES_SECONDS, MAKE_MOVE_SECONDS, REGISTRY,
+                      WS_MESSAGE_SECONDS)
+from .rooms import SWEEP_INTERVAL, RoomEvicted, RoomManager
+from .logic.board import Board
+from .logic.bitboard import BitBoard
 
 app = FastAPI()
 
+# 棋盘实现切换：CHESS_BOARD=bitboard 使用位棋盘，默认使用网格棋盘
+BOARD_CLS = BitBoard if os.environ.get("CHESS_BOARD", "grid") == "bitboard" else Board
+
+# 电脑走棋的搜索预算上限：客户端可指定 depth 或 time（秒），未指定 time 时按默认时间搜索。
+# 只给 depth 时同样限时：深层搜索可能耗时数小时，而执行器超时后不会中止仍在运行的计算
+AI_DEFAULT_TIME = 1.0
+AI_MAX_TIME = 10.0
+AI_MAX_DEPTH = 8
+AI_TIMEOUT_SLACK = 2.0 # 限时搜索的等待超时 = 搜索时间 + 余量
+
 # 允许跨域
 app.add_middleware(
     CORSMiddleware,
@@ -26,180 +57,626 @@ frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fronte
 app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 
 # 挂载存档目录以提供图片预览
-os.makedirs("saved_games", exist_ok=True)
-app.mount("/thumbnails", StaticFiles(directory="saved_games"), name="thumbnails")
+os.makedirs(archive.ARCHIVE_DIR, exist_ok=True)
+app.mount("/thumbnails", StaticFiles(directory=archive.ARCHIVE_DIR), name="thumbnails")
+
+# 存档索引：首次创建时从存档目录重建
+catalog = Catalog.from_env()
+if catalog.created:
+    catalog.rebuild()
+# 局面倒排索引：同样在首次创建时从存档目录重建
+positions = PositionIndex.from_env()
+if positions.created:
+    positions.rebuild()
+# 开局树：首次创建或统计深度改变时重建
+explorer = OpeningExplorer.from_env()
+if explorer.created or explorer.stale:
+    explorer.rebuild()
+
+# 房间管理：房间 ID -> 游戏实例与房间锁（房间内的操作在执行器线程中持锁运行，保证同一对局的修改串行）。
+# 空闲房间定期逐出到房间存储，重新连接时恢复；CHESS_ROOM_STORE=sqlite 时多个工作进程共享房间状态
+rooms = RoomManager.from_env(BOARD_CLS)
+
+# CPU 密集的对局逻辑交给执行器，避免单个复杂局面阻塞所有房间
+executor = LogicExecutor.from_env()
+# 按需剖析（CHESS_PROFILING=1 时开放 /admin/profile）：房间操作与走法表计算经它提交给执行器
+profiler = profiling.Profiler.from_env()
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    executor.shutdown()
 
-# 简单的房间管理：key 为房间 ID, value 为游戏实例
-games: Dict[str, Game] = {}
+async def sweep_rooms():
+    """周期性逐出没有连接的空闲房间；编码与写盘在线程中进行，不阻塞事件循环"""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            connected = set(manager.active_connections)
+            await asyncio.get_running_loop().run_in_executor(None, rooms.sweep, connected)
+        except Exception as e:
+            print(f"清理空闲房间失败: {e}")
+
+@app.on_event("startup")
+async def start_room_sweeper():
+    await bus.start(manager.broadcast)
+    asyncio.create_task(sweep_rooms())
 
-class SaveGameRequest(BaseModel):
-    filename: Optional[str] = ""
-    screenshot: Optional[str] = ""  # Base64 字符串
+@app.on_event("shutdown")
+async def close_bus():
+    await bus.close()
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+class RenameRequest(BaseModel):
+    name: str
 
-    async def connect(self, room_id: str, websocket: WebSocket):
-        await websocket.accept()
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-        self.active_connections[room_id].append(websocket)
+class AnalyzeBatchItem(BaseModel):
+    fen: str
+    squares: Union[List[List[int]], str] = "all"  # 坐标列表，或 "all" 表示行棋方全部棋子
 
-    def disconnect(self, room_id: str, websocket: WebSocket):
-        if room_id in self.active_connections:
-            self.active_connections[room_id].remove(websocket)
+class AnalyzeBatchRequest(BaseModel):
+    items: List[AnalyzeBatchItem]
 
-    async def broadcast(self, room_id: str, message: dict):
-        if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
-                await connection.send_text(json.dumps(message))
+class SanRequest(BaseModel):
+    fen: Optional[str] = None  # 缺省为标准初始局面
+    moves: List[str]           # UCI 坐标走法，如 "e2e4"、"e7e8q"
+
+# 单次批量分析的条目上限
+ANALYZE_BATCH_LIMIT = 500
+
+# PGN 批量导入：独立的进程池（CHESS_IMPORT_POOL=thread 可改用线程池），任务进度按 ID 查询
+IMPORT_WORKERS = int(os.environ.get("CHESS_IMPORT_WORKERS", "0")) or None
+IMPORT_POOL = os.environ.get("CHESS_IMPORT_POOL", "process")
+import_jobs: Dict[str, ImportReport] = {}
 
 manager = ConnectionManager()
+# 房间消息经广播总线发出：CHESS_BUS=unix 时同时送到其他工作进程的连接
+bus = bus_from_env()
+
+# 状态量只在 /metrics 被抓取时读取
+ROOM_EVENTS = ("created", "evicted", "rehydrated", "synced", "failed")
+REGISTRY.sampled("chess_rooms_live", "内存中的房间数", lambda: len(rooms.games))
+REGISTRY.sampled("chess_rooms_stored", "房间存储中的房间数", lambda: rooms.store.count())
+REGISTRY.sampled("chess_room_events_total", "房间新建/逐出/恢复/跨进程同步/恢复失败次数",
+                 lambda: {(event,): getattr(rooms, event) for event in ROOM_EVENTS}, ("event",), "counter")
+REGISTRY.sampled("chess_connections", "本进程的 WebSocket 连接数",
+                 lambda: sum(len(c) for c in manager.active_connections.values()))
+REGISTRY.sampled("chess_executor_pending", "执行器中排队与执行中的任务数", lambda: executor.pending)
+REGISTRY.sampled("chess_analysis_cache_lookups_total", "走法表缓存查询次数",
+                 lambda: {("hit",): MOVE_MAP_CACHE.hits, ("miss",): MOVE_MAP_CACHE.misses}, ("result",), "counter")
+REGISTRY.sampled("chess_analysis_cache_entries", "走法表缓存条目数", lambda: MOVE_MAP_CACHE.stats()["entries"])
 
 @app.get("/")
 def read_root():
     return FileResponse(os.path.join(frontend_path, "index.html"))
 
 @app.post("/archives/save/{room_id}")
-async def save_game(room_id: str, request: SaveGameRequest):
-    if room_id not in games:
+async def save_game(room_id: str, background: BackgroundTasks, filename: str = Form(""),
+                    screenshot: Optional[UploadFile] = File(None)):
+    """
+    multipart 表单：filename 与可选的 screenshot（PNG 文件）。截图由框架分块接收到临时文件，
+    对局数据写入并落盘后立即返回；局面索引、开局树与缩略图在响应之后的后台任务中完成。
+    """
+    if not rooms.exists(room_id):
         return {"error": "Room not found"}
-    
-    game = games[room_id]
-    save_name = request.filename if request.filename else room_id
-    
-    # 创建对局专属目录
-    game_dir = os.path.join("saved_games", save_name)
-    os.makedirs(game_dir, exist_ok=True)
-    
-    # 获取完整状态进行保存
-    state_dict = game.get_state_dict()
-    
-    # 保存 JSON
-    json_path = os.path.join(game_dir, "game_data.json")
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(state_dict, f, indent=2, ensure_ascii=False)
 
-    # 处理并保存截图
-    if request.screenshot:
-        try:
-            header, encoded = request.screenshot.split(",", 1)
-            img_data = base64.b64decode(encoded)
-            img_path = os.path.join(game_dir, "preview.png")
-            with open(img_path, "wb") as f:
-                f.write(img_data)
-        except Exception as e:
-            print(f"保存截图失败: {e}")
-    
+    # 文件名来自客户端，规范化为存档目录下的一级目录名
+    save_name = archive.safe_id(filename or room_id)
+    # 在房间锁内编码，避免与正在执行的落子交错（已逐出的房间先恢复）
+    try:
+        _, lock = await asyncio.get_running_loop().run_in_executor(None, rooms.open, room_id)
+        data = await profiler.run(room_key(room_id), executor, rooms.call, room_id, record.encode_game, lock=lock)
+    except ExecutorBusy:
+        return {"error": "服务器繁忙，请稍后重试"}
+    except ExecutorTimeout:
+        return {"error": "保存超时"}
+
+    upload = screenshot.file if screenshot is not None else None
+    try:
+        staged = await asyncio.get_running_loop().run_in_executor(None, persist_game, save_name, data, upload)
+    except OSError as e:
+        print(f"保存对局失败: {e}")
+        return {"error": f"保存失败: {e}"}
+
+    background.add_task(index_game, save_name, data)
+    if staged:
+        background.add_task(archive.write_preview, save_name, staged)
     return {"message": f"游戏已成功保存至目录 {save_name}"}
 
+def persist_game(game_id: str, data: bytes, upload) -> str | None:
+    """在线程中执行：原子写入并落盘对局记录、更新存档索引，暂存上传的截图并返回暂存路径"""
+    with ARCHIVE_SECONDS.time("save"):
+        archive.write_record(game_id, data)
+        catalog.upsert(entry_from_record(game_id, record.GameRecord(data)))
+    if upload is None:
+        return None
+    try:
+        return archive.stage_upload(game_id, upload)
+    except OSError as e:
+        print(f"保存截图失败: {e}")
+        return None
+
+def index_game(game_id: str, data: bytes):
+    """后台任务：重放一遍对局，更新局面索引与开局树"""
+    try:
+        with ARCHIVE_SECONDS.time("index"):
+            saved = record.GameRecord(data)
+            keys = record_keys(saved)
+            positions.add(game_id, keys)
+            explorer.add_many([explorer.game_item(game_id, keys, saved)])
+    except Exception as e:
+        print(f"更新局面索引失败: {e}")
+
 @app.get("/archives")
-def list_saved():
-    if not os.path.exists("saved_games"):
-        return {"games": []}
-    # 返回目录列表
-    dirs = [d for d in os.listdir("saved_games") if os.path.isdir(os.path.join("saved_games", d))]
-    return {"games": dirs}
+def list_saved(limit: int = PAGE_SIZE, cursor: Optional[str] = None, sort: str = "updated", order: str = "desc",
+               player: Optional[str] = None, white: Optional[str] = None, black: Optional[str] = None,
+               result: Optional[str] = None, status: Optional[str] = None, opening: Optional[str] = None,
+               min_plies: Optional[int] = None, max_plies: Optional[int] = None):
+    """
+    从索引分页列出存档（不访问存档目录）：{"games": [条目], "next_cursor": 下一页游标或 null}。
+    sort 为 updated / created / plies / id，order 为 asc / desc；opening 按前缀匹配，player 匹配任意一方。
+    """
+    try:
+        return catalog.query(limit, cursor, sort, order, player, white, black, result, status, opening, min_plies, max_plies)
+    except ValueError as e:
+        return {"error": str(e)}
+
+@app.get("/positions")
+def find_position(fen: str, limit: int = MATCH_LIMIT, cursor: Optional[str] = None):
+    """哪些存档在第几步到达了该局面：{"matches": [{"id", "ply"}], "next_cursor"}"""
+    try:
+        return positions.lookup(fen, limit, cursor)
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"无效的 FEN: {e}"}
+
+@app.get("/explorer")
+def explore_opening(fen: str = NotationHandler.DEFAULT_FEN):
+    """开局树中该局面的到达次数、胜/和/负与各后续走法统计"""
+    try:
+        return explorer.lookup(fen)
+    except Exception as e:
+        return {"error": f"无效的 FEN: {e}"}
+
+@app.post("/archives/import")
+async def import_archives(request: Request, prefix: Optional[str] = None):
+    """
+    批量导入：请求体为 PGN 文本（可含任意多局），先流式写入临时文件，再在后台由进程池重放并写入存档。
+    立即返回任务 ID，进度通过 GET /archives/import/{job_id} 查询。未指定前缀时以 import_<任务 ID> 为前缀。
+    """
+    fd, path = tempfile.mkstemp(suffix=".pgn")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+    except Exception as e:
+        os.remove(path)
+        return {"error": f"接收 PGN 失败: {e}"}
+
+    job_id = uuid.uuid4().hex[:12]
+    prefix = prefix or f"import_{job_id}"
+    report = ImportReport()
+    import_jobs[job_id] = report
+
+    def run():
+        try:
+            import_pgn(path, prefix, IMPORT_WORKERS, kind=IMPORT_POOL, board_cls=BOARD_CLS, report=report,
+                       catalog=catalog, positions=positions, explorer=explorer)
+        finally:
+            os.remove(path)
+
+    asyncio.get_running_loop().run_in_executor(None, run)
+    return {"job_id": job_id, "prefix": archive.safe_id(prefix)}
+
+@app.get("/archives/import/{job_id}")
+def import_status(job_id: str):
+    report = import_jobs.get(job_id)
+    if report is None:
+        return {"error": "未找到导入任务"}
+    return report.to_dict()
 
 @app.get("/archives/{game_id}")
 def load_game(game_id: str):
-    path = os.path.join("saved_games", game_id, "game_data.json")
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    if not archive.valid_id(game_id):
+        return {"error": "未找到存档"}, 404
+    with ARCHIVE_SECONDS.time("load"):
+        data = archive.read_archive(game_id)
+    if data is not None:
+        return data
     return {"error": "未找到存档"}, 404
 
+@app.get("/archives/{game_id}/export")
+def export_game(game_id: str):
+    """以 JSON 格式导出（与旧版 game_data.json 相同的结构）"""
+    if not archive.valid_id(game_id):
+        return {"error": "未找到存档"}, 404
+    with ARCHIVE_SECONDS.time("export"):
+        data = archive.read_archive(game_id)
+    if data is None:
+        return {"error": "未找到存档"}, 404
+    return Response(
+        json.dumps(data, indent=2, ensure_ascii=False),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{game_id}.json"'},
+    )
+
+@app.get("/archives/{game_id}/ply/{ply}")
+def load_ply(game_id: str, ply: int):
+    """只解码第 ply 步的局面，不重放整局"""
+    if not archive.valid_id(game_id):
+        return {"error": "未找到存档"}, 404
+    try:
+        with ARCHIVE_SECONDS.time("ply"):
+            data = archive.read_ply(game_id, ply)
+    except IndexError:
+        return {"error": "步数越界"}
+    if data is None:
+        return {"error": "未找到存档"}, 404
+    return data
+
+@app.post("/archives/{game_id}/rename")
+def rename_archive(game_id: str, request: RenameRequest):
+    if not archive.valid_id(game_id):
+        return {"error": "未找到对局存档"}, 404
+    new_id = archive.safe_id(request.name)
+    old_dir, new_dir = archive.archive_dir(game_id), archive.archive_dir(new_id)
+    if not os.path.isdir(old_dir):
+        return {"error": "未找到对局存档"}, 404
+    if new_id != game_id and os.path.exists(new_dir):
+        return {"error": f"存档 {new_id} 已存在"}
+    os.rename(old_dir, new_dir)
+    # 索引中没有该存档（如索引建立前手动放入的目录）时补录
+    if not catalog.rename(game_id, new_id):
+        entry = entry_from_archive(new_id)
+        if entry:
+            catalog.upsert(entry)
+    if not positions.rename(game_id, new_id):
+        keys = archive_keys(new_id)
+        if keys:
+            positions.add(new_id, keys)
+    if not explorer.rename(game_id, new_id):
+        item = explorer.archive_item(new_id)
+        if item:
+            explorer.add_many([item])
+    return {"message": f"存档已重命名为 {new_id}", "id": new_id}
+
 @app.delete("/archives/{game_id}")
 def delete_archive(game_id: str):
-    game_dir = os.path.join("saved_games", game_id)
+    if not archive.valid_id(game_id):
+        return {"error": "未找到对局存档"}, 404
+    game_dir = archive.archive_dir(game_id)
+    catalog.delete(game_id)
+    positions.remove(game_id)
+    explorer.remove(game_id)
     if os.path.exists(game_dir):
         shutil.rmtree(game_dir)
         return {"message": "对局存档及预览图已完整删除"}
     return {"error": "未找到对局存档"}, 404
 
+
+# --- 在执行器中持房间锁运行的操作，返回可直接序列化的结果 ---
+def room_state(game: Game):
+    return init_message(game)
+
+def room_piece_moves(game: Game, pos):
+    with LEGAL_MOVES_SECONDS.time("piece"):
+        moves = game.get_piece_legal_moves(pos)
+    return [{"end": m.end, "type": m.move_type.value} for m in moves]
+
+def room_make_move(game: Game, start, end, promo):
+    with MAKE_MOVE_SECONDS.time("player"):
+        success, msg = game.make_move(start, end, promo)
+    return success, msg, move_delta(game) if success else None
+
+def room_undo(game: Game):
+    success, msg = game.undo_move()
+    return success, msg, undo_delta(game) if success else None
+
+def room_reset(game: Game):
+    """新对局接续旧对局的版本号，旧对局迟到的增量消息会被客户端当作过期消息丢弃"""
+    new_game = Game(BOARD_CLS)
+    new_game.version = game.version + 1
+    return new_game, init_message(new_game)
+
+def room_search_input(game: Game):
+    """搜索所需的局面快照：(FEN, 已出现局面集合, 当前局面哈希)"""
+    return game.fen_history[-1], set(game.position_counts), game.board.hash
+
+def room_play_code(game: Game, code: int, position: int):
+    if game.board.hash != position:
+        return False, "局面已变化，请重新请求", None
+    with MAKE_MOVE_SECONDS.time("ai"):
+        success, msg = game.play_code(code)
+    return success, msg, move_delta(game) if success else None
+
+async def cached_move_map(fen: str) -> dict:
+    """
+    从进程级 LRU 缓存读取局面的走法表；未命中时交给执行器计算，结果写回本进程的缓存
+    （进程池模式下计算发生在子进程，因此由主进程负责写入）。
+    """
+    entry = MOVE_MAP_CACHE.get(fen)
+    if entry is None:
+        # 计时在执行器内完成，不含排队等待
+        entry, elapsed = await profiler.run("analyze", executor, metrics.timed, analysis.build_move_map, fen, BOARD_CLS)
+        LEGAL_MOVES_SECONDS.observe(elapsed, "move_map")
+        entry = MOVE_MAP_CACHE.put(fen, entry)
+    return entry
+
 @app.post("/analyze")
 async def analyze_position(data: dict):
-    # 使用 Game 提供的静态分析工具，避免初始化整个 Game 实例
-    moves = Game.get_moves_for_fen(data['fen'], tuple(data['pos']))
+    with ANALYZE_SECONDS.time("analyze"):
+        return await _analyze_position(data)
+
+async def _analyze_position(data: dict):
+    # 走法表按 FEN 缓存，复盘时反复查看同一局面无需重新生成
+    try:
+        entry = await cached_move_map(data['fen'])
+    except ExecutorBusy:
+        return {"error": "服务器繁忙，请稍后重试"}
+    except ExecutorTimeout:
+        return {"error": "分析超时"}
+    rows = len(data['fen'].split()[0].split("/"))
+    moves = analysis.select_moves(entry, [tuple(data['pos'])], rows)["moves"]
     return {
         "pos": data['pos'],
-        "moves": [{"end": m.end, "type": m.move_type.value} for m in moves]
+        "moves": [{"end": m["end"], "type": m["type"]} for entries in moves.values() for m in entries]
     }
 
+@app.get("/rooms/stats")
+def room_stats():
+    """内存中的房间数、磁盘上已逐出的房间数，以及新建/逐出/恢复计数"""
+    return {**rooms.stats(), "connections": sum(len(c) for c in manager.active_connections.values()),
+            "bus": {"kind": type(bus).__name__, "published": getattr(bus, "published", 0),
+                    "received": getattr(bus, "received", 0)}}
+
+@app.get("/metrics")
+def export_metrics():
+    """Prometheus 文本格式的计数器与直方图"""
+    return Response(REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+def admin_error(token: Optional[str]):
+    error = profiler.authorize(token)
+    return {"error": error} if error else None
+
+@app.get("/admin/profile")
+def profile_status(x_admin_token: Optional[str] = Header(None)):
+    """进行中的剖析会话与最近写出的结果文件"""
+    return admin_error(x_admin_token) or profiler.status()
+
+def start_profile(key: str, mode: str, calls: Optional[int], seconds: Optional[float]):
+    try:
+        return profiler.start(key, mode, calls, seconds).to_dict()
+    except ValueError as e:
+        return {"error": str(e)}
+
+@app.post("/admin/profile/rooms/{room_id}")
+def profile_room(room_id: str, mode: str = "cprofile", calls: Optional[int] = None, seconds: Optional[float] = None,
+                 x_admin_token: Optional[str] = Header(None)):
+    """剖析该房间接下来的操作（落子、走法生成、搜索等），calls 次或 seconds 秒后写出结果"""
+    return admin_error(x_admin_token) or start_profile(room_key(room_id), mode, calls, seconds)
+
+@app.post("/admin/profile/rooms/{room_id}/stop")
+def stop_room_profile(room_id: str, x_admin_token: Optional[str] = Header(None)):
+    return admin_error(x_admin_token) or profiler.stop(room_key(room_id)) or {"error": "该房间没有进行中的剖析"}
+
+@app.post("/admin/profile/analyze")
+def profile_analyze(mode: str = "cprofile", calls: Optional[int] = None, seconds: Optional[float] = None,
+                    x_admin_token: Optional[str] = Header(None)):
+    """剖析接下来 calls 次走法表计算（/analyze 与 /analyze/batch 中未命中缓存的局面）"""
+    if error := admin_error(x_admin_token):
+        return error
+    if mode == "sample" and executor.kind == "process":
+        return {"error": "进程池模式下分析计算只支持 cprofile"}
+    return start_profile("analyze", mode, calls, seconds)
+
+@app.post("/admin/profile/analyze/stop")
+def stop_analyze_profile(x_admin_token: Optional[str] = Header(None)):
+    return admin_error(x_admin_token) or profiler.stop("analyze") or {"error": "没有进行中的分析剖析"}
+
+@app.post("/admin/profile/memory")
+async def profile_memory(room_id: Optional[str] = None, stop: bool = False,
+                         x_admin_token: Optional[str] = Header(None)):
+    """统计一个或全部内存中房间的棋盘、走法历史、FEN 历史占用，并写出 tracemalloc 快照；stop=true 时随后停止追踪"""
+    if error := admin_error(x_admin_token):
+        return error
+    room_ids = [room_id] if room_id else list(rooms.games)
+    reports = {}
+    for rid in room_ids:
+        lock = rooms.lock(rid)
+        if lock is None:
+            continue
+        try:
+            reports[rid] = await executor.run(rooms.call, rid, profiling.room_memory, lock=lock)
+        except RoomEvicted:
+            continue # 统计期间被逐出
+    if room_id and not reports:
+        return {"error": "房间不在内存中"}
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, profiler.memory, reports, stop)
+    except OSError as e:
+        print(f"写出内存报告失败: {e}")
+        return {"error": "写出内存报告失败"}
+
+@app.get("/analyze/cache")
+def analyze_cache_stats():
+    """走法表缓存的命中/未命中/淘汰计数，用于调整缓存大小"""
+    return MOVE_MAP_CACHE.stats()
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: AnalyzeBatchRequest):
+    """
+    批量分析：每个不同的 FEN 只取一次走法表（优先读缓存），
+    未命中的 FEN 作为独立任务交给执行器，返回顺序与请求条目一致。
+    """
+    with ANALYZE_SECONDS.time("batch"):
+        return await _analyze_batch(request)
+
+async def _analyze_batch(request: AnalyzeBatchRequest):
+    if len(request.items) > ANALYZE_BATCH_LIMIT:
+        return {"error": f"单次最多分析 {ANALYZE_BATCH_LIMIT} 个条目"}
+
+    fens = list(dict.fromkeys(item.fen for item in request.items))
+    try:
+        entries = dict(zip(fens, await asyncio.gather(*[cached_move_map(fen) for fen in fens])))
+    except ExecutorBusy:
+        return {"error": "服务器繁忙，请稍后重试"}
+    except ExecutorTimeout:
+        return {"error": "分析超时"}
+    except Exception as e:
+        return {"error": f"分析失败: {e}"}
+
+    items = []
+    for item in request.items:
+        squares = None if item.squares == "all" else [tuple(sq) for sq in item.squares]
+        rows = len(item.fen.split()[0].split("/"))
+        items.append(analysis.select_moves(entries[item.fen], squares, rows, item.fen))
+    return {"items": items}
+
+@app.post("/notation/san")
+async def moves_to_san(request: SanRequest):
+    """整局 UCI 走法批量转换为 SAN，逐步校验合法性"""
+    try:
+        sans = await executor.run(Game.moves_to_san, request.fen or NotationHandler.DEFAULT_FEN, request.moves, BOARD_CLS)
+    except ExecutorBusy:
+        return {"error": "服务器繁忙，请稍后重试"}
+    except ExecutorTimeout:
+        return {"error": "转换超时"}
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"san": sans}
+
+def room_key(room_id: str) -> str:
+    """房间在剖析器中的会话键"""
+    return f"room:{room_id}"
+
+WS_MESSAGE_TYPES = ("get_moves", "resync", "reset", "move", "ai_move", "undo")
+
 @app.websocket("/ws/{room_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str):
     await manager.connect(room_id, websocket)
-    
-    # 初始化或获取游戏
-    if room_id not in games:
-        games[room_id] = Game()
-    
-    # 发送当前状态
-    await websocket.send_text(json.dumps({
-        "type": "init",
-        "state": games[room_id].get_state_dict()
-    }))
-
     try:
+        # 初始化或获取游戏：已逐出的房间从磁盘重放恢复，放在线程中执行
+        _, lock = await open_room(room_id)
+
+        # 发送当前完整状态，之后只推送增量
+        await websocket.send_text(json.dumps(await profiler.run(room_key(room_id), executor, rooms.call, room_id,
+                                                                room_state, lock=lock)))
+
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            # 核心修复：每次操作都从全局 games 字典中动态获取实例。
-            # 否则当 reset 请求替换了字典里的对象时，此处闭包引用的仍是旧对象。
-            game = games.get(room_id)
-            if not game:
+            try:
+                message = json.loads(data)
+                kind = message.get("type")
+            except (ValueError, AttributeError):
+                await websocket.send_text(json.dumps({"type": "error", "message": "无效的消息"}))
                 continue
-
-            if message["type"] == "get_moves":
-                pos = tuple(message["pos"])
-                legal_moves = game.get_piece_legal_moves(pos)
-                moves_data = [{"end": m.end, "type": m.move_type.value} for m in legal_moves]
-                await websocket.send_text(json.dumps({
-                    "type": "piece_moves",
-                    "pos": pos,
-                    "moves": moves_data
-                }))
-            
-            elif message["type"] == "reset":
-                # 核心改进：通过 WebSocket 直接触发重置，确保指令序列同步
-                games[room_id] = Game()
-                await manager.broadcast(room_id, {
-                    "type": "init",
-                    "state": games[room_id].get_state_dict()
-                })
-
-            elif message["type"] == "move":
-                start = tuple(message["start"])
-                end = tuple(message["end"])
-                promo = message.get("promotion")
-                
-                success, msg = game.make_move(start, end, promo)
-                
-                if success:
-                    await manager.broadcast(room_id, {
-                        "type": "update",
-                        "state": game.get_state_dict(),
-                        "last_move": {"start": start, "end": end}
-                    })
-                else:
-                    await websocket.send_text(json.dumps({
-                        "type": "error",
-                        "message": msg
-                    }))
             
-            elif message["type"] == "undo":
-                success, msg = game.undo_move()
-                if success:
-                    await manager.broadcast(room_id, {
-                        "type": "update",
-                        "state": game.get_state_dict()
-                    })
-                else:
-                    await websocket.send_text(json.dumps({
-                        "type": "error",
-                        "message": msg
-                    }))
+            # 核心修复：每次操作都从房间表中动态获取实例。
+            # 否则当 reset 请求替换了房间里的对象时，此处闭包引用的仍是旧对象。
+            game = rooms.get(room_id)
+            if game is None:
+                # 有连接的房间一般不会被逐出，但清理线程取连接快照与本连接打开房间之间存在竞争
+                game, lock = await open_room(room_id)
+            rooms.touch(room_id)
+
+            try:
+                # 消息类型由客户端给出，未知类型归为一类，避免标签无限增长
+                with WS_MESSAGE_SECONDS.time(kind if kind in WS_MESSAGE_TYPES else "unknown"):
+                    try:
+                        await handle_message(websocket, room_id, game, lock, message)
+                    except RoomEvicted:
+                        # 取出与执行之间被逐出：逐出前的状态已写入存储，重新打开后重做这条消息
+                        game, lock = await open_room(room_id)
+                        await handle_message(websocket, room_id, game, lock, message)
+            except RoomEvicted:
+                await websocket.send_text(json.dumps({"type": "error", "message": "房间正在重新载入，请重试"}))
+            except ExecutorBusy:
+                await websocket.send_text(json.dumps({"type": "error", "message": "服务器繁忙，请稍后重试"}))
+            except ExecutorTimeout:
+                await websocket.send_text(json.dumps({"type": "error", "message": "计算超时"}))
+            except (KeyError, TypeError, ValueError) as e:
+                # 缺少字段或字段格式不对（如 pos 不是坐标）
+                await websocket.send_text(json.dumps({"type": "error", "message": f"无效的消息: {e}"}))
     except WebSocketDisconnect:
+        pass
+    finally:
+        # 任何原因结束（包括处理中的异常）都移除连接，否则该房间永远不会被逐出
         manager.disconnect(room_id, websocket)
+
+async def open_room(room_id: str) -> tuple[Game, threading.Lock]:
+    """取出房间（已逐出的从存储重放恢复），在线程中执行"""
+    return await asyncio.get_running_loop().run_in_executor(None, rooms.open, room_id)
+
+async def handle_message(websocket: WebSocket, room_id: str, game: Game, lock: threading.Lock, message: dict):
+    key = room_key(room_id)
+    if message["type"] == "get_moves":
+        pos = tuple(message["pos"])
+        moves_data = await profiler.run(key, executor, rooms.call, room_id, room_piece_moves, pos, lock=lock)
+        await websocket.send_text(json.dumps({
+            "type": "piece_moves",
+            "pos": pos,
+            "moves": moves_data
+        }))
+    
+    elif message["type"] == "resync":
+        # 客户端发现 seq 不连续：单独补发完整状态
+        await websocket.send_text(json.dumps(await profiler.run(key, executor, rooms.call, room_id, room_state, lock=lock)))
+
+    elif message["type"] == "reset":
+        # 核心改进：通过 WebSocket 直接触发重置，确保指令序列同步
+        init = await profiler.run(key, executor, rooms.reset, room_id, room_reset, lock=lock)
+        await bus.publish(room_id, init)
+
+    elif message["type"] == "move":
+        start = tuple(message["start"])
+        end = tuple(message["end"])
+        promo = message.get("promotion")
+        
+        success, msg, delta = await profiler.run(key, executor, partial(rooms.call, write=True), room_id, room_make_move,
+                                                 start, end, promo, lock=lock)
+        
+        if success:
+            await bus.publish(room_id, delta)
+        else:
+            await websocket.send_text(json.dumps({
+                "type": "error",
+                "message": msg
+            }))
+
+    elif message["type"] == "ai_move":
+        depth = message.get("depth")
+        time_limit = message.get("time")
+        depth = min(int(depth), AI_MAX_DEPTH) if depth else None
+        time_limit = min(float(time_limit or AI_DEFAULT_TIME), AI_MAX_TIME)
+        fen, seen, position = await profiler.run(key, executor, rooms.call, room_id, room_search_input, lock=lock)
+        # 搜索不持房间锁，在独立棋盘上进行（进程池模式下在子进程中执行）
+        timeout = time_limit + AI_TIMEOUT_SLACK
+        result = await profiler.run(key, executor, Game.search_fen, fen, depth, time_limit, seen, BOARD_CLS, timeout=timeout)
+        if result.code is None:
+            success, msg, update = False, "没有可走的棋", None
+        elif rooms.get(room_id) is not game:
+            success, msg, update = False, "局面已变化，请重新请求", None
+        else:
+            success, msg, update = await profiler.run(key, executor, partial(rooms.call, write=True), room_id, room_play_code,
+                                                      result.code, position, lock=lock)
+
+        if success:
+            await bus.publish(room_id, {
+                **update,
+                "ai": {"score": result.score, "depth": result.depth, "nodes": result.nodes,
+                       "time": round(result.elapsed, 3)}
+            })
+        else:
+            await websocket.send_text(json.dumps({
+                "type": "error",
+                "message": msg
+            }))
+    
+    elif message["type"] == "undo":
+        success, msg, delta = await profiler.run(key, executor, partial(rooms.call, write=True), room_id, room_undo, lock=lock)
+        if success:
+            await bus.publish(room_id, delta)
+        else:
+            await websocket.send_text(json.dumps({
+                "type": "error",
+                "message": msg
+            }))
@@ -0,0 +1,200 @@
+"""
+存档目录读写：saved_games/<id>/game.bin（二进制对局记录，见 logic/record.py）+ preview.png。
+旧版存档为 game_data.json，仍可读取；JSON 同时作为导出格式保留。
+所有文件都先写入同目录下的临时文件再原子替换，读取方不会看到写了一半的存档。
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import BinaryIO
+
+from .logic.record import GameRecord
+
+try:
+    from PIL import Image # 可选依赖：安装 Pillow 后预览图缩小为缩略图，否则原样保存上传的 PNG
+except ImportError:
+    Image = None
+
+ARCHIVE_DIR = "saved_games"
+# 存档目录经 /thumbnails 对外提供静态访问，SQLite 索引放在另一个目录
+INDEX_DIR = "saved_indexes"
+RECORD_FILE = "game.bin"
+DATA_FILE = "game_data.json"
+PREVIEW_FILE = "preview.png"
+# 预览图缩略图的最大边长（像素）
+THUMBNAIL_SIZE = int(os.environ.get("CHESS_THUMBNAIL_SIZE", "256"))
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+
+def valid_id(game_id: str) -> bool:
+    """存档 ID 只能是存档目录下的一级目录名（URL 中的 %2e%2e 等在路由参数里就是 ".."）"""
+    return game_id not in ("", ".", "..") and not any(sep in game_id for sep in ("/", "\\", "\0"))
+
+
+def archive_dir(game_id: str) -> str:
+    if not valid_id(game_id):
+        raise ValueError(f"无效的存档 ID: {game_id!r}")
+    return os.path.join(ARCHIVE_DIR, game_id)
+
+
+def index_path(filename: str) -> str:
+    """索引文件的默认路径；旧版放在存档目录下的同名索引（连同 WAL 文件）先移过来"""
+    path = os.path.join(INDEX_DIR, filename)
+    legacy = os.path.join(ARCHIVE_DIR, filename)
+    if os.path.exists(legacy) and not os.path.exists(path):
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(legacy + suffix):
+                os.replace(legacy + suffix, path + suffix)
+    return path
+
+
+def safe_id(name: str) -> str:
+    """把任意文本（如 PGN 标签）转换为可作为目录名的存档 ID"""
+    return re.sub(r'[^\w.-]+', '_', name).strip('._') or "game"
+
+
+def _temp_path(directory: str) -> str:
+    fd, path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    os.close(fd)
+    return path
+
+
+def _fsync_dir(directory: str):
+    # 目录项（rename 的结果）也需要落盘；不支持打开目录的平台上跳过
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, data: bytes, durable: bool = True):
+    """
+    写入临时文件后 os.replace 为目标文件。durable 为真时在替换前后分别 fsync 文件与目录，
+    函数返回即表示数据已落盘；批量导入等可重做的写入可以关闭以减少同步次数。
+    """
+    directory = os.path.dirname(path)
+    tmp = _temp_path(directory)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if durable:
+        _fsync_dir(directory)
+
+
+def claim_id(game_id: str) -> bool:
+    """新建空的存档目录；ID 已被占用时返回 False，不覆盖已有存档"""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    try:
+        os.mkdir(archive_dir(game_id))
+    except FileExistsError:
+        return False
+    return True
+
+
+def write_record(game_id: str, data: bytes, durable: bool = True):
+    """写入二进制对局记录（record.encode_game 的结果）"""
+    game_dir = archive_dir(game_id)
+    os.makedirs(game_dir, exist_ok=True)
+    atomic_write(os.path.join(game_dir, RECORD_FILE), data, durable)
+
+
+def write_archive(game_id: str, state: dict, indent: int | None = 2):
+    """以 JSON 格式写入（导出格式 / 旧版存档）"""
+    game_dir = archive_dir(game_id)
+    os.makedirs(game_dir, exist_ok=True)
+    atomic_write(os.path.join(game_dir, DATA_FILE), json.dumps(state, indent=indent, ensure_ascii=False).encode())
+
+
+def stage_upload(game_id: str, source: BinaryIO) -> str:
+    """把上传的截图复制到存档目录下的临时文件（分块复制，不整体读入内存），返回其路径"""
+    game_dir = archive_dir(game_id)
+    os.makedirs(game_dir, exist_ok=True)
+    path = _temp_path(game_dir)
+    try:
+        source.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(source, f)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def write_preview(game_id: str, staged: str):
+    """由暂存的截图生成预览图（有 Pillow 时缩小到 THUMBNAIL_SIZE），完成后删除暂存文件；在后台线程中调用"""
+    target = os.path.join(archive_dir(game_id), PREVIEW_FILE)
+    try:
+        if Image is not None:
+            with Image.open(staged) as img:
+                img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                tmp = _temp_path(os.path.dirname(target))
+                try:
+                    img.save(tmp, format="PNG", optimize=True)
+                    os.replace(tmp, target)
+                except BaseException:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+        else:
+            with open(staged, "rb") as f:
+                if f.read(len(PNG_MAGIC)) != PNG_MAGIC:
+                    raise ValueError("截图不是 PNG 格式")
+            os.replace(staged, target)
+    except Exception as e:
+        print(f"生成预览图失败: {e}")
+    finally:
+        if os.path.exists(staged):
+            os.remove(staged)
+
+
+def open_record(game_id: str) -> GameRecord | None:
+    """内存映射打开二进制记录，调用方负责 close（或用 with）；旧版 JSON 存档返回 None"""
+    path = os.path.join(archive_dir(game_id), RECORD_FILE)
+    if not os.path.exists(path):
+        return None
+    return GameRecord.open(path)
+
+
+def read_archive(game_id: str) -> dict | None:
+    """读取为 JSON 结构（与 Game.get_state_dict 一致），二进制记录优先"""
+    record = open_record(game_id)
+    if record is not None:
+        with record:
+            return record.to_state_dict()
+    path = os.path.join(archive_dir(game_id), DATA_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_ply(game_id: str, ply: int) -> dict | None:
+    """只取第 ply 步（0 为起始局面）的局面与走法；越界抛出 IndexError"""
+    record = open_record(game_id)
+    if record is not None:
+        with record:
+            fen = record.fen_at(ply)
+            san = record.san_at(ply) if ply > 0 else None
+            return {"ply": ply, "plies": record.plies, "fen": fen, "san": san}
+    data = read_archive(game_id)
+    if data is None:
+        return None
+    fens = data["fen_history"]
+    if not 0 <= ply < len(fens):
+        raise IndexError("步数越界")
+    return {"ply": ply, "plies": len(fens) - 1, "fen": fens[ply], "san": data["history"][ply - 1] if ply > 0 else None}
@@ -0,0 +1,224 @@
+"""
+房间广播总线：把一个工作进程产生的房间消息送到所有工作进程的 WebSocket 连接。
+
+    CHESS_BUS=local   默认。只在本进程内广播（单个工作进程）。
+    CHESS_BUS=unix    经 Unix 套接字 CHESS_BUS_SOCKET（默认 saved_rooms/bus.sock）上的中转进程转发。
+                      第一个启动的工作进程通过文件锁当选，在自己的事件循环中运行中转；
+                      它退出后其他进程在重连时重新选出一个。也可以单独运行：
+                          python -m backend.bus --serve
+
+消息按行编码为 JSON：{"room": 房间 ID, "message": 消息, "origin": 发送进程}。
+发送方先直接推送给本进程的连接，再交给中转，中转不回送给发送方。
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import uuid
+from typing import Awaitable, Callable
+
+try:
+    import fcntl # 选举中转进程用的文件锁，只在类 Unix 系统上可用
+except ImportError:
+    fcntl = None
+
+from .rooms import ROOMS_DIR
+
+BUS_SOCKET = "bus.sock"
+# 连接不上中转时的重试间隔（秒）
+RECONNECT_DELAY = 0.2
+# 单条消息（一行）的长度上限，以及中转为单个连接积压的发送数据上限，超出时断开该连接
+LINE_LIMIT = 1 << 24
+BACKLOG_LIMIT = 1 << 24
+
+Handler = Callable[[str, dict], Awaitable[None]]
+
+
+class LocalBus:
+    """进程内广播：publish 直接交给本进程的处理函数"""
+    def __init__(self):
+        self.handler: Handler | None = None
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    async def publish(self, room_id: str, message: dict):
+        await self.handler(room_id, message)
+
+    async def close(self):
+        pass
+
+
+def elect(path: str) -> int | None:
+    """尝试取得中转进程的文件锁，成功时返回须一直保持打开的文件描述符"""
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class Broker:
+    """中转：把每个连接发来的一行转发给其他所有连接"""
+    def __init__(self, path: str):
+        self.path = path
+        self.clients: set[asyncio.StreamWriter] = set()
+        self.server: asyncio.AbstractServer | None = None
+
+    async def start(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path) # 上一个中转进程异常退出时留下的套接字文件
+        self.server = await asyncio.start_unix_server(self._serve, self.path, limit=LINE_LIMIT)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients.add(writer)
+        try:
+            while line := await reader.readline():
+                for client in list(self.clients):
+                    if client is writer:
+                        continue
+                    # 不等待慢连接：积压过多时直接断开，它重连后由客户端的 resync 补齐状态
+                    if client.transport.get_write_buffer_size() > BACKLOG_LIMIT:
+                        self.clients.discard(client)
+                        client.close()
+                    else:
+                        client.write(line)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            for client in list(self.clients):
+                client.close()
+            await self.server.wait_closed()
+            self.server = None
+
+
+class SocketBus:
+    """跨进程广播：经 Unix 套接字中转；中转不可用时消息仍会送达本进程的连接"""
+    def __init__(self, path: str):
+        self.path = path
+        self.origin = uuid.uuid4().hex
+        self.handler: Handler | None = None
+        self.broker: Broker | None = None
+        self.connected = asyncio.Event()
+        self.published = 0
+        self.received = 0
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+        self._lock_fd: int | None = None
+
+    @classmethod
+    def from_env(cls) -> SocketBus:
+        directory = os.environ.get("CHESS_ROOMS_DIR", ROOMS_DIR)
+        return cls(os.environ.get("CHESS_BUS_SOCKET", os.path.join(directory, BUS_SOCKET)))
+
+    async def start(self, handler: Handler):
+        if fcntl is None:
+            raise RuntimeError("CHESS_BUS=unix 需要 Unix 套接字与文件锁")
+        self.handler = handler
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        # 除了取消，任何异常都不能结束这个任务，否则本进程再也收不到其他进程的消息
+        while True:
+            try:
+                await self._connect_and_receive()
+            except Exception as e:
+                print(f"广播总线连接中断: {e}")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _connect_and_receive(self):
+        try:
+            reader, self._writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+        except (FileNotFoundError, ConnectionError):
+            # 没有中转在运行：抢到文件锁的进程负责启动，锁随进程退出释放
+            if self.broker is None and (fd := elect(self.path)) is not None:
+                self._lock_fd = fd
+                self.broker = Broker(self.path)
+                await self.broker.start()
+            return
+        self.connected.set()
+        try:
+            while line := await reader.readline():
+                await self._dispatch(line)
+        finally:
+            self.connected.clear()
+            self._writer.close()
+            self._writer = None
+
+    async def _dispatch(self, line: bytes):
+        """处理一行消息；格式错误或处理函数出错只丢弃这一条"""
+        try:
+            data = json.loads(line)
+            if data["origin"] != self.origin:
+                self.received += 1
+                await self.handler(data["room"], data["message"])
+        except Exception as e:
+            print(f"处理广播消息失败: {e!r}")
+
+    async def publish(self, room_id: str, message: dict):
+        await self.handler(room_id, message)
+        if self._writer is None:
+            return
+        line = json.dumps({"room": room_id, "message": message, "origin": self.origin}) + "\n"
+        try:
+            self._writer.write(line.encode())
+            await self._writer.drain()
+            self.published += 1
+        except ConnectionError as e:
+            print(f"发布房间消息失败: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        if self._writer is not None:
+            self._writer.close()
+        if self.broker is not None:
+            await self.broker.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+def bus_from_env() -> LocalBus | SocketBus:
+    kind = os.environ.get("CHESS_BUS", "local")
+    if kind == "local":
+        return LocalBus()
+    if kind == "unix":
+        return SocketBus.from_env()
+    raise ValueError(f"未知的广播总线类型: {kind}")
+
+
+async def serve(path: str):
+    if elect(path) is None:
+        print(f"{path} 上已有中转进程在运行")
+        return
+    broker = Broker(path)
+    await broker.start()
+    print(f"广播中转已在 {path} 上运行")
+    await broker.server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="房间广播中转")
+    parser.add_argument("--serve", action="store_true", help="单独运行中转进程")
+    parser.add_argument("--socket", default=None, help="套接字路径，默认为 CHESS_BUS_SOCKET 或 saved_rooms/bus.sock")
+    args = parser.parse_args()
+    if args.serve:
+        asyncio.run(serve(args.socket or SocketBus.from_env().path))
+    else:
+        parser.print_help()
@@ -0,0 +1,270 @@
+"""
+存档目录的索引（SQLite）：每局一行，记录棋手、结果、步数、开局与时间戳。
+保存、重命名、删除与批量导入时同步维护，GET /archives 的分页、排序与筛选只查询索引，不访问存档目录。
+
+首次创建索引（或索引丢失）时从存档目录重建，也可离线重建：
+    python -m backend.catalog --rebuild
+"""
+from __future__ import annotations
+import argparse
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable
+
+from . import archive
+from .logic.record import GameRecord
+
+CATALOG_FILE = "catalog.sqlite3"
+# 单页条数的默认值与上限
+PAGE_SIZE = 50
+PAGE_LIMIT = 500
+# 没有 Opening 标签时，取前若干步 SAN 作为开局
+OPENING_PLIES = 6
+
+SORT_KEYS = ("updated", "created", "plies", "id")
+COLUMNS = ("id", "white", "black", "result", "status", "plies", "opening", "event", "created", "updated")
+
+_RESULTS = {"white_win": "1-0", "black_win": "0-1", "draw": "1/2-1/2", "ongoing": "*"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    white TEXT,
+    black TEXT,
+    result TEXT NOT NULL,
+    status TEXT,
+    plies INTEGER NOT NULL,
+    opening TEXT,
+    event TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_updated ON games (updated, id);
+CREATE INDEX IF NOT EXISTS games_created ON games (created, id);
+CREATE INDEX IF NOT EXISTS games_plies ON games (plies, id);
+CREATE INDEX IF NOT EXISTS games_white ON games (white);
+CREATE INDEX IF NOT EXISTS games_black ON games (black);
+CREATE INDEX IF NOT EXISTS games_result ON games (result);
+CREATE INDEX IF NOT EXISTS games_opening ON games (opening);
+"""
+
+
+def game_result(meta: dict) -> str:
+    """PGN 结果（1-0 / 0-1 / 1/2-1/2 / *）：优先取 PGN 结果与标签，否则由对局状态推出"""
+    result = meta.get("result") or (meta.get("headers") or {}).get("Result")
+    if not result or result == "*":
+        result = _RESULTS.get(meta.get("status"), "*")
+    return result
+
+
+def make_entry(game_id: str, meta: dict, sans: list[str], timestamp: float | None = None) -> dict[str, Any]:
+    """由存档元数据（状态、PGN 标签）与 SAN 序列生成索引条目"""
+    headers = meta.get("headers") or {}
+    result = game_result(meta)
+    opening = headers.get("Opening") or headers.get("ECO") or " ".join(sans[:OPENING_PLIES]) or None
+    timestamp = time.time() if timestamp is None else timestamp
+    return {
+        "id": game_id,
+        "white": headers.get("White"),
+        "black": headers.get("Black"),
+        "result": result,
+        "status": meta.get("status"),
+        "plies": len(sans),
+        "opening": opening,
+        "event": headers.get("Event"),
+        "created": timestamp,
+        "updated": timestamp,
+    }
+
+
+def entry_from_record(game_id: str, record: GameRecord, timestamp: float | None = None) -> dict[str, Any]:
+    return make_entry(game_id, record.meta(), record.sans(), timestamp)
+
+
+def entry_from_archive(game_id: str) -> dict[str, Any] | None:
+    """读取存档目录中的一局生成索引条目（用于重建），时间戳取文件修改时间"""
+    game_dir = archive.archive_dir(game_id)
+    record = archive.open_record(game_id)
+    if record is not None:
+        with record:
+            mtime = os.path.getmtime(os.path.join(game_dir, archive.RECORD_FILE))
+            return entry_from_record(game_id, record, mtime)
+    path = os.path.join(game_dir, archive.DATA_FILE)
+    if not os.path.exists(path):
+        return None
+    data = archive.read_archive(game_id)
+    return make_entry(game_id, data, data.get("history", []), os.path.getmtime(path))
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("无效的分页游标")
+    return values
+
+
+class Catalog:
+    """单个 SQLite 连接加锁，供事件循环与导入线程共用"""
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.created = not os.path.exists(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> Catalog:
+        """CHESS_CATALOG 指定索引文件，默认放在索引目录 saved_indexes 下"""
+        return cls(os.environ.get("CHESS_CATALOG") or archive.index_path(CATALOG_FILE))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- 维护 ---
+    def upsert_many(self, entries: Iterable[dict[str, Any]]):
+        """插入或更新条目；已存在的条目保留原创建时间"""
+        rows = [tuple(entry[c] for c in COLUMNS) for entry in entries]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT INTO games ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                    "ON CONFLICT(id) DO UPDATE SET "
+                    + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS if c not in ("id", "created")),
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def upsert(self, entry: dict[str, Any]):
+        self.upsert_many([entry])
+
+    def rename(self, old_id: str, new_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("UPDATE games SET id = ?, updated = ? WHERE id = ?", (new_id, time.time(), old_id))
+            return cursor.rowcount > 0
+
+    def delete(self, game_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("DELETE FROM games WHERE id = ?", (game_id,)).rowcount > 0
+
+    def get(self, game_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM games WHERE id = ?", (game_id,)).fetchone()
+        return dict(row) if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def rebuild(self, batch: int = 1000) -> int:
+        """清空并从存档目录重建，返回索引的局数"""
+        with self._lock:
+            self._conn.execute("DELETE FROM games")
+        if not os.path.isdir(archive.ARCHIVE_DIR):
+            return 0
+        total = 0
+        entries = []
+        for game_id in os.listdir(archive.ARCHIVE_DIR):
+            if not os.path.isdir(archive.archive_dir(game_id)):
+                continue
+            try:
+                entry = entry_from_archive(game_id)
+            except Exception as e:
+                print(f"索引存档 {game_id} 失败: {e}")
+                continue
+            if entry is None:
+                continue
+            entries.append(entry)
+            if len(entries) >= batch:
+                self.upsert_many(entries)
+                total += len(entries)
+                entries = []
+        self.upsert_many(entries)
+        return total + len(entries)
+
+    # --- 查询 ---
+    def query(self, limit: int = PAGE_SIZE, cursor: str | None = None, sort: str = "updated", order: str = "desc",
+              player: str | None = None, white: str | None = None, black: str | None = None,
+              result: str | None = None, status: str | None = None, opening: str | None = None,
+              min_plies: int | None = None, max_plies: int | None = None) -> dict[str, Any]:
+        """
+        键集分页：游标为上一页最后一条的 (排序值, id)，翻页代价与页码无关。
+        opening 按前缀匹配，player 匹配执白或执黑。参数不合法时抛出 ValueError。
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"不支持的排序方向: {order}")
+        limit = max(1, min(limit, PAGE_LIMIT))
+
+        where, params = [], []
+        for column, value in (("white", white), ("black", black), ("result", result), ("status", status)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if player is not None:
+            where.append("(white = ? OR black = ?)")
+            params += [player, player]
+        if opening is not None:
+            where.append("opening LIKE ? ESCAPE '\\'")
+            params.append(opening.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if min_plies is not None:
+            where.append("plies >= ?")
+            params.append(min_plies)
+        if max_plies is not None:
+            where.append("plies <= ?")
+            params.append(max_plies)
+
+        # id 作为第二排序键保证顺序稳定；按 id 排序时两个键相同
+        key = f"{sort}, id" if sort != "id" else "id, id"
+        op = "<" if order == "desc" else ">"
+        if cursor:
+            where.append(f"({key}) {op} (?, ?)")
+            params += decode_cursor(cursor)
+        direction = order.upper()
+        order_by = f"{sort} {direction}, id {direction}" if sort != "id" else f"id {direction}"
+        sql = (f"SELECT * FROM games {'WHERE ' + ' AND '.join(where) if where else ''} "
+               f"ORDER BY {order_by} LIMIT ?")
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(sql, (*params, limit + 1))]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor([last[sort], last["id"]])
+        return {"games": rows, "next_cursor": next_cursor}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="存档索引维护")
+    parser.add_argument("--rebuild", action="store_true", help="从存档目录重建索引")
+    parser.add_argument("--db", default=None, help="索引文件路径，默认为 CHESS_CATALOG 或 saved_indexes/catalog.sqlite3")
+    args = parser.parse_args()
+    catalog = Catalog(args.db) if args.db else Catalog.from_env()
+    if args.rebuild:
+        start = time.perf_counter()
+        total = catalog.rebuild()
+        print(f"已索引 {total} 局，耗时 {time.perf_counter() - start:.2f} 秒")
+    else:
+        print(f"索引中共 {catalog.count()} 局")
@@ -0,0 +1,111 @@
+"""
+计算执行层：把走法校验、将死判定、搜索等 CPU 密集的逻辑移出 asyncio 事件循环。
+
+通过环境变量配置：
+    CHESS_EXECUTOR          thread（默认）| process | inline（直接在事件循环上执行，仅用于对比测试）
+    CHESS_EXECUTOR_WORKERS  工作线程/进程数
+    CHESS_EXECUTOR_QUEUE    同时排队与执行中的任务上限，超出时立即拒绝
+    CHESS_EXECUTOR_TIMEOUT  单个请求的默认等待超时（秒）
+"""
+from __future__ import annotations
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+
+class ExecutorBusy(Exception):
+    """排队任务已达上限"""
+
+
+class ExecutorTimeout(Exception):
+    """任务未能在超时时间内完成"""
+
+
+def _locked(lock: threading.Lock, fn: Callable, *args) -> Any:
+    with lock:
+        return fn(*args)
+
+
+class LogicExecutor:
+    KINDS = ("thread", "process", "inline")
+
+    def __init__(self, kind: str = "thread", workers: int | None = None, max_pending: int = 64, timeout: float = 10.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"未知的执行器类型: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._count_lock = threading.Lock()
+        self._local: ThreadPoolExecutor | None = None
+        self._compute: Executor | None = None
+
+    @classmethod
+    def from_env(cls) -> LogicExecutor:
+        workers = os.environ.get("CHESS_EXECUTOR_WORKERS")
+        return cls(
+            kind=os.environ.get("CHESS_EXECUTOR", "thread"),
+            workers=int(workers) if workers else None,
+            max_pending=int(os.environ.get("CHESS_EXECUTOR_QUEUE", "64")),
+            timeout=float(os.environ.get("CHESS_EXECUTOR_TIMEOUT", "10")),
+        )
+
+    def _pool(self, local: bool) -> Executor:
+        """
+        房间操作（读写本进程共享对象，通常很快）走独立的线程池，避免排在耗时的搜索/分析之后；
+        无状态的计算任务按配置交给线程池或进程池。
+        """
+        if local:
+            if self._local is None:
+                self._local = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4), thread_name_prefix="chess-room")
+            return self._local
+        if self._compute is None:
+            if self.kind == "process":
+                # spawn：不 fork 已有事件循环与工作线程的服务进程
+                self._compute = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._compute = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="chess-logic")
+        return self._compute
+
+    def _release(self, _future=None):
+        with self._count_lock:
+            self.pending -= 1
+
+    async def run(self, fn: Callable, *args, timeout: float | None = None, lock: threading.Lock | None = None) -> Any:
+        """
+        在执行器中运行 fn(*args) 并等待结果。
+        lock 不为空表示 fn 会读写本进程内的共享对象（如房间的 Game）：此时总是在线程池中、持锁执行，
+        保证同一房间的操作串行；进程池模式下 fn 与参数必须可被 pickle。
+        超时只是放弃等待，已开始执行的任务仍会跑完（并继续占用队列名额，直到真正结束）。
+        """
+        if lock is not None:
+            fn = partial(_locked, lock, fn)
+        if self.kind == "inline":
+            return fn(*args)
+
+        with self._count_lock:
+            if self.pending >= self.max_pending:
+                raise ExecutorBusy()
+            self.pending += 1
+        try:
+            future = self._pool(lock is not None).submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # 名额在任务真正结束时才归还，超时的任务也计入队列深度
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise ExecutorTimeout() from None
+
+    def shutdown(self):
+        for pool in (self._local, self._compute):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._local = self._compute = None
@@ -0,0 +1,228 @@
+"""
+开局树：由全部存档的走法序列预先统计，每个局面节点保存到达次数与各后续走法的次数及胜/和/负。
+节点按局面键（见 positions.py，换序到达的同一局面合并为一个节点）存放在 SQLite 中，
+查询一个局面只读取该节点的几行，与存档数量无关。
+
+只统计每局前 depth 步（CHESS_EXPLORER_DEPTH，默认 20）。每局的贡献另存一份，
+重复保存同一存档、删除存档时可以精确地扣除旧的统计。修改深度后服务启动时自动重建，也可离线重建：
+    python -m backend.explorer --rebuild
+"""
+from __future__ import annotations
+import argparse
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Any, Iterable
+
+from . import archive
+from .catalog import game_result
+from .logic.notation import NotationHandler
+from .logic.record import GameRecord
+from .positions import canonical_fen, history_keys, position_key
+
+EXPLORER_FILE = "explorer.sqlite3"
+EXPLORER_DEPTH = 20
+# 节点行：走法为空串的一行记录到达该局面的对局数
+REACH = ""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    key INTEGER NOT NULL,
+    move TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    white INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    black INTEGER NOT NULL,
+    PRIMARY KEY (key, move)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS games (
+    id TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    keys BLOB NOT NULL,
+    sans TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_OUTCOMES = {"1-0": (1, 0, 0), "1/2-1/2": (0, 1, 0), "0-1": (0, 0, 1)}
+
+
+def contributions(keys: list[int], sans: list[str], depth: int) -> set[tuple[int, str]]:
+    """一局对开局树的贡献：(局面键, 走法)，同一局中重复出现的节点只计一次"""
+    plies = min(depth, len(sans))
+    items = {(keys[ply], REACH) for ply in range(min(plies + 1, len(keys)))}
+    items.update((keys[ply], sans[ply]) for ply in range(plies))
+    return items
+
+
+class OpeningExplorer:
+    """单个 SQLite 连接加锁，供事件循环与导入线程共用"""
+    def __init__(self, path: str, depth: int = EXPLORER_DEPTH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.created = not os.path.exists(path)
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'depth'").fetchone()
+        # 已有的树按其建立时的深度统计，深度不一致时需要重建
+        self.stale = row is not None and int(row[0]) != depth
+        if row is None:
+            self._conn.execute("INSERT INTO meta (name, value) VALUES ('depth', ?)", (str(depth),))
+
+    @classmethod
+    def from_env(cls) -> OpeningExplorer:
+        """CHESS_EXPLORER 指定文件路径（默认放在索引目录 saved_indexes 下），CHESS_EXPLORER_DEPTH 指定统计深度"""
+        path = os.environ.get("CHESS_EXPLORER") or archive.index_path(EXPLORER_FILE)
+        return cls(path, int(os.environ.get("CHESS_EXPLORER_DEPTH", EXPLORER_DEPTH)))
+
+    def game_item(self, game_id: str, keys: list[int], record: GameRecord) -> tuple[str, list[int], list[str], str]:
+        """由已算好的局面键与二进制记录组成 add_many 的条目"""
+        return game_id, keys[:self.depth + 1], record.sans(0, self.depth), game_result(record.meta())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- 维护 ---
+    def _apply(self, items: Iterable[tuple[int, str]], result: str, sign: int):
+        w, d, b = _OUTCOMES.get(result, (0, 0, 0))
+        self._conn.executemany(
+            "INSERT INTO nodes (key, move, games, white, draws, black) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key, move) DO UPDATE SET games = games + excluded.games, white = white + excluded.white, "
+            "draws = draws + excluded.draws, black = black + excluded.black",
+            [(key, move, sign, sign * w, sign * d, sign * b) for key, move in items],
+        )
+
+    def _remove_locked(self, game_id: str) -> bool:
+        row = self._conn.execute("SELECT result, keys, sans FROM games WHERE id = ?", (game_id,)).fetchone()
+        if row is None:
+            return False
+        result, blob, sans = row
+        keys = list(struct.unpack(f"<{len(blob) // 8}q", blob))
+        items = contributions(keys, sans.split(" ") if sans else [], self.depth)
+        self._apply(items, result, -1)
+        self._conn.executemany("DELETE FROM nodes WHERE key = ? AND move = ? AND games <= 0", list(items))
+        self._conn.execute("DELETE FROM games WHERE id = ?", (game_id,))
+        return True
+
+    def add_many(self, games: Iterable[tuple[str, list[int], list[str], str]]):
+        """写入 [(存档 ID, 各步局面键, SAN, 结果)]，同一存档已有的统计先被扣除；整批在一个事务中提交"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for game_id, keys, sans, result in games:
+                    self._remove_locked(game_id)
+                    plies = min(self.depth, len(sans))
+                    keys, sans = keys[:plies + 1], sans[:plies]
+                    self._apply(contributions(keys, sans, self.depth), result, 1)
+                    self._conn.execute("INSERT INTO games (id, result, keys, sans) VALUES (?, ?, ?, ?)",
+                                       (game_id, result, struct.pack(f"<{len(keys)}q", *keys), " ".join(sans)))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add(self, game_id: str, keys: list[int], sans: list[str], result: str):
+        self.add_many([(game_id, keys, sans, result)])
+
+    def remove(self, game_id: str) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                removed = self._remove_locked(game_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return removed
+
+    def rename(self, old_id: str, new_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("UPDATE games SET id = ? WHERE id = ?", (new_id, old_id)).rowcount > 0
+
+    def rebuild(self, batch: int = 200) -> int:
+        """清空并按当前深度从存档目录重建，返回统计的局数"""
+        with self._lock:
+            self._conn.execute("DELETE FROM nodes")
+            self._conn.execute("DELETE FROM games")
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('depth', ?)", (str(self.depth),))
+            self.stale = False
+        if not os.path.isdir(archive.ARCHIVE_DIR):
+            return 0
+        total = 0
+        pending = []
+        for game_id in os.listdir(archive.ARCHIVE_DIR):
+            if not os.path.isdir(archive.archive_dir(game_id)):
+                continue
+            try:
+                item = self.archive_item(game_id)
+            except Exception as e:
+                print(f"统计存档 {game_id} 的开局失败: {e}")
+                continue
+            if item is None:
+                continue
+            pending.append(item)
+            if len(pending) >= batch:
+                self.add_many(pending)
+                total += len(pending)
+                pending = []
+        self.add_many(pending)
+        return total + len(pending)
+
+    def archive_item(self, game_id: str) -> tuple[str, list[int], list[str], str] | None:
+        """读取存档目录中的一局，只重放统计深度以内的步数"""
+        record = archive.open_record(game_id)
+        if record is not None:
+            with record:
+                fens = record.fen_history(self.depth)
+                return game_id, [position_key(fen) for fen in fens], record.sans(0, self.depth), game_result(record.meta())
+        data = archive.read_archive(game_id)
+        if data is None:
+            return None
+        keys = history_keys(data["fen_history"][:self.depth + 1])
+        return game_id, keys, data["history"][:self.depth], game_result(data)
+
+    # --- 查询 ---
+    def lookup(self, fen: str) -> dict[str, Any]:
+        """该局面的到达次数与胜/和/负，以及各后续走法的统计（按对局数降序）"""
+        fen = canonical_fen(fen)
+        with self._lock:
+            rows = self._conn.execute("SELECT move, games, white, draws, black FROM nodes WHERE key = ?",
+                                      (position_key(fen),)).fetchall()
+        node = {"fen": fen, "games": 0, "white": 0, "draws": 0, "black": 0, "moves": []}
+        for move, games, white, draws, black in rows:
+            stats = {"games": games, "white": white, "draws": draws, "black": black}
+            if move == REACH:
+                node.update(stats)
+            else:
+                node["moves"].append({"san": move, **stats})
+        node["moves"].sort(key=lambda m: (-m["games"], m["san"]))
+        return node
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="开局树维护")
+    parser.add_argument("--rebuild", action="store_true", help="从存档目录重建开局树")
+    parser.add_argument("--db", default=None, help="文件路径，默认为 CHESS_EXPLORER 或 saved_indexes/explorer.sqlite3")
+    parser.add_argument("--depth", type=int, default=None, help="统计深度（步数），默认为 CHESS_EXPLORER_DEPTH 或 20")
+    args = parser.parse_args()
+    explorer = OpeningExplorer(args.db or os.environ.get("CHESS_EXPLORER") or archive.index_path(EXPLORER_FILE),
+                               args.depth or int(os.environ.get("CHESS_EXPLORER_DEPTH", EXPLORER_DEPTH)))
+    if args.rebuild:
+        start = time.perf_counter()
+        total = explorer.rebuild()
+        print(f"已统计 {total} 局，耗时 {time.perf_counter() - start:.2f} 秒")
+    else:
+        node = explorer.lookup(NotationHandler.DEFAULT_FEN)
+        print(f"初始局面：{node['games']} 局，深度 {explorer.depth}" + ("（与建立时不一致，需要 --rebuild）" if explorer.stale else ""))
@@ -0,0 +1,194 @@
+"""
+PGN 批量导入：流式读取大文件，按块交给进程池在棋盘上重放（Game.load_pgn），
+主进程按批写入存档目录。单局出错只记录在报告中，不中断导入。
+
+命令行用法：
+    python -m backend.importer games.pgn --workers 4 --prefix lichess
+"""
+from __future__ import annotations
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, TextIO
+
+from .archive import claim_id, safe_id, write_record
+from .catalog import Catalog, entry_from_record
+from .explorer import OpeningExplorer
+from .logic.board import Board
+from .logic.game import Game
+from .logic.pgn import PGNGame, read_games
+from .logic.record import GameRecord, encode_game
+from .positions import PositionIndex, history_keys
+
+# 报告中保留的错误条目上限（失败总数仍完整计数）
+ERROR_LIMIT = 1000
+
+
+class ImportReport:
+    """导入进度与结果，导入线程更新、其他线程只读"""
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.failed = 0
+        self.skipped = 0 # 存档 ID 已被占用而跳过的对局
+        self.errors: list[dict] = []
+        self.done = False
+        self.error: str | None = None # 整体失败（如文件无法读取）
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, game_id: str, index: int, error: str | None, skipped: bool = False):
+        with self._lock:
+            if error is None:
+                self.imported += 1
+                return
+            if skipped:
+                self.skipped += 1
+            else:
+                self.failed += 1
+            if len(self.errors) < ERROR_LIMIT:
+                self.errors.append({"index": index, "id": game_id, "error": error})
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            elapsed = self.elapsed if self.done else time.perf_counter() - self.started
+            processed = self.imported + self.failed + self.skipped
+            return {
+                "done": self.done,
+                "error": self.error,
+                "read": self.read,
+                "imported": self.imported,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "elapsed": round(elapsed, 2),
+                "games_per_sec": round(processed / elapsed, 1) if elapsed else 0.0,
+                "errors": list(self.errors),
+            }
+
+
+def replay_chunk(chunk: list[tuple[int, PGNGame]], board_cls: type[Board] = Board,
+                 with_keys: bool = False) -> list[tuple[int, bytes | None, list[int] | None, str | None]]:
+    """
+    在工作进程中逐局重放主线并编码为二进制记录，返回 [(序号, 记录, 各步局面键, 错误信息)]。
+    局面键只在 with_keys 时计算；单局的任何异常都被捕获为错误信息。
+    """
+    results = []
+    for index, pgn_game in chunk:
+        try:
+            game = Game(board_cls)
+            game.load_pgn(pgn_game, strict=True)
+            data = encode_game(game, {"headers": pgn_game.headers, "result": pgn_game.result})
+            keys = history_keys(game.fen_history) if with_keys else None
+            results.append((index, data, keys, None))
+        except Exception as e:
+            results.append((index, None, None, str(e)))
+    return results
+
+
+def _chunks(games: Iterable[PGNGame], size: int) -> Iterable[list[tuple[int, PGNGame]]]:
+    chunk = []
+    for index, pgn_game in enumerate(games, 1):
+        # 变着不参与重放，不必传给工作进程
+        pgn_game.mainline.variations = {}
+        chunk.append((index, pgn_game))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_pgn(source: str | TextIO | Iterable[str], prefix: str, workers: int | None = None, chunk_size: int = 100,
+               kind: str = "process", board_cls: type[Board] = Board, report: ImportReport | None = None,
+               progress: Callable[[ImportReport], None] | None = None, catalog: Catalog | None = None,
+               positions: PositionIndex | None = None, explorer: OpeningExplorer | None = None) -> ImportReport:
+    """
+    导入 source 中的全部对局，存档 ID 为 <prefix>_<序号>；给定 catalog / positions / explorer 时每批写入后同步更新。
+    ID 已被占用（之前的导入或同名存档）的对局跳过并记入报告，不覆盖已有存档。
+    同时在途的块数限制为工作者数的两倍，读取速度不会超过重放速度，内存占用与文件大小无关。
+    kind 为 process（默认）或 thread（便于测试与单核环境）。
+    """
+    report = report or ImportReport()
+    workers = workers or os.cpu_count() or 1
+    prefix = safe_id(prefix)
+    pool: Executor
+    if kind == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chess-import")
+
+    in_flight: set[Future] = set()
+
+    def write_batch(futures: Iterable[Future]):
+        entries, position_keys, openings = [], [], []
+        for future in futures:
+            for index, data, keys, error in future.result():
+                game_id = f"{prefix}_{index:06d}"
+                if data is not None:
+                    if not claim_id(game_id):
+                        report.record(game_id, index, "存档 ID 已存在，已跳过", skipped=True)
+                        continue
+                    try:
+                        write_record(game_id, data, durable=False) # 导入可以重做，不逐局 fsync
+                        if catalog is not None:
+                            entries.append(entry_from_record(game_id, GameRecord(data)))
+                        if positions is not None:
+                            position_keys.append((game_id, keys))
+                        if explorer is not None:
+                            openings.append(explorer.game_item(game_id, keys, GameRecord(data)))
+                    except OSError as e:
+                        error = f"写入失败: {e}"
+                report.record(game_id, index, error)
+        if entries:
+            catalog.upsert_many(entries)
+        if position_keys:
+            positions.add_many(position_keys)
+        if openings:
+            explorer.add_many(openings)
+        if progress:
+            progress(report)
+
+    try:
+        for chunk in _chunks(read_games(source), chunk_size):
+            report.read += len(chunk)
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                write_batch(finished)
+            in_flight.add(pool.submit(replay_chunk, chunk, board_cls, positions is not None or explorer is not None))
+        write_batch(wait(in_flight).done)
+    except Exception as e:
+        report.error = str(e)
+        print(f"PGN 导入失败: {e}")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        report.elapsed = time.perf_counter() - report.started
+        report.done = True
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将 PGN 文件中的对局批量导入存档目录")
+    parser.add_argument("file")
+    parser.add_argument("--prefix", help="存档 ID 前缀，默认取文件名")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=100, help="每个任务包含的对局数")
+    args = parser.parse_args()
+
+    def show(report: ImportReport):
+        stats = report.to_dict()
+        print(f"\r已导入 {stats['imported']} 局，失败 {stats['failed']} 局，跳过 {stats['skipped']} 局，"
+              f"{stats['games_per_sec']} 局/秒", end="", flush=True)
+
+    prefix = args.prefix or os.path.splitext(os.path.basename(args.file))[0]
+    result = import_pgn(args.file, prefix, args.workers, args.chunk, progress=show,
+                        catalog=Catalog.from_env(), positions=PositionIndex.from_env(),
+                        explorer=OpeningExplorer.from_env()).to_dict()
+    print()
+    for item in result["errors"][:20]:
+        print(f"#{item['index']}: {item['error']}")
+    if result["error"]:
+        print(f"导入中止: {result['error']}")
@@ -0,0 +1,165 @@
+"""
+无状态局面分析：FEN -> 局面状态与双方合法走法表（含 SAN），以及进程内的 LRU 缓存。
+复盘时反复请求的是 fen_history 中的少数局面，缓存命中后无需重建棋盘与生成走法。
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from .board import Board
+from .constants import Color, MoveType
+from .notation import NotationHandler
+
+
+def build_move_map(fen: str, board_cls: type[Board] = Board) -> dict:
+    """
+    解析一次 FEN，计算局面状态与全部棋子的合法走法（按棋子自身颜色判定）。
+    moves 为行棋方的走法表，opponent_moves 为另一方的走法表，均以代数坐标为键。
+    """
+    board = board_cls()
+    NotationHandler.parse_fen_to_board(board, fen)
+    parts = fen.split()
+    turn = Color.BLACK if len(parts) > 1 and parts[1] == 'b' else Color.WHITE
+    in_check = board.is_in_check(turn)
+    has_moves = board.has_legal_moves(turn)
+    return {
+        "fen": fen,
+        "turn": turn.value,
+        "in_check": in_check,
+        "checkmate": in_check and not has_moves,
+        "stalemate": not in_check and not has_moves,
+        "moves": _color_move_map(board, turn),
+        "opponent_moves": _color_move_map(board, turn.opposite()),
+    }
+
+
+def _color_move_map(board: Board, color: Color) -> dict[str, list[dict]]:
+    result = {}
+    opponent = color.opposite()
+    for piece in list(board.pieces[color]):
+        pos = piece.position
+        entries = []
+        for move in board.get_piece_legal_moves(pos, color):
+            if move.move_type == MoveType.PROMOTION:
+                move.promotion_choice = "Q"
+            # 先执行一次得到将军/将死标记，撤销后再在走棋前的局面上生成 SAN（消歧需要走棋前的局面）
+            move.execute(board)
+            move.is_check = board.is_in_check(opponent)
+            move.is_checkmate = move.is_check and not board.has_legal_moves(opponent)
+            move.undo(board)
+            entries.append({"end": move.end, "type": move.move_type.value,
+                            "san": NotationHandler.generate_san(board, move)})
+        if entries:
+            result[NotationHandler.coord_to_algebraic(pos, board.rows)] = entries
+    return result
+
+
+def select_moves(entry: dict, squares: list[tuple[int, int]] | None, rows: int = 8, fen: str | None = None) -> dict:
+    """
+    从缓存条目中取出请求的部分：squares 为 None 时返回行棋方全部走法，
+    否则返回指定格子（任意一方）的走法。返回新字典，不修改缓存内容。
+    条目按规范化 FEN 共享，其中的 fen 是首个请求方给出的；给出 fen 时换成本次请求的 FEN。
+    """
+    result = {k: v for k, v in entry.items() if k != "opponent_moves"}
+    if fen is not None:
+        result["fen"] = fen
+    if squares is not None:
+        keys = {NotationHandler.coord_to_algebraic(tuple(sq), rows) for sq in squares}
+        result["moves"] = {k: v for table in (entry["moves"], entry["opponent_moves"])
+                           for k, v in table.items() if k in keys}
+    return result
+
+
+class MoveMapCache:
+    """
+    进程内的走法表 LRU 缓存，同时限制条目数与（按 JSON 编码长度估算的）总字节数。
+    键为规范化后的 FEN：去掉不影响走法的半回合计数与回合数。
+    线程安全，可被执行器的多个工作线程共享。
+    """
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[dict, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> MoveMapCache:
+        return cls(
+            max_entries=int(os.environ.get("CHESS_ANALYSIS_CACHE_ENTRIES", "4096")),
+            max_bytes=int(os.environ.get("CHESS_ANALYSIS_CACHE_BYTES", str(64 << 20))),
+        )
+
+    @staticmethod
+    def normalize_fen(fen: str) -> str:
+        # 只保留棋子布局、行棋方、易位权与过路兵四段；缺省的段保持缺省（仅布局的 FEN 语义不同）
+        return " ".join(fen.split()[:4])
+
+    def get(self, fen: str) -> dict | None:
+        key = self.normalize_fen(fen)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, fen: str, entry: dict) -> dict:
+        key = self.normalize_fen(fen)
+        size = len(json.dumps(entry, ensure_ascii=False))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return entry # 单个条目超过上限，不缓存
+            self._entries[key] = (entry, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return entry
+
+    def get_or_compute(self, fen: str, compute: Callable[[], dict]) -> dict:
+        entry = self.get(fen)
+        if entry is None:
+            entry = self.put(fen, compute())
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# 进程级共享实例
+MOVE_MAP_CACHE = MoveMapCache.from_env()
+
+
+def analyze_fen(fen: str, squares: list[tuple[int, int]] | None = None, board_cls: type[Board] = Board) -> dict:
+    """带缓存的局面分析"""
+    entry = MOVE_MAP_CACHE.get_or_compute(fen, lambda: build_move_map(fen, board_cls))
+    return select_moves(entry, squares, len(fen.split()[0].split("/")), fen)
@@ -0,0 +1,441 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Generator
+
+from .board import Board
+from .constants import Color, PieceType
+from .move import MoveCode
+
+if TYPE_CHECKING:
+    from .piece import Piece
+
+ORTHO_DIRS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+DIAG_DIRS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+KNIGHT_OFFSETS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+
+
+class Geometry:
+    """
+    某一棋盘尺寸 (rows, cols) 下的预计算位掩码表，按尺寸全局缓存。
+    格子编号 sq = r * cols + c，Python 整数不限位宽，因此非 8x8 棋盘同样适用。
+    """
+    _cache: dict[tuple[int, int], Geometry] = {}
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        n = rows * cols
+        self.coords = [(sq // cols, sq % cols) for sq in range(n)]
+
+        def mask(cells):
+            m = 0
+            for r, c in cells:
+                if 0 <= r < rows and 0 <= c < cols:
+                    m |= 1 << (r * cols + c)
+            return m
+
+        self.knight = [mask((r + dr, c + dc) for dr, dc in KNIGHT_OFFSETS) for r, c in self.coords]
+        self.king = [mask((r + dr, c + dc) for dr, dc in ORTHO_DIRS + DIAG_DIRS) for r, c in self.coords]
+        # 某颜色的兵位于 sq 时攻击的格子（白兵向行号减小的方向前进）
+        self.pawn_attacks = {
+            Color.WHITE: [mask([(r - 1, c - 1), (r - 1, c + 1)]) for r, c in self.coords],
+            Color.BLACK: [mask([(r + 1, c - 1), (r + 1, c + 1)]) for r, c in self.coords],
+        }
+
+        # 射线表：rays[方向][sq] 为从 sq 出发（不含 sq）沿该方向直到边界的全部格子
+        def ray_table(dr, dc):
+            table = []
+            for r, c in self.coords:
+                m, nr, nc = 0, r + dr, c + dc
+                while 0 <= nr < rows and 0 <= nc < cols:
+                    m |= 1 << (nr * cols + nc)
+                    nr, nc = nr + dr, nc + dc
+                table.append(m)
+            return table
+
+        # (射线表, 是否朝编号增大的方向)：正向最近的阻挡是最低位，反向是最高位
+        self.ortho_rays = [(ray_table(dr, dc), dr * cols + dc > 0) for dr, dc in ORTHO_DIRS]
+        self.diag_rays = [(ray_table(dr, dc), dr * cols + dc > 0) for dr, dc in DIAG_DIRS]
+        # 按格子展开的非空射线 [(射线, 射线表, 是否正向)]，以及同一直线/斜线上全部格子的并集（快速排除）
+        self.ortho = [[(table[sq], table, positive) for table, positive in self.ortho_rays if table[sq]] for sq in range(n)]
+        self.diag = [[(table[sq], table, positive) for table, positive in self.diag_rays if table[sq]] for sq in range(n)]
+        self.ortho_lines = [sum(ray for ray, _, _ in rays) for rays in self.ortho]
+        self.diag_lines = [sum(ray for ray, _, _ in rays) for rays in self.diag]
+
+        # between[a][b]：a、b 同线时两者之间（不含端点）的格子
+        self.between: list[dict[int, int]] = [dict() for _ in range(n)]
+        for rays in (self.ortho_rays, self.diag_rays):
+            for table, positive in rays:
+                for a in range(n):
+                    ray = table[a]
+                    b_mask = ray
+                    while b_mask:
+                        low = b_mask & -b_mask
+                        b = low.bit_length() - 1
+                        b_mask ^= low
+                        self.between[a][b] = ray & ~table[b] & ~(1 << b)
+
+    @classmethod
+    def get(cls, rows: int, cols: int) -> Geometry:
+        key = (rows, cols)
+        geo = cls._cache.get(key)
+        if geo is None:
+            geo = cls._cache[key] = Geometry(rows, cols)
+        return geo
+
+
+def _nearest(blockers: int, positive: bool) -> int:
+    """返回射线上离起点最近的阻挡格的单比特掩码"""
+    if positive:
+        return blockers & -blockers
+    return 1 << (blockers.bit_length() - 1)
+
+
+def _slide(rays: list[tuple[int, list[int], bool]], occ: int) -> int:
+    """滑行子沿 rays（Geometry.ortho/diag 中某一格的射线）能到达的格子，含第一个阻挡格"""
+    targets = 0
+    for ray, table, positive in rays:
+        blockers = ray & occ
+        if not blockers:
+            targets |= ray
+        elif positive:
+            targets |= ray ^ table[(blockers & -blockers).bit_length() - 1]
+        else:
+            targets |= ray ^ table[blockers.bit_length() - 1]
+    return targets
+
+
+def _iter_bits(b: int) -> Generator[int, None, None]:
+    while b:
+        low = b & -b
+        yield low.bit_length() - 1
+        b ^= low
+
+
+_OPPOSITE = {Color.WHITE: Color.BLACK, Color.BLACK: Color.WHITE}
+_TO = MoveCode.TO_SHIFT
+KING, QUEEN, ROOK, BISHOP, KNIGHT, PAWN = (PieceType.KING, PieceType.QUEEN, PieceType.ROOK,
+                                          PieceType.BISHOP, PieceType.KNIGHT, PieceType.PAWN)
+
+
+class BitBoard(Board):
+    """
+    位棋盘实现：为每种颜色、每种兵种维护一个整数位掩码与占位掩码，网格与棋子集合只作为对外接口的镜像
+    （MoveCode 编码、Move 对象、grid、pieces 均照常可用）。
+    走法生成、攻击与将军判定都是掩码运算，不维护攻击计数表，执行/撤销只更新掩码、网格与哈希；
+    将军与牵制信息按局面哈希缓存，is_in_check 与随后同一方的走法生成共用一次计算。
+    """
+    track_attacks = False # 攻击判定直接由位运算完成，无需维护攻击计数表
+
+    def __init__(self, rows=8, cols=8):
+        self.geo = Geometry.get(rows, cols)
+        self.bb: dict[Color, dict[PieceType, int]] = {}
+        self.occ: dict[Color, int] = {}
+        super().__init__(rows, cols)
+        self._reset_bitboards()
+
+    def _reset_bitboards(self):
+        self.bb = {color: dict.fromkeys(PieceType, 0) for color in Color}
+        self.occ = {Color.WHITE: 0, Color.BLACK: 0}
+        self._context_key: tuple[int, Color] | None = None
+        self._context = None
+
+    # --- 棋子增删改：只更新掩码、网格、王位置与哈希（不经过基类的攻击计数表分支） ---
+    def _reset(self):
+        super()._reset()
+        self._reset_bitboards()
+
+    def _add_piece(self, piece: Piece):
+        r, c = piece.position
+        bit = 1 << (r * self.cols + c)
+        self.bb[piece.color][piece.type] |= bit
+        self.occ[piece.color] |= bit
+        self.hash ^= self.zobrist.piece_key(piece, piece.position)
+        self.grid[r][c] = piece
+        self.pieces[piece.color].add(piece)
+        if piece.type == KING:
+            self.king_pos[piece.color] = piece.position
+
+    def _remove_piece(self, piece: Piece):
+        r, c = piece.position
+        bit = 1 << (r * self.cols + c)
+        self.bb[piece.color][piece.type] &= ~bit
+        self.occ[piece.color] &= ~bit
+        self.hash ^= self.zobrist.piece_key(piece, piece.position)
+        self.grid[r][c] = None
+        self.pieces[piece.color].discard(piece)
+
+    def _move_piece(self, piece: Piece, end: tuple[int, int]):
+        sr, sc = piece.position
+        er, ec = end
+        cols = self.cols
+        start_sq, end_sq = sr * cols + sc, er * cols + ec
+        flip = (1 << start_sq) | (1 << end_sq)
+        self.bb[piece.color][piece.type] ^= flip
+        self.occ[piece.color] ^= flip
+        keys = self.zobrist.pieces[(piece.color, piece.type)]
+        self.hash ^= keys[start_sq] ^ keys[end_sq]
+        self.grid[sr][sc] = None
+        self.grid[er][ec] = piece
+        piece.position = end
+        if piece.type == KING:
+            self.king_pos[piece.color] = end
+
+    def _set_piece_type(self, piece: Piece, piece_type: PieceType):
+        r, c = piece.position
+        bit = 1 << (r * self.cols + c)
+        self.bb[piece.color][piece.type] &= ~bit
+        self.bb[piece.color][piece_type] |= bit
+        self.hash ^= self.zobrist.piece_key(piece, piece.position)
+        piece.type = piece_type
+        self.hash ^= self.zobrist.piece_key(piece, piece.position)
+
+    def disambiguation_candidates(self, piece: Piece, end: tuple[int, int]) -> list[tuple[int, int]]:
+        """从目标格反查同类友方棋子（掩码运算），只对候选检查合法性"""
+        color, p_type = piece.color, piece.type
+        cols = self.cols
+        others = self.bb[color][p_type] & ~(1 << (piece.position[0] * cols + piece.position[1]))
+        if not others:
+            return [] # 没有其他同类棋子
+        end_sq = end[0] * cols + end[1]
+        geo = self.geo
+        occ = self.occ[Color.WHITE] | self.occ[Color.BLACK]
+        if p_type == KNIGHT:
+            others &= geo.knight[end_sq]
+        else:
+            reach = 0
+            if p_type in (ROOK, QUEEN):
+                reach |= _slide(geo.ortho[end_sq], occ)
+            if p_type in (BISHOP, QUEEN):
+                reach |= _slide(geo.diag[end_sq], occ)
+            others &= reach
+        if not others:
+            return []
+        ctx = self._legal_context(color)
+        if ctx is None:
+            return []
+        _, _, _, pins, evasion = ctx
+        end_bit = 1 << end_sq
+        return [geo.coords[sq] for sq in _iter_bits(others) if end_bit & evasion & pins.get(sq, -1)]
+
+    # --- 攻击判定 ---
+    def _is_attacked(self, sq: int, by_color: Color, occ: int, exclude: int = 0) -> bool:
+        """sq 是否被 by_color 攻击；occ 为假设的占位，exclude 为视为已被吃掉的格子"""
+        geo = self.geo
+        bb = self.bb[by_color]
+        keep = ~exclude
+        # 能攻击 sq 的兵所在格 = 从 sq 出发按对方兵的方向取攻击格
+        if (geo.knight[sq] & bb[KNIGHT] | geo.pawn_attacks[_OPPOSITE[by_color]][sq] & bb[PAWN]
+                | geo.king[sq] & bb[KING]) & keep:
+            return True
+        queens = bb[QUEEN]
+        # 先用整条直线/斜线排除：不与 sq 同线的滑行子不必沿射线查找
+        rooks = (bb[ROOK] | queens) & keep & geo.ortho_lines[sq]
+        if rooks and _slide(geo.ortho[sq], occ) & rooks:
+            return True
+        bishops = (bb[BISHOP] | queens) & keep & geo.diag_lines[sq]
+        return bool(bishops and _slide(geo.diag[sq], occ) & bishops)
+
+    def _king_square(self, color: Color) -> int | None:
+        kings = self.bb[color][KING]
+        if not kings:
+            return None
+        return kings.bit_length() - 1
+
+    def is_square_attacked(self, pos: tuple[int, int], by_color: Color) -> bool:
+        return self._is_attacked(pos[0] * self.cols + pos[1], by_color, self.occ[Color.WHITE] | self.occ[Color.BLACK])
+
+    def is_in_check(self, color: Color):
+        ctx = self._legal_context(color)
+        if ctx is None: return True # 不应该发生
+        return ctx[2] != 0
+
+    def _checkers_and_pins(self, color: Color, ksq: int, occ: int) -> tuple[int, dict[int, int]]:
+        """
+        一次性计算将军棋子与被牵制棋子。
+        返回 (将军者掩码, {被牵制格: 允许移动的直线掩码})。
+        """
+        geo = self.geo
+        ebb = self.bb[_OPPOSITE[color]]
+        own = self.occ[color]
+        checkers = (geo.knight[ksq] & ebb[KNIGHT]) | (geo.pawn_attacks[color][ksq] & ebb[PAWN])
+        pins: dict[int, int] = {}
+        queens = ebb[QUEEN]
+        for rays, sliders in ((geo.ortho[ksq], (ebb[ROOK] | queens) & geo.ortho_lines[ksq]),
+                              (geo.diag[ksq], (ebb[BISHOP] | queens) & geo.diag_lines[ksq])):
+            if not sliders:
+                continue
+            for ray, _, positive in rays:
+                if not ray & sliders:
+                    continue
+                blockers = ray & occ
+                first = _nearest(blockers, positive)
+                if first & sliders:
+                    checkers |= first
+                elif first & own:
+                    rest = blockers & ~first
+                    if rest:
+                        second = _nearest(rest, positive)
+                        if second & sliders:
+                            pins[first.bit_length() - 1] = geo.between[ksq][second.bit_length() - 1] | second
+        return checkers, pins
+
+    def _legal_context(self, color: Color):
+        """(王格, 占位, 将军者, 牵制, 可走格掩码)，按 (局面哈希, 颜色) 缓存"""
+        key = (self.hash, color)
+        if self._context_key == key:
+            return self._context
+        ksq = self._king_square(color)
+        if ksq is None:
+            ctx = None
+        else:
+            occ = self.occ[Color.WHITE] | self.occ[Color.BLACK]
+            checkers, pins = self._checkers_and_pins(color, ksq, occ)
+            if not checkers:
+                evasion = -1 # 全部格子
+            elif checkers & (checkers - 1):
+                evasion = 0 # 双将：只能动王
+            else:
+                evasion = checkers | self.geo.between[ksq].get(checkers.bit_length() - 1, 0)
+            ctx = ksq, occ, checkers, pins, evasion
+        self._context_key, self._context = key, ctx
+        return ctx
+
+    # --- 走法生成：每种棋子按掩码一次算出目标格，直接追加编码 ---
+    def _king_codes(self, sq: int, color: Color, ctx, codes: list[int]):
+        ksq, occ, checkers, pins, evasion = ctx
+        targets = self.geo.king[sq] & ~self.occ[color]
+        if targets:
+            enemy = _OPPOSITE[color]
+            occ_wo_king = occ ^ (1 << sq)
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                t = low.bit_length() - 1
+                if not self._is_attacked(t, enemy, occ_wo_king):
+                    codes.append(sq | t << _TO)
+        r, c = self.geo.coords[sq]
+        if not checkers and self.grid[r][c].step == 0:
+            self._castling_codes(sq, color, occ, codes)
+
+    def _slider_codes(self, sq: int, p_type: PieceType, color: Color, ctx, codes: list[int]):
+        _, occ, _, pins, evasion = ctx
+        geo = self.geo
+        if p_type == KNIGHT:
+            targets = geo.knight[sq]
+        elif p_type == ROOK:
+            targets = _slide(geo.ortho[sq], occ)
+        elif p_type == BISHOP:
+            targets = _slide(geo.diag[sq], occ)
+        else:
+            targets = _slide(geo.ortho[sq], occ) | _slide(geo.diag[sq], occ)
+        targets &= ~self.occ[color] & evasion
+        if sq in pins:
+            targets &= pins[sq]
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            codes.append(sq | (low.bit_length() - 1) << _TO)
+
+    def _pawn_codes(self, sq: int, color: Color, ctx, codes: list[int]):
+        ksq, occ, checkers, pins, evasion = ctx
+        geo = self.geo
+        cols = self.cols
+        r, c = geo.coords[sq]
+        allowed = evasion & pins[sq] if sq in pins else evasion
+        if color == Color.WHITE:
+            direction, promotion_row = -1, 0
+        else:
+            direction, promotion_row = 1, self.rows - 1
+
+        # 1. 前进
+        tr = r + direction
+        if 0 <= tr < self.rows:
+            t = sq + direction * cols
+            if not (1 << t) & occ:
+                if (1 << t) & allowed:
+                    codes.append(sq | t << _TO | MoveCode.PROMOTION if tr == promotion_row else sq | t << _TO)
+                if tr != promotion_row and self.grid[r][c].step == 0:
+                    tr2 = tr + direction
+                    if 0 <= tr2 < self.rows:
+                        t2 = t + direction * cols
+                        if not (1 << t2) & occ and (1 << t2) & allowed:
+                            codes.append(sq | t2 << _TO)
+
+        # 2. 吃子
+        captures = geo.pawn_attacks[color][sq]
+        targets = captures & self.occ[_OPPOSITE[color]] & allowed
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            t = low.bit_length() - 1
+            codes.append(sq | t << _TO | MoveCode.PROMOTION if t // cols == promotion_row else sq | t << _TO)
+
+        # 3. 过路兵：被吃的兵与吃子兵同时离开所在行，可能暴露横向牵制，直接做占位检验
+        last_move = self.last_move
+        if last_move:
+            l_start, l_end, l_piece = last_move.start, last_move.end, last_move.piece
+            if l_piece and l_piece.type == PAWN and l_piece.color != color \
+                    and abs(l_start[0] - l_end[0]) == 2 and l_end[0] == r and abs(l_end[1] - c) == 1:
+                tr, tc = r + direction, l_end[1]
+                if 0 <= tr < self.rows:
+                    t = tr * cols + tc
+                    cap = 1 << (l_end[0] * cols + l_end[1])
+                    if not (1 << t) & occ and (1 << t) & captures:
+                        occ2 = (occ ^ (1 << sq) ^ cap) | (1 << t)
+                        if not self._is_attacked(ksq, _OPPOSITE[color], occ2, exclude=cap):
+                            codes.append(sq | t << _TO | MoveCode.EN_PASSANT)
+
+    def _castling_codes(self, sq: int, color: Color, occ: int, codes: list[int]):
+        r, c = self.geo.coords[sq]
+        enemy_color = _OPPOSITE[color]
+        cols = self.cols
+        for rook_col in [0, cols - 1]:
+            rook = self.grid[r][rook_col]
+            if rook and rook.type == ROOK and rook.step == 0:
+                step = 1 if rook_col > c else -1
+                if any((1 << (r * cols + col)) & occ for col in range(c + step, rook_col, step)):
+                    continue # 路被阻挡
+                target_col = c + 2 * step
+                check_path = range(c + step, target_col + step, step)
+                if all(not self._is_attacked(r * cols + col, enemy_color, occ) for col in check_path):
+                    codes.append(MoveCode.pack(sq, r * cols + target_col, MoveCode.CASTLING))
+
+    def _piece_codes(self, sq: int, p_type: PieceType, color: Color, ctx, codes: list[int]):
+        if p_type == KING:
+            self._king_codes(sq, color, ctx, codes)
+        elif ctx[4] == 0:
+            return # 双将：只能动王
+        elif p_type == PAWN:
+            self._pawn_codes(sq, color, ctx, codes)
+        else:
+            self._slider_codes(sq, p_type, color, ctx, codes)
+
+    def _legal_codes(self, color: Color) -> list[int]:
+        """一方全部合法走法的编码"""
+        ctx = self._legal_context(color)
+        if ctx is None:
+            return []
+        codes: list[int] = []
+        bb = self.bb[color]
+        for p_type in (KING, PAWN, KNIGHT, BISHOP, ROOK, QUEEN):
+            pieces = bb[p_type]
+            while pieces:
+                low = pieces & -pieces
+                pieces ^= low
+                self._piece_codes(low.bit_length() - 1, p_type, color, ctx, codes)
+        return codes
+
+    def _legal_move_generator(self, color):
+        return iter(self._legal_codes(color))
+
+    def get_piece_legal_codes(self, pos:tuple[int,int], color:Color) -> list[int]:
+        r, c = pos
+        piece = self.grid[r][c]
+        if not piece or piece.color != color:
+            return []
+        ctx = self._legal_context(color)
+        if ctx is None:
+            return []
+        codes: list[int] = []
+        self._piece_codes(r * self.cols + c, piece.type, color, ctx, codes)
+        return codes
@@ -2,13 +2,18 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 from .constants import Color, PieceType
+from .move import MoveCode
 from .rules import MoveRules
+from .zobrist import Zobrist
 
 if TYPE_CHECKING:
     from .piece import Piece
     from .move import Move
 
 class Board:
+    # 是否增量维护攻击计数表；自带位运算攻击判定的子类可以关闭
+    track_attacks = True
+
     def __init__(self, rows=8, cols=8):
         self.rows = rows
         self.cols = cols
@@ -18,13 +23,120 @@ class Board:
         # 缓存王的位置 (r, c)
         self.king_pos: dict[Color, tuple[int, int]|None] = {Color.WHITE: None, Color.BLACK: None}
         self.last_move: Move | None = None # 记录最后的 Move 对象
+        # 增量维护的 Zobrist 局面哈希（含轮次），随每次执行/撤销同步更新
+        self.zobrist = Zobrist.get(rows, cols)
+        self.hash = 0
+        self.castling_hash = 0 # hash 中当前易位权键的部分
+        self._check_info_key: tuple[int, Color] | None = None
+        self._check_info_cache = None
+        # 攻击计数表：attacks[color][r * cols + c] 为该方攻击此格的棋子数
+        self.attacks: dict[Color, list[int]] = {color: [0] * (rows * cols) for color in Color}
+
+    def _reset(self):
+        """清空棋盘上的全部棋子与缓存"""
+        self.grid = [[None for _ in range(self.cols)] for _ in range(self.rows)]
+        self.pieces = {Color.WHITE: set(), Color.BLACK: set()}
+        self.king_pos = {Color.WHITE: None, Color.BLACK: None}
+        self.last_move = None
+        self.hash = 0
+        self.castling_hash = 0
+        self.attacks = {color: [0] * (self.rows * self.cols) for color in Color}
 
+    # --- 棋子增删改的唯一入口：Move 的执行与撤销都只通过以下方法修改棋盘 ---
     def _add_piece(self, piece: Piece):
         r, c = piece.position
+        self.hash ^= self.zobrist.piece_key(piece, piece.position)
+        if self.track_attacks:
+            self._update_rays_through(piece.position, -1)
         self.grid[r][c] = piece
         self.pieces[piece.color].add(piece)
         if piece.type == PieceType.KING:
             self.king_pos[piece.color] = piece.position
+        if self.track_attacks:
+            self._update_attacks(piece, 1)
+
+    def _remove_piece(self, piece: Piece):
+        r, c = piece.position
+        self.hash ^= self.zobrist.piece_key(piece, piece.position)
+        if self.track_attacks:
+            self._update_attacks(piece, -1)
+        self.grid[r][c] = None
+        self.pieces[piece.color].discard(piece)
+        if self.track_attacks:
+            self._update_rays_through(piece.position, 1)
+
+    def _move_piece(self, piece: Piece, end: tuple[int, int]):
+        sr, sc = piece.position
+        er, ec = end
+        self.hash ^= self.zobrist.piece_key(piece, piece.position) ^ self.zobrist.piece_key(piece, end)
+        if self.track_attacks:
+            self._update_attacks(piece, -1)
+        self.grid[sr][sc] = None
+        if self.track_attacks:
+            self._update_rays_through((sr, sc), 1)
+            self._update_rays_through(end, -1)
+        self.grid[er][ec] = piece
+        piece.position = end
+        if piece.type == PieceType.KING:
+            self.king_pos[piece.color] = end
+        if self.track_attacks:
+            self._update_attacks(piece, 1)
+
+    def _set_piece_type(self, piece: Piece, piece_type: PieceType):
+        self.hash ^= self.zobrist.piece_key(piece, piece.position)
+        if self.track_attacks:
+            self._update_attacks(piece, -1)
+        piece.type = piece_type
+        if self.track_attacks:
+            self._update_attacks(piece, 1)
+        self.hash ^= self.zobrist.piece_key(piece, piece.position)
+
+    # --- 攻击计数表的增量维护 ---
+    def _update_attacks(self, piece: Piece, delta: int):
+        """累加（或扣除）棋子自身控制的格子"""
+        counts = self.attacks[piece.color]
+        cols = self.cols
+        for r, c in MoveRules.get_attacked_squares(self.grid, self.rows, self.cols, piece):
+            counts[r * cols + c] += delta
+
+    def _update_rays_through(self, pos: tuple[int, int], delta: int):
+        """
+        pos 的占用状态即将改变：看向 pos 的滑行子，其射线在 pos 之后的部分随之延伸（+1）或截断（-1）。
+        调用时 pos 视为空格。
+        """
+        r, c = pos
+        grid = self.grid
+        cols = self.cols
+        rays = MoveRules.tables(self.rows, cols).rays[r][c]
+        for i, ((_, p_types), ray) in enumerate(zip(MoveRules.SLIDING_DIRS, rays)):
+            # 沿该方向找到第一个棋子，它是否沿反方向滑行经过 pos
+            slider = None
+            for nr, nc in ray:
+                slider = grid[nr][nc]
+                if slider: break
+            if not slider or slider.type not in p_types:
+                continue
+            counts = self.attacks[slider.color]
+            for nr, nc in rays[MoveRules.OPPOSITE_DIR[i]]:
+                counts[nr * cols + nc] += delta
+                if grid[nr][nc]: break
+
+    def is_square_attacked(self, pos: tuple[int, int], by_color: Color) -> bool:
+        """查询某格是否受攻击：维护攻击表时为一次查表"""
+        if self.track_attacks:
+            return self.attacks[by_color][pos[0] * self.cols + pos[1]] > 0
+        return MoveRules.is_square_attacked(self.grid, self.rows, self.cols, pos, by_color)
+
+    def _update_castling(self):
+        """易位权可能改变（王/车首次移动或撤销回原位、未动过的车被吃或恢复）后重算其键"""
+        key = self.zobrist.castling_key(self)
+        self.hash ^= self.castling_hash ^ key
+        self.castling_hash = key
+
+    def _set_last_move(self, move: Move | None):
+        """切换最后一步：同时更新过路兵键并翻转轮次键"""
+        self.hash ^= self.zobrist.en_passant_key(self.last_move) ^ self.zobrist.en_passant_key(move) ^ self.zobrist.side
+        self.last_move = move
 
     def __str__(self):
         """
@@ -47,42 +159,129 @@ class Board:
     def is_in_check(self, color:Color):
         king_pos = self.king_pos[color]
         if not king_pos: return True # 不应该发生
-        return MoveRules.is_square_attacked(self.grid, self.rows, self.cols, king_pos, color.opposite())
+        return self.is_square_attacked(king_pos, color.opposite())
 
     def _legal_move_generator(self, color):
         """
-        内部生成器：产生所有合法的 Move 对象。
+        内部生成器：产生所有合法走法的 MoveCode 编码（不构造 Move 对象）。
         """
         for piece in self.pieces[color]:
-            yield from self.get_piece_legal_moves(piece.position, color)
+            yield from self.get_piece_legal_codes(piece.position, color)
+
+    def _check_info(self, color: Color):
+        """将军与牵制信息：每个局面只计算一次，以局面哈希为缓存键"""
+        key = (self.hash, color)
+        if self._check_info_key != key:
+            self._check_info_cache = MoveRules.get_check_info(self.grid, self.rows, self.cols, self.king_pos[color], color)
+            self._check_info_key = key
+        return self._check_info_cache
 
-    def get_piece_legal_moves(self, pos:tuple[int,int], color:Color):
-        """新增：仅计算特定位置棋子的合法移动（延迟计算的关键）"""
+    def is_piece_code_legal(self, code: int, color: Color) -> bool:
+        """单个非王、非过路兵的伪合法走法是否合法：只查将军/牵制信息，不生成走法"""
+        if not self.king_pos[color]:
+            return False
+        _, block, pins = self._check_info(color)
+        end = MoveCode.end_sq(code)
+        if block is not None and end not in block:
+            return False
+        line = pins.get(divmod(MoveCode.start_sq(code), self.cols))
+        return line is None or end in line
+
+    def disambiguation_candidates(self, piece: Piece, end: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        SAN 消歧：除 piece 外还有哪些同类友方棋子能合法走到 end（piece 不能是兵或王）。
+        目标格只被一个棋子控制时直接返回；否则从目标格反查候选，只对候选检查牵制/将军。
+        """
+        cols = self.cols
+        end_sq = end[0] * cols + end[1]
+        if self.track_attacks and self.attacks[piece.color][end_sq] <= 1:
+            return []
+        return [pos for pos in MoveRules.get_attackers(self.grid, self.rows, cols, end, piece.color, piece.type)
+                if pos != piece.position and self.is_piece_code_legal(MoveCode.pack(pos[0] * cols + pos[1], end_sq), piece.color)]
+
+    def _is_legal_by_execution(self, code: int, color: Color) -> bool:
+        """兜底判定：真实执行一次再检查是否被将军（仅用于过路兵等罕见情形）"""
+        # undo 会一并恢复 last_move 与局面哈希
+        move = MoveCode.to_move(self, code)
+        move.execute(self)
+        in_check = self.is_in_check(color)
+        move.undo(self)
+        return not in_check
+
+    def _is_king_target_safe(self, king_pos: tuple[int, int], target: tuple[int, int], color: Color) -> bool:
+        """王走到 target 是否安全：王自身会遮挡将军射线，因此还要排除沿将军线后退的格子"""
+        if not self.track_attacks:
+            kr, kc = king_pos
+            king = self.grid[kr][kc]
+            self.grid[kr][kc] = None
+            attacked = MoveRules.is_square_attacked(self.grid, self.rows, self.cols, target, color.opposite())
+            self.grid[kr][kc] = king
+            return not attacked
+
+        if self.is_square_attacked(target, color.opposite()):
+            return False
+        kr, kc = king_pos
+        for cr, cc in self._check_info(color)[0]:
+            checker = self.grid[cr][cc]
+            if checker.type in (PieceType.ROOK, PieceType.BISHOP, PieceType.QUEEN):
+                dr, dc = (kr > cr) - (kr < cr), (kc > cc) - (kc < cc)
+                if target == (kr + dr, kc + dc):
+                    return False
+        return True
+
+    def get_piece_legal_codes(self, pos:tuple[int,int], color:Color) -> list[int]:
+        """仅计算特定位置棋子的合法走法编码：借助将军/牵制信息直接过滤伪合法走法"""
         r, c = pos
         piece = self.grid[r][c]
         if not piece or piece.color != color:
             return []
+        if not self.king_pos[color]:
+            return [] # 没有王时任何走法都视为非法（与 is_in_check 约定一致）
 
-        legal_moves:list[Move] = []
-        for move in piece.get_valid_moves(self.grid, self.rows, self.cols, self.last_move):
-            orig_last_move = self.last_move
-            move.execute(self)
-            in_check = self.is_in_check(color)
-            move.undo(self)
-            self.last_move = orig_last_move
-            
-            if not in_check:
-                legal_moves.append(move)
-        return legal_moves
+        if piece.type == PieceType.KING:
+            enemy = color.opposite()
+            candidates = piece.get_valid_moves(self.grid, self.rows, self.cols, self.last_move,
+                                               lambda square: self.is_square_attacked(square, enemy))
+            # 易位在生成时已校验起点、路径与终点均不受攻击
+            cols = self.cols
+            return [code for code in candidates
+                    if code & MoveCode.TYPE_MASK == MoveCode.CASTLING
+                    or self._is_king_target_safe(pos, divmod(MoveCode.end_sq(code), cols), color)]
+
+        candidates = piece.get_valid_moves(self.grid, self.rows, self.cols, self.last_move)
+        checkers, block, pins = self._check_info(color)
+        if block is not None and not block:
+            return [] # 双将
+        line = pins.get(pos)
+
+        legal_codes: list[int] = []
+        for code in candidates:
+            if code & MoveCode.TYPE_MASK == MoveCode.EN_PASSANT:
+                # 过路兵同时移走两个棋子，可能暴露横向牵制，直接执行判定
+                if self._is_legal_by_execution(code, color):
+                    legal_codes.append(code)
+                continue
+            end = MoveCode.end_sq(code)
+            if block is not None and end not in block:
+                continue
+            if line is not None and end not in line:
+                continue
+            legal_codes.append(code)
+        return legal_codes
+
+    def get_piece_legal_moves(self, pos:tuple[int,int], color:Color) -> list[Move]:
+        """特定位置棋子的合法移动（构造完整的 Move 对象，供执行与序列化使用）"""
+        return [MoveCode.to_move(self, code) for code in self.get_piece_legal_codes(pos, color)]
 
     def has_legal_moves(self, color):
         """判断是否存在至少一个合法移动（用于将死或僵局的快速判定）"""
-        return any(self._legal_move_generator(color))
+        return next(self._legal_move_generator(color), None) is not None
 
     def get_legal_moves(self, color):
         """获取所有合法移动，按起始坐标分组"""
         legal_moves = {}
-        for move in self._legal_move_generator(color):
+        for code in self._legal_move_generator(color):
+            move = MoveCode.to_move(self, code)
             legal_moves.setdefault(move.start, []).append(move)
         return legal_moves
 
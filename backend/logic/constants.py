@@ -4,6 +4,9 @@ class Color(Enum):
     WHITE = "white"
     BLACK = "black"
 
+    # 成员是单例，按身份哈希即可；Enum 默认的 __hash__ 是 Python 层实现，作为字典键时开销明显
+    __hash__ = object.__hash__
+
     def opposite(self):
         return Color.BLACK if self == Color.WHITE else Color.WHITE
 
@@ -15,6 +18,8 @@ class PieceType(Enum):
     QUEEN = "Q"
     KING = "K"
 
+    __hash__ = object.__hash__
+
 class MoveType(Enum):
     NORMAL = "normal"
     EN_PASSANT = "en_passant"
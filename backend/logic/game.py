@@ -1,18 +1,27 @@
 import os
 import json
+import sys
 
-from backend.logic.move import Move
+from backend.logic.move import Move, MoveCode
+from . import analysis
 from .board import Board
 from .constants import Color, MoveType, GameStatus
+from .history import FenHistory
 from .notation import NotationHandler
+from .pgn import PGNGame
+from .search import Searcher, SearchResult
 
 class Game:
-    def __init__(self):
-        self.board = Board()
+    def __init__(self, board_cls: type[Board] = Board):
+        # board_cls 可切换棋盘实现（如 BitBoard），两者对外接口一致
+        self.board_cls = board_cls
+        self.board = board_cls()
         self.turn = Color.WHITE
-        self.history:list[Move] = []  # 存储 Move 对象序列，用于撤销 and SAN 显示
-        self.fen_history = []  # 缓存 FEN 历史，用于历史轨迹查看
+        self.history:list[Move] = []  # 存储 Move 对象序列，用于撤销 and SAN 显示（坐标元组与 SAN 字符串共享，每步约一个对象）
+        self.fen_history: FenHistory | None = None  # 按需生成的 FEN 历史，用于历史轨迹查看
+        self.position_counts: dict[int, int] = {}  # 局面哈希 -> 出现次数，用于 O(1) 三次重复判定
         self.status = GameStatus.ONGOING
+        self.version = 0  # 状态版本号：每次落子/撤销加一，供客户端增量同步
         
         # 加载默认配置或执行默认初始化
         self._load_settings()
@@ -42,26 +51,38 @@ class Game:
             self.turn = Color.WHITE
             
         self.history = []
-        self.fen_history = [NotationHandler.generate_board_fen(self.board, self.turn)]
+        self.fen_history = FenHistory(fen, self.current_fen)
+        self.position_counts = {self.board.hash: 1}
         self.status = GameStatus.ONGOING
 
-    def load_pgn(self, content):
-        """利用 NotationHandler 简化 PGN 加载逻辑"""
-        start_fen, moves = NotationHandler.parse_pgn(content)
+    def current_fen(self) -> str:
+        """由实时棋盘生成当前局面的 FEN"""
+        return NotationHandler.generate_board_fen(self.board, self.turn)
+
+    def load_pgn(self, content: str | PGNGame, strict: bool = False):
+        """
+        利用 NotationHandler 简化 PGN 加载逻辑；content 可以是 PGN 文本或已解析的 PGNGame。
+        strict 为 True 时遇到无法解析或不合法的走法抛出 ValueError，否则跳过该步。
+        """
+        if isinstance(content, PGNGame):
+            start_fen, moves = content.start_fen or NotationHandler.DEFAULT_FEN, content.moves
+        else:
+            start_fen, moves = NotationHandler.parse_pgn(content)
         self.load_fen(start_fen)
-        for move_str in moves:
+        for ply, move_str in enumerate(moves, 1):
             start, target, promo = NotationHandler.parse_san_to_move(move_str, self.turn, self.board)
-            if start and target:
-                self.make_move(start, target, promo)
+            if start and target and self.make_move(start, target, promo)[0]:
+                continue
+            if strict:
+                raise ValueError(f"第 {ply} 步无法执行: {move_str}")
 
     @staticmethod
-    def get_moves_for_fen(fen: str, pos: tuple[int, int]):
+    def get_moves_for_fen(fen: str, pos: tuple[int, int], board_cls: type[Board] = Board):
         """
         静态工具方法：在任意 FEN 局面上计算特定位置的合法移动。
         用于历史研究、复盘分析等无状态场景。
         """
-        from .board import Board
-        temp_board = Board()
+        temp_board = board_cls()
         NotationHandler.parse_fen_to_board(temp_board, fen)
         
         r, c = pos
@@ -72,6 +93,40 @@ class Game:
         # 传入该棋子自身的颜色进行合法性判定
         return temp_board.get_piece_legal_moves(pos, piece.color)
 
+    @staticmethod
+    def moves_to_san(fen: str, moves: list[str], board_cls: type[Board] = Board) -> list[str]:
+        """
+        静态工具方法：把从 fen 开始的一整局 UCI 坐标走法转换为 SAN 列表。
+        遇到非法走法时抛出 ValueError（信息中包含步数）。
+        """
+        board = board_cls()
+        NotationHandler.parse_fen_to_board(board, fen)
+        parts = fen.split()
+        turn = Color.BLACK if len(parts) > 1 and parts[1] == 'b' else Color.WHITE
+
+        sans = []
+        for ply, uci in enumerate(moves, 1):
+            start, target, promo = NotationHandler.parse_uci(uci, board.rows)
+            end_sq = target[0] * board.cols + target[1]
+            code = None
+            if 0 <= start[0] < board.rows and 0 <= start[1] < board.cols:
+                code = next((c for c in board.get_piece_legal_codes(start, turn) if MoveCode.end_sq(c) == end_sq), None)
+            if code is None:
+                raise ValueError(f"第 {ply} 步不合法: {uci}")
+            if code & MoveCode.TYPE_MASK == MoveCode.PROMOTION:
+                code = MoveCode.with_promotion(code, promo or "Q")
+            sans.append(NotationHandler.play_san(board, turn, code))
+            turn = turn.opposite()
+        return sans
+
+    @staticmethod
+    def analyze_fen(fen: str, squares: list[tuple[int, int]] | None = None, board_cls: type[Board] = Board) -> dict:
+        """
+        静态工具方法：局面状态与合法走法表（含 SAN），结果经进程内 LRU 缓存。
+        squares 为 None 时返回行棋方的全部走法；否则只返回指定格子上棋子的走法（按棋子自身颜色判定）。
+        """
+        return analysis.analyze_fen(fen, squares, board_cls)
+
     def get_piece_legal_moves(self, pos):
         """当前对局中获取特定位置棋子的合法移动"""
         r, c = pos
@@ -80,22 +135,52 @@ class Game:
             return []
         return self.board.get_piece_legal_moves(pos, piece.color)
 
+    def search_best_move(self, max_depth: int | None = None, time_limit: float | None = None) -> SearchResult:
+        """为当前行棋方搜索最佳走法（不落子）"""
+        return Game.search_fen(self.current_fen(), max_depth, time_limit, set(self.position_counts), self.board_cls)
+
+    @staticmethod
+    def search_fen(fen: str, max_depth: int | None = None, time_limit: float | None = None,
+                   seen: set[int] | None = None, board_cls: type[Board] = Board) -> SearchResult:
+        """
+        静态工具方法：在由 FEN 重建的独立棋盘上搜索，不依赖任何对局对象，
+        可以安全地放到线程或进程中执行。seen 为对局中已出现过的局面哈希。
+        """
+        board = board_cls()
+        NotationHandler.parse_fen_to_board(board, fen)
+        turn = Color.BLACK if len(fen.split()) > 1 and fen.split()[1] == 'b' else Color.WHITE
+        return Searcher(board).search(turn, max_depth, time_limit, seen=seen)
+
+    def play_code(self, code: int):
+        """按 MoveCode 落子（用于引擎给出的走法）"""
+        cols = self.board.cols
+        start = divmod(MoveCode.start_sq(code), cols)
+        end = divmod(MoveCode.end_sq(code), cols)
+        return self.make_move(start, end, MoveCode.promotion_choice(code))
+
     def make_move(self, start, end, promotion_choice=None):
         if self.status != GameStatus.ONGOING:
             return False, "游戏已结束"
 
-        # 1. 验证合法性并获取完整的 Move 对象
-        legal_moves = self.get_piece_legal_moves(start)
-        move = next((m for m in legal_moves if m.end == end), None)
+        # 1. 在合法走法编码中查找目标格，只为真正执行的这一步构造 Move 对象
+        r, c = start
+        piece = self.board.grid[r][c]
+        if not piece:
+            return False, "非法移动"
+        end_sq = end[0] * self.board.cols + end[1]
+        codes = self.board.get_piece_legal_codes(start, piece.color)
+        code = next((code for code in codes if MoveCode.end_sq(code) == end_sq), None)
         
-        if not move:
+        if code is None:
             return False, "非法移动"
+        move = MoveCode.to_move(self.board, code)
 
         # 2. 如果是升变，记录选择
         if move.move_type == MoveType.PROMOTION:
             move.promotion_choice = (promotion_choice or "Q").upper()
 
-        # 3. 执行单次物理移动
+        # 3. 在走棋前的局面上生成记谱主体（消歧需要看到同类棋子的原位置），再执行单次物理移动
+        san = NotationHandler.generate_san(self.board, move)
         move.execute(self.board)
 
         # 4. 更新对局状态（将军、将死、平局）
@@ -108,16 +193,19 @@ class Game:
         elif self.board.is_stalemate(opponent_color):
             self.status = GameStatus.DRAW
 
-        # 5. 生成记谱并记录历史对象
-        move.san = NotationHandler.generate_san(self.board, move)
+        # 5. 生成记谱并记录历史对象（记谱驻留：各房间历史中相同的 SAN 共用一个字符串）
+        move.san = sys.intern(san + ("#" if move.is_checkmate else "+" if move.is_check else ""))
         self.history.append(move)
 
         # 6. 切换回合与历史记录
         self.turn = opponent_color
-        current_fen = NotationHandler.generate_board_fen(self.board, self.turn)
-        self.fen_history.append(current_fen)
-        
-        if self.status == GameStatus.ONGOING and self.fen_history.count(current_fen) >= 3:
+        self.fen_history.push(MoveCode.from_move(move, self.board.cols))
+        self.version += 1
+
+        # 7. 三次重复局面判定：哈希计数查表即可
+        position = self.board.hash
+        self.position_counts[position] = self.position_counts.get(position, 0) + 1
+        if self.status == GameStatus.ONGOING and self.position_counts[position] >= 3:
             self.status = GameStatus.DRAW
             
         return True, "成功"
@@ -127,20 +215,22 @@ class Game:
         if not self.history:
             return False, "没有可撤销的移动"
         
-        # 1. 弹出最后的移动对象
+        # 1. 弹出最后的移动对象，并从重复计数中移除当前局面
         last_move = self.history.pop()
+        position = self.board.hash
+        self.position_counts[position] -= 1
+        if not self.position_counts[position]:
+            del self.position_counts[position]
         
-        # 2. 调用命令对象的 undo
+        # 2. 调用命令对象的 undo（同时恢复 board.last_move 与局面哈希）
         last_move.undo(self.board)
         
         # 3. 同步其他状态
-        self.fen_history.pop()
         self.turn = self.turn.opposite()
+        self.fen_history.pop()
+        self.version += 1
         self.status = GameStatus.ONGOING
         
-        # 4. 恢复 board.last_move 为上一个移动（如果存在）
-        self.board.last_move = self.history[-1] if self.history else None
-        
         return True, "撤销成功"
 
     def get_state_dict(self):
@@ -151,5 +241,5 @@ class Game:
             "turn": self.turn.value,
             "status": self.status.value,
             "history": [m.san for m in self.history],
-            "fen_history": self.fen_history
+            "fen_history": list(self.fen_history)
         }
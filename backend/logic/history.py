@@ -0,0 +1,108 @@
+"""
+按需生成的 FEN 历史：对局只保存走法编码与每隔若干步一个检查点 FEN，
+任意一步的 FEN 在被请求时从最近的检查点重放得到，并放入有界的缓存。
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Callable, Iterator
+
+from .board import Board
+from .constants import Color
+from .move import MoveCode
+from .notation import NotationHandler
+
+# 每隔多少步保存一个检查点（重放任意一步最多执行这么多步）
+CHECKPOINT_INTERVAL = 16
+# 已生成 FEN 的缓存条数
+MEMO_SIZE = 32
+
+
+class FenHistory(Sequence):
+    """
+    与原先的 FEN 字符串列表接口一致（len、下标、负下标、切片、迭代），第 i 项为第 i 步之后的局面。
+    第 0 项是载入时的 FEN 原文（仅布局的简写 FEN 规范化为完整 FEN），最后一项（当前局面）直接由对局的实时棋盘生成。
+    """
+    def __init__(self, start_fen: str, current: Callable[[], str], interval: int = CHECKPOINT_INTERVAL, memo_size: int = MEMO_SIZE):
+        self.interval = interval
+        self.memo_size = memo_size
+        self.codes: list[int] = []
+        # 检查点：步数 -> 用于重放的 FEN；第 0 步保留原始输入（仅布局的简写 FEN 与完整 FEN 语义不同）
+        self.checkpoints: dict[int, str] = {0: start_fen}
+        self._current = current
+        self._current_fen: str | None = None
+        self._memo: OrderedDict[int, str] = OrderedDict()
+
+    @property
+    def start_fen(self) -> str:
+        return self.checkpoints[0]
+
+    def push(self, code: int):
+        """记录刚在实时棋盘上执行的一步；到达检查点时保存当前局面"""
+        self.codes.append(code)
+        self._current_fen = None
+        if len(self.codes) % self.interval == 0:
+            self.checkpoints[len(self.codes)] = self._current()
+
+    def pop(self):
+        """撤销最后一步"""
+        ply = len(self.codes)
+        self.codes.pop()
+        self.checkpoints.pop(ply, None)
+        self._memo.pop(ply, None)
+        self._current_fen = None
+
+    def __len__(self) -> int:
+        return len(self.codes) + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("FEN 历史下标越界")
+        if index == 0 and NotationHandler.is_complete_fen(self.start_fen):
+            return self.start_fen
+        if index == n - 1:
+            if self._current_fen is None:
+                self._current_fen = self._current()
+            return self._current_fen
+
+        fen = self._memo.get(index)
+        if fen is not None:
+            self._memo.move_to_end(index)
+            return fen
+        base = index - index % self.interval
+        board, turn = self._replay_board(base)
+        for code in self.codes[base:index]:
+            MoveCode.to_move(board, code).execute(board)
+            turn = turn.opposite()
+        fen = NotationHandler.generate_board_fen(board, turn)
+        self._memo[index] = fen
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return fen
+
+    def __iter__(self) -> Iterator[str]:
+        """顺序遍历只重放一遍整局，不写入缓存"""
+        board, turn = self._replay_board(0)
+        yield self.start_fen if NotationHandler.is_complete_fen(self.start_fen) else NotationHandler.generate_board_fen(board, turn)
+        last = len(self.codes) - 1
+        for ply, code in enumerate(self.codes):
+            if ply == last:
+                yield self[-1]
+                return
+            MoveCode.to_move(board, code).execute(board)
+            turn = turn.opposite()
+            yield NotationHandler.generate_board_fen(board, turn)
+
+    def _replay_board(self, ply: int) -> tuple[Board, Color]:
+        fen = self.checkpoints[ply]
+        # 重放只需执行走法与生成 FEN，用不维护攻击计数表的网格棋盘即可（与对局使用哪种棋盘实现无关）
+        board = Board()
+        board.track_attacks = False
+        NotationHandler.parse_fen_to_board(board, fen)
+        parts = fen.split()
+        return board, Color.BLACK if len(parts) > 1 and parts[1] == 'b' else Color.WHITE
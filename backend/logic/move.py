@@ -1,4 +1,5 @@
 from __future__ import annotations
+from functools import lru_cache
 from typing import TYPE_CHECKING, Any
 from .constants import MoveType, PieceType
 
@@ -6,10 +7,100 @@ if TYPE_CHECKING:
     from .piece import Piece
     from .board import Board
 
+class MoveCode:
+    """
+    紧凑走法编码：一个 int 依次打包起点格(12 位)、终点格(12 位)、走法类型(2 位)与升变选择(3 位)，
+    格子下标为 r * cols + c。走法生成与合法性过滤只传递编码，真正执行或序列化时才用 to_move 构造 Move。
+    """
+    SQUARE_MASK = (1 << 12) - 1
+    SQUARES_MASK = (1 << 24) - 1  # 起止格部分，可作为历史启发等表的键
+    TO_SHIFT = 12
+    TYPE_SHIFT = 24
+    PROMOTION_SHIFT = 26
+    TYPE_MASK = 3 << TYPE_SHIFT
+    # 走法类型标记，直接与起止格按位或
+    NORMAL = 0
+    EN_PASSANT = 1 << TYPE_SHIFT
+    CASTLING = 2 << TYPE_SHIFT
+    PROMOTION = 3 << TYPE_SHIFT
+    TYPES = (MoveType.NORMAL, MoveType.EN_PASSANT, MoveType.CASTLING, MoveType.PROMOTION)
+    PROMOTIONS = (None, "Q", "R", "B", "N")
+
+    @staticmethod
+    def pack(start_sq: int, end_sq: int, flag: int = 0, promotion_choice: str | None = None) -> int:
+        code = start_sq | (end_sq << MoveCode.TO_SHIFT) | flag
+        if promotion_choice:
+            code |= MoveCode.PROMOTIONS.index(promotion_choice.upper()) << MoveCode.PROMOTION_SHIFT
+        return code
+
+    @staticmethod
+    def start_sq(code: int) -> int:
+        return code & MoveCode.SQUARE_MASK
+
+    @staticmethod
+    def end_sq(code: int) -> int:
+        return (code >> MoveCode.TO_SHIFT) & MoveCode.SQUARE_MASK
+
+    @staticmethod
+    def flag(code: int) -> int:
+        return code & MoveCode.TYPE_MASK
+
+    @staticmethod
+    def move_type(code: int) -> MoveType:
+        return MoveCode.TYPES[(code & MoveCode.TYPE_MASK) >> MoveCode.TYPE_SHIFT]
+
+    @staticmethod
+    def promotion_choice(code: int) -> str | None:
+        return MoveCode.PROMOTIONS[code >> MoveCode.PROMOTION_SHIFT]
+
+    @staticmethod
+    def with_promotion(code: int, promotion_choice: str | None) -> int:
+        """替换编码中的升变选择（升变只生成一次，执行前再决定选哪种棋子）"""
+        code &= (1 << MoveCode.PROMOTION_SHIFT) - 1
+        if promotion_choice:
+            code |= MoveCode.PROMOTIONS.index(promotion_choice.upper()) << MoveCode.PROMOTION_SHIFT
+        return code
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def squares(rows: int, cols: int) -> tuple[tuple[int, int], ...]:
+        """格子下标 -> (r, c)；同一尺寸的棋盘共用这些元组，走法历史中的每一步不再各自持有坐标元组"""
+        return tuple(divmod(sq, cols) for sq in range(rows * cols))
+
+    @staticmethod
+    def to_move(board: Board, code: int) -> Move:
+        """在当前局面上把编码还原为可执行的 Move 对象（棋子引用取自 board.grid）"""
+        grid = board.grid
+        squares = MoveCode.squares(board.rows, board.cols)
+        start = squares[code & MoveCode.SQUARE_MASK]
+        end = squares[(code >> MoveCode.TO_SHIFT) & MoveCode.SQUARE_MASK]
+        piece = grid[start[0]][start[1]]
+        flag = code & MoveCode.TYPE_MASK
+        if flag == MoveCode.CASTLING:
+            return CastlingMove(start, end, piece, is_kingside=end[1] > start[1])
+        if flag == MoveCode.EN_PASSANT:
+            # 被吃的兵与吃子兵同行、与终点同列
+            return EnPassantMove(start, end, piece, captured_piece=grid[start[0]][end[1]])
+        captured = grid[end[0]][end[1]]
+        if flag == MoveCode.PROMOTION:
+            return PromotionMove(start, end, piece, captured_piece=captured,
+                                 promotion_choice=MoveCode.promotion_choice(code))
+        return Move(start, end, piece, captured_piece=captured)
+
+    @staticmethod
+    def from_move(move: Move, cols: int) -> int:
+        flag = MoveCode.TYPES.index(move.move_type) << MoveCode.TYPE_SHIFT
+        return MoveCode.pack(move.start[0] * cols + move.start[1], move.end[0] * cols + move.end[1],
+                             flag, move.promotion_choice)
+
+
 class Move:
     """
     命令模式核心：每个移动对象都知道如何执行和撤销自己。
     """
+    __slots__ = ("start", "end", "piece", "captured_piece", "move_type", "promotion_choice",
+                 "prev_last_move", "is_check", "is_checkmate", "san")
+
     def __init__(
         self, 
         start: tuple[int, int], 
@@ -25,6 +116,7 @@ class Move:
         self.captured_piece = captured_piece
         self.move_type = move_type
         self.promotion_choice = promotion_choice
+        self.prev_last_move: Move | None = None
         
         # 结果标记
         self.is_check = False
@@ -35,47 +127,39 @@ class Move:
         return self.san if self.san else f"Move({self.start}->{self.end})"
 
     def execute(self, board: Board):
-        sr, sc = self.start
-        er, ec = self.end
-        
+        # 0. 记录执行前的最后一步，撤销时恢复（过路兵判定与局面哈希都依赖它）
+        self.prev_last_move = board.last_move
+
         # 1. 处理吃子
         if self.captured_piece:
-            cr, cc = self.captured_piece.position
-            board.grid[cr][cc] = None
-            if self.captured_piece in board.pieces[self.captured_piece.color]:
-                board.pieces[self.captured_piece.color].remove(self.captured_piece)
-
-        # 2. 移动棋子
-        board.grid[sr][sc] = None
-        board.grid[er][ec] = self.piece
-        self.piece.position = (er, ec)
+            board._remove_piece(self.captured_piece)
+
+        # 2. 移动棋子（王位置缓存与哈希由 board 同步更新）
+        board._move_piece(self.piece, self.end)
         self.piece.step += 1
+        if self._changes_castling(1):
+            board._update_castling()
 
-        # 3. 更新缓存
-        if self.piece.type == PieceType.KING:
-            board.king_pos[self.piece.color] = (er, ec)
-        
-        board.last_move = self
+        board._set_last_move(self)
 
     def undo(self, board: Board):
-        sr, sc = self.start
-        er, ec = self.end
+        board._set_last_move(self.prev_last_move)
 
         # 1. 移回棋子
-        board.grid[er][ec] = None
-        board.grid[sr][sc] = self.piece
-        self.piece.position = (sr, sc)
+        board._move_piece(self.piece, self.start)
         self.piece.step -= 1
 
         # 2. 恢复被吃棋子
         if self.captured_piece:
-            cr, cc = self.captured_piece.position
-            board.grid[cr][cc] = self.captured_piece
-            board.pieces[self.captured_piece.color].add(self.captured_piece)
+            board._add_piece(self.captured_piece)
+        if self._changes_castling(0):
+            board._update_castling()
 
-        # 3. 恢复王位置缓存
-        if self.piece.type == PieceType.KING:
-            board.king_pos[self.piece.color] = (sr, sc)
+    def _changes_castling(self, step: int) -> bool:
+        """王/车的第一步（执行后 step 为 1、撤销后为 0），或吃掉/恢复未动过的车，会改变易位权"""
+        piece, captured = self.piece, self.captured_piece
+        return ((piece.step == step and piece.type in (PieceType.KING, PieceType.ROOK))
+                or (captured is not None and captured.step == 0 and captured.type == PieceType.ROOK))
 
     def __eq__(self, other):
         if not isinstance(other, Move):
@@ -83,6 +167,8 @@ class Move:
         return self.start == other.start and self.end == other.end
 
 class CastlingMove(Move):
+    __slots__ = ("is_kingside",)
+
     def __init__(self, start, end, piece, is_kingside):
         super().__init__(start, end, piece, move_type=MoveType.CASTLING)
         self.is_kingside = is_kingside
@@ -96,9 +182,8 @@ class CastlingMove(Move):
         
         rook = board.grid[r][rook_start_c]
         if rook:
-            board.grid[r][rook_start_c] = None
-            board.grid[r][rook_end_c] = rook
-            rook.position = (r, rook_end_c)
+            # 王已走过，易位权在基类中已取消，车的移动不再影响
+            board._move_piece(rook, (r, rook_end_c))
             rook.step += 1
 
     def undo(self, board: Board):
@@ -109,16 +194,21 @@ class CastlingMove(Move):
         
         rook = board.grid[r][rook_end_c]
         if rook:
-            board.grid[r][rook_end_c] = None
-            board.grid[r][rook_start_c] = rook
-            rook.position = (r, rook_start_c)
+            board._move_piece(rook, (r, rook_start_c))
             rook.step -= 1
+            # 基类撤销王时车还不在原位，车回位后重算易位权
+            board._update_castling()
 
 class EnPassantMove(Move):
+    __slots__ = ()
+
     def __init__(self, start, end, piece, captured_piece):
         super().__init__(start, end, piece, captured_piece=captured_piece, move_type=MoveType.EN_PASSANT)
 
 class PromotionMove(Move):
+    __slots__ = ("old_type",)
+    CHOICES = ("Q", "R", "B", "N")
+
     def __init__(self, start, end, piece, captured_piece=None, promotion_choice: str | None = None):
         super().__init__(start, end, piece, captured_piece=captured_piece, move_type=MoveType.PROMOTION, promotion_choice=promotion_choice)
         self.old_type = piece.type
@@ -129,11 +219,11 @@ class PromotionMove(Move):
         super().execute(board)
         # 原地升变：直接修改 piece 的属性
         if self.promotion_choice:
-            self.piece.type = PieceType(self.promotion_choice.upper())
+            board._set_piece_type(self.piece, PieceType(self.promotion_choice.upper()))
 
     def undo(self, board: Board):
         # 先恢复原来的类型（兵）
-        self.piece.type = self.old_type
+        board._set_piece_type(self.piece, self.old_type)
         # 再执行基类的撤销逻辑（移回位置、恢复被吃棋子）
         super().undo(board)
 
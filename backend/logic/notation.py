@@ -7,16 +7,16 @@ if TYPE_CHECKING:
     from .board import Board
 
 from .constants import Color, PieceType
-from .piece import Piece
-
-if TYPE_CHECKING:
-    from .board import Board
-    from .move import Move
+from .move import Move, MoveCode
+from .piece import PIECE_SYMBOLS, Piece
+from .pgn import read_games_from_string
 
 class NotationHandler:
+    DEFAULT_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
     @staticmethod
     def generate_san(board: 'Board', move: 'Move'):
-        """生成标准代数记谱法 (SAN)"""
+        """生成标准代数记谱法 (SAN)；board 须为走棋前的局面，将军标记取自 move.is_check / is_checkmate"""
         if move.piece.type == PieceType.KING and abs(move.start[1] - move.end[1]) == 2:
             base = "O-O" if move.end[1] > move.start[1] else "O-O-O"
         else:
@@ -26,13 +26,8 @@ class NotationHandler:
 
             if move.piece.type != PieceType.PAWN:
                 res += move.piece.type.value
-                # 消歧逻辑
-                others = []
-                for p in board.pieces[move.piece.color]:
-                    if p != move.piece and p.type == move.piece.type:
-                        legal_moves = board.get_piece_legal_moves(p.position, move.piece.color)
-                        if any(m.end == move.end for m in legal_moves):
-                            others.append(p.position)
+                # 消歧：由棋盘从目标格反查同类友方棋子，不为每个棋子重新生成走法
+                others = board.disambiguation_candidates(move.piece, move.end)
                 
                 if others:
                     if all(pos[1] != move.start[1] for pos in others):
@@ -57,6 +52,39 @@ class NotationHandler:
             return base + "+"
         return base
 
+    @staticmethod
+    def play_san(board: 'Board', turn: Color, code: int) -> str:
+        """
+        执行一步（须合法）并返回其 SAN：走棋前反查消歧，走棋后做一次将军判定，仅在将军时才检查是否将死。
+        """
+        move = MoveCode.to_move(board, code)
+        san = NotationHandler.generate_san(board, move)
+        move.execute(board)
+        opponent = turn.opposite()
+        if board.is_in_check(opponent):
+            san += "+" if board.has_legal_moves(opponent) else "#"
+        return san
+
+    @staticmethod
+    def codes_to_san(board: 'Board', turn: Color, codes: list[int]) -> list[str]:
+        """批量记谱：在 board 上依次执行整局的走法编码，返回每步的 SAN，执行后 board 停在终局局面"""
+        sans = []
+        for code in codes:
+            sans.append(NotationHandler.play_san(board, turn, code))
+            turn = turn.opposite()
+        return sans
+
+    @staticmethod
+    def parse_uci(uci: str, rows: int) -> tuple[tuple[int, int], tuple[int, int], str | None]:
+        """将 UCI 坐标走法 ('e2e4', 'e7e8q') 解析为 (start, target, promotion_choice)"""
+        match = re.fullmatch(r'([a-z])(\d+)([a-z])(\d+)([qrbnQRBN])?', uci.strip())
+        if not match:
+            raise ValueError(f"无法解析的走法: {uci}")
+        f1, r1, f2, r2, promo = match.groups()
+        start = (rows - int(r1), ord(f1) - ord('a'))
+        target = (rows - int(r2), ord(f2) - ord('a'))
+        return start, target, promo.upper() if promo else None
+
     @staticmethod
     def coord_to_algebraic(pos, rows):
         """(r, c) -> 'e4'"""
@@ -67,6 +95,11 @@ class NotationHandler:
         """'e4' -> (r, c)"""
         return (rows - int(alg[1]), ord(alg[0]) - ord('a'))
 
+    @staticmethod
+    def is_complete_fen(fen: str) -> bool:
+        """至少含布局、行棋方、易位权、过路兵四段；只有布局的简写 FEN 语义不同，展示前需要规范化"""
+        return len(fen.split()) >= 4
+
     @staticmethod
     def parse_fen_to_board(board:'Board', fen):
         """将 FEN 棋子部分加载到 Board 对象中"""
@@ -75,10 +108,7 @@ class NotationHandler:
         placement = parts[0]
         
         # 初始化清空
-        board.grid = [[None for _ in range(board.cols)] for _ in range(board.rows)]
-        board.pieces = {Color.WHITE: set(), Color.BLACK: set()}
-        board.king_pos = {Color.WHITE: None, Color.BLACK: None}
-        board.last_move = None
+        board._reset()
         
         rows_str = placement.split('/')
         
@@ -94,20 +124,68 @@ class NotationHandler:
                     board._add_piece(piece)
                     c += 1
 
+        NotationHandler._apply_fen_state(board, parts)
+
+        # 局面哈希包含轮次，按 FEN 的行棋方从零计算；易位权键按还原后的王/车状态计算
+        turn = Color.BLACK if len(parts) > 1 and parts[1] == 'b' else Color.WHITE
+        board.castling_hash = board.zobrist.castling_key(board)
+        board.hash = board.zobrist.compute(board, turn)
+
+    @staticmethod
+    def _apply_fen_state(board: 'Board', parts: list[str]):
+        """
+        引擎用棋子的 step 表示“是否动过”，这里把 FEN 中的易位权、过路兵格还原成等价的状态：
+        - 不在初始行的兵视为已动过（不能再跃进两格）；
+        - 没有对应易位权的王、车视为已动过；
+        - 过路兵格还原为一个“上一步兵跃进两格”的 last_move。
+        只有棋子部分的简写 FEN 保持所有棋子未动过的旧行为。
+        """
+        for color in Color:
+            start_row = board.rows - 2 if color == Color.WHITE else 1
+            for piece in board.pieces[color]:
+                if piece.type == PieceType.PAWN and piece.position[0] != start_row:
+                    piece.step = 1
+
+        if len(parts) < 3:
+            return
+        rights = parts[2]
+        corners = {
+            'K': (board.rows - 1, board.cols - 1), 'Q': (board.rows - 1, 0),
+            'k': (0, board.cols - 1), 'q': (0, 0),
+        }
+        keep = {corners[ch] for ch in rights if ch in corners}
+        for color, (king_side, queen_side) in ((Color.WHITE, "KQ"), (Color.BLACK, "kq")):
+            if king_side in rights or queen_side in rights:
+                keep.add(board.king_pos[color])
+            for piece in board.pieces[color]:
+                if piece.type in (PieceType.KING, PieceType.ROOK) and piece.position not in keep:
+                    piece.step = 1
+
+        if len(parts) < 4 or parts[3] == '-':
+            return
+        er, ec = NotationHandler.algebraic_to_coord(parts[3], board.rows)
+        # 白兵向上（行号减小）跃进，过路兵格在其身后一格
+        for color, d in ((Color.WHITE, -1), (Color.BLACK, 1)):
+            pr = er + d
+            if 0 <= pr < board.rows:
+                pawn = board.grid[pr][ec]
+                if pawn and pawn.type == PieceType.PAWN and pawn.color == color:
+                    board.last_move = Move((er - d, ec), (pr, ec), pawn)
+                    break
+
     @staticmethod
     def generate_board_fen(board, turn):
         """生成 FEN 字符串"""
         res = []
-        for r in range(board.rows):
+        for row in board.grid:
             empty = 0
             row_str = ""
-            for c in range(board.cols):
-                p = board.grid[r][c]
+            for p in row:
                 if p:
                     if empty:
                         row_str += str(empty)
                         empty = 0
-                    row_str += str(p)
+                    row_str += PIECE_SYMBOLS[p.color, p.type]
                 else:
                     empty += 1
             if empty: row_str += str(empty)
@@ -116,21 +194,18 @@ class NotationHandler:
         
         turn_str = "w" if turn == Color.WHITE else "b"
         
-        # 易位权 (仅针对标准 8x8)
-        castling = "-"
-        if board.rows == 8 and board.cols == 8:
-            castling = ""
-            w_king = board.grid[7][4]
-            if w_king and w_king.type == PieceType.KING and w_king.step == 0:
-                r_h = board.grid[7][7]; r_a = board.grid[7][0]
-                if r_h and r_h.type == PieceType.ROOK and r_h.step == 0: castling += "K"
-                if r_a and r_a.type == PieceType.ROOK and r_a.step == 0: castling += "Q"
-            b_king = board.grid[0][4]
-            if b_king and b_king.type == PieceType.KING and b_king.step == 0:
-                r_h = board.grid[0][7]; r_a = board.grid[0][0]
-                if r_h and r_h.type == PieceType.ROOK and r_h.step == 0: castling += "k"
-                if r_a and r_a.type == PieceType.ROOK and r_a.step == 0: castling += "q"
-            if not castling: castling = "-"
+        # 易位权：未动过的王位于底线，且对应角上的车未动过
+        castling = ""
+        for color, row, symbols in ((Color.WHITE, board.rows - 1, "KQ"), (Color.BLACK, 0, "kq")):
+            king_pos = board.king_pos[color]
+            if not king_pos or king_pos[0] != row: continue
+            king = board.grid[row][king_pos[1]]
+            if king.step != 0: continue
+            for col, symbol in ((board.cols - 1, symbols[0]), (0, symbols[1])):
+                rook = board.grid[row][col]
+                if rook and rook.type == PieceType.ROOK and rook.color == color and rook.step == 0:
+                    castling += symbol
+        if not castling: castling = "-"
 
         # 过路兵目标格
         ep_sq = "-"
@@ -144,18 +219,10 @@ class NotationHandler:
 
     @staticmethod
     def parse_pgn(content):
-        """解析 PGN 文本并返回 (起始FEN, 移动序列)"""
-        fen_match = re.search(r'\[FEN\s+"([^"]+)"\]', content)
-        start_fen = fen_match.group(1) if fen_match else "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
-        
-        # 清理并提取移动序列
-        move_text = re.sub(r'\[.*?\]', '', content, flags=re.DOTALL)
-        move_text = re.sub(r'\{.*?\}', '', move_text, flags=re.DOTALL)
-        move_text = re.sub(r'\(.*?\)', '', move_text, flags=re.DOTALL)
-        move_text = re.sub(r'\d+\.+\s*', ' ', move_text)
-        moves = [m for m in move_text.split() if m not in ["*", "1-0", "0-1", "1/2-1/2"]]
-        
-        return start_fen, moves
+        """解析 PGN 文本中的第一局并返回 (起始FEN, 主线移动序列)，变着与注释被忽略"""
+        game = next(read_games_from_string(content), None)
+        start_fen = game.start_fen if game and game.start_fen else NotationHandler.DEFAULT_FEN
+        return start_fen, game.moves if game else []
 
     @staticmethod
     def generate_pgn(history, winner, is_over):
@@ -190,13 +257,14 @@ class NotationHandler:
         target = NotationHandler.algebraic_to_coord(target_str, board.rows)
         p_type = PieceType(p_char) if p_char else PieceType.PAWN
         
+        target_sq = target[0] * board.cols + target[1]
         possible_starts = []
         for piece in board.pieces[turn]:
             if piece.type != p_type: continue
             
-            # 定向计算该棋子的合法移动
-            moves = board.get_piece_legal_moves(piece.position, turn)
-            if any(m.end == target for m in moves):
+            # 定向计算该棋子的合法走法编码
+            codes = board.get_piece_legal_codes(piece.position, turn)
+            if any(MoveCode.end_sq(code) == target_sq for code in codes):
                 # 消歧检查
                 if d_file and chr(ord('a') + piece.position[1]) != d_file: continue
                 if d_rank and str(board.rows - piece.position[0]) != d_rank: continue
@@ -0,0 +1,173 @@
+"""
+Perft：统计给定深度下的全部叶子节点数，用于验证走法生成的正确性并测量速度。
+
+用法：
+    python -m backend.logic.perft "<fen>" <depth> [--divide] [--board bitboard]
+    python -m backend.logic.perft --suite [--depth N] [--board bitboard]
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+from typing import NamedTuple
+
+from .board import Board
+from .bitboard import BitBoard
+from .constants import Color
+from .move import MoveCode, PromotionMove
+from .notation import NotationHandler
+
+BOARDS: dict[str, type[Board]] = {"grid": Board, "bitboard": BitBoard}
+
+
+class PerftCase(NamedTuple):
+    name: str
+    fen: str
+    nodes: list[int]  # nodes[i] 为深度 i+1 的期望节点数
+
+
+# 标准参考局面（chessprogramming.org 的 Perft Results 及常见边界用例）
+REFERENCE_POSITIONS = [
+    PerftCase("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+              [20, 400, 8902, 197281]),
+    PerftCase("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+              [48, 2039, 97862, 4085603]),
+    PerftCase("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+              [14, 191, 2812, 43238, 674624]),
+    PerftCase("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+              [6, 264, 9467, 422333]),
+    PerftCase("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+              [44, 1486, 62379, 2103487]),
+    # 过路兵边界：吃过路兵后暴露将军、被牵制的兵、横向牵制
+    PerftCase("ep_discovered_check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+              [15, 126, 1928, 13931]),
+    PerftCase("ep_pinned", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+              [18, 92, 1670, 10138]),
+    PerftCase("ep_horizontal_pin", "8/8/8/KPp4r/8/8/8/7k w - c6 0 1",
+              [4, 56, 259, 4225]),
+    # 升变边界：升变解将、低升变将军
+    PerftCase("promotion_out_of_check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+              [11, 133, 1442, 19174]),
+    PerftCase("underpromotion_check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+              [6, 27, 273, 1329, 18135]),
+    PerftCase("castling_gives_check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+              [15, 66, 1198, 6399]),
+]
+
+
+def _variants(code: int):
+    """升变在引擎中只生成一次，perft 需按四种升变选择分别计数"""
+    if code & MoveCode.TYPE_MASK == MoveCode.PROMOTION:
+        return [MoveCode.with_promotion(code, choice) for choice in PromotionMove.CHOICES]
+    return (code,)
+
+
+def perft(board: Board, color: Color, depth: int) -> int:
+    if depth == 0:
+        return 1
+    codes = list(board._legal_move_generator(color))
+    if depth == 1:
+        return sum(len(_variants(code)) for code in codes)
+    nodes = 0
+    opponent = color.opposite()
+    for code in codes:
+        for variant in _variants(code):
+            move = MoveCode.to_move(board, variant)
+            move.execute(board)
+            nodes += perft(board, opponent, depth - 1)
+            move.undo(board)
+    return nodes
+
+
+def move_to_uci(code: int, rows: int, cols: int) -> str:
+    start = divmod(MoveCode.start_sq(code), cols)
+    end = divmod(MoveCode.end_sq(code), cols)
+    res = NotationHandler.coord_to_algebraic(start, rows) + NotationHandler.coord_to_algebraic(end, rows)
+    choice = MoveCode.promotion_choice(code)
+    if choice:
+        res += choice.lower()
+    return res
+
+
+def divide(board: Board, color: Color, depth: int) -> dict[str, int]:
+    """按根节点的每一步分别统计子树节点数，便于与其他引擎逐步比对定位错误"""
+    result = {}
+    for code in list(board._legal_move_generator(color)):
+        for variant in _variants(code):
+            move = MoveCode.to_move(board, variant)
+            move.execute(board)
+            result[move_to_uci(variant, board.rows, board.cols)] = perft(board, color.opposite(), depth - 1)
+            move.undo(board)
+    return result
+
+
+def setup(fen: str, board_cls: type[Board] = Board) -> tuple[Board, Color]:
+    board = board_cls()
+    NotationHandler.parse_fen_to_board(board, fen)
+    parts = fen.split()
+    turn = Color.BLACK if len(parts) > 1 and parts[1] == 'b' else Color.WHITE
+    return board, turn
+
+
+def run(fen: str, depth: int, board_cls: type[Board] = Board) -> tuple[int, float]:
+    """返回 (节点数, 耗时秒)"""
+    board, turn = setup(fen, board_cls)
+    start = time.perf_counter()
+    nodes = perft(board, turn, depth)
+    return nodes, time.perf_counter() - start
+
+
+def run_suite(max_depth: int, board_cls: type[Board] = Board, out=sys.stdout) -> bool:
+    """跑完整参考局面集，逐项对比期望节点数；全部通过返回 True"""
+    ok = True
+    total_nodes, total_time = 0, 0.0
+    for case in REFERENCE_POSITIONS:
+        depth = min(max_depth, len(case.nodes))
+        nodes, elapsed = run(case.fen, depth, board_cls)
+        expected = case.nodes[depth - 1]
+        passed = nodes == expected
+        ok = ok and passed
+        total_nodes += nodes
+        total_time += elapsed
+        print(f"{'OK  ' if passed else 'FAIL'} {case.name:<24} depth {depth}  nodes {nodes:>9}"
+              f"  expected {expected:>9}  {_nps(nodes, elapsed):>9} nps", file=out)
+    print(f"total {total_nodes} nodes in {total_time:.2f}s, {_nps(total_nodes, total_time)} nps", file=out)
+    return ok
+
+
+def _nps(nodes: int, elapsed: float) -> int:
+    return int(nodes / elapsed) if elapsed > 0 else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.logic.perft", description="Perft 走法生成校验与测速")
+    parser.add_argument("fen", nargs="?", help="起始局面 FEN")
+    parser.add_argument("depth", nargs="?", type=int, default=3, help="搜索深度")
+    parser.add_argument("--divide", action="store_true", help="按根节点走法分别输出节点数")
+    parser.add_argument("--suite", action="store_true", help="运行内置参考局面集")
+    parser.add_argument("--depth", type=int, dest="max_depth", help="参考局面集的最大深度（默认 3）")
+    parser.add_argument("--board", choices=sorted(BOARDS), default="grid", help="棋盘实现")
+    args = parser.parse_args(argv)
+    board_cls = BOARDS[args.board]
+
+    if args.suite:
+        return 0 if run_suite(args.max_depth or 3, board_cls) else 1
+    if not args.fen:
+        parser.error("需要提供 FEN，或使用 --suite")
+
+    if args.divide:
+        board, turn = setup(args.fen, board_cls)
+        start = time.perf_counter()
+        result = divide(board, turn, args.depth)
+        elapsed = time.perf_counter() - start
+        for move_str in sorted(result):
+            print(f"{move_str}: {result[move_str]}")
+        nodes = sum(result.values())
+    else:
+        nodes, elapsed = run(args.fen, args.depth, board_cls)
+    print(f"nodes {nodes}  time {elapsed:.3f}s  nps {_nps(nodes, elapsed)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+流式 PGN 读取：逐行单遍切分记号，一次产出一局，内存占用与文件大小无关。
+支持多行注释 {...}、行尾注释 ;、% 转义行、NAG 以及任意层嵌套的变着 (...)。
+"""
+from __future__ import annotations
+import io
+import re
+from typing import Iterable, Iterator, TextIO
+
+# 每行只扫描一次：按顺序尝试标签、注释、括号、结果、回合号、NAG 与走法
+_TOKEN_RE = re.compile(r"""
+    (?P<header>\[\s*(?P<tag>[A-Za-z0-9_]+)\s+"(?P<value>(?:[^"\\]|\\.)*)"\s*\])
+  | (?P<comment>\{(?P<text>[^}]*)(?P<closed>\})?)
+  | (?P<line_comment>;.*)
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<result>1-0|0-1|1/2-1/2|\*)
+  | (?P<number>\d+\.+)
+  | (?P<nag>\$\d+)
+  | (?P<san>[^\s(){};\[\]$]+)
+""", re.VERBOSE)
+
+_ANNOTATION = "!?"
+_RESULTS = frozenset(("1-0", "0-1", "1/2-1/2", "*"))
+# 含有这些字符的行需要完整的正则切分
+_SPECIAL = re.compile(r'[\[{};()$]')
+
+
+class PGNLine:
+    """
+    一条走法序列（主线或变着）。
+    comments[i]: 第 i 步之后的注释（i = 0 表示第一步之前）；
+    variations[i]: 替代第 i 步（从 0 计）的变着列表。
+    """
+    __slots__ = ('moves', 'comments', 'variations')
+
+    def __init__(self):
+        self.moves: list[str] = []
+        self.comments: dict[int, list[str]] = {}
+        self.variations: dict[int, list[PGNLine]] = {}
+
+
+class PGNGame:
+    __slots__ = ('headers', 'mainline', 'result')
+
+    def __init__(self):
+        self.headers: dict[str, str] = {}
+        self.mainline = PGNLine()
+        self.result = "*"
+
+    @property
+    def moves(self) -> list[str]:
+        return self.mainline.moves
+
+    @property
+    def start_fen(self) -> str | None:
+        return self.headers.get("FEN")
+
+
+def _lines(source: str | TextIO | Iterable[str]) -> Iterator[str]:
+    if isinstance(source, str):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            yield from f
+    else:
+        yield from source
+
+
+def _tokens(lines: Iterable[str]) -> Iterator[tuple[str, str | tuple[str, str]]]:
+    """
+    单遍切分记号，产出 (类型, 值)：header / comment / open / close / result / san。
+    回合号、NAG、行尾注释与 % 转义行直接丢弃。只含走法的行走 split 快速路径，不经过正则。
+    """
+    comment: list[str] | None = None # 跨行注释的已读部分
+    for raw in lines:
+        pos = 0
+        if comment is not None:
+            end = raw.find("}")
+            if end < 0:
+                comment.append(raw.strip())
+                continue
+            comment.append(raw[:end].strip())
+            yield "comment", " ".join(c for c in comment if c)
+            comment, pos = None, end + 1
+        elif raw.startswith("%"):
+            continue
+        elif _SPECIAL.search(raw) is None:
+            for token in raw.split():
+                if token in _RESULTS:
+                    yield "result", token
+                elif token[0].isdigit():
+                    # "12." 或 "12.e4" / "12...e5"
+                    san = token.rpartition(".")[2]
+                    if san:
+                        yield "san", san.rstrip(_ANNOTATION)
+                else:
+                    yield "san", token.rstrip(_ANNOTATION)
+            continue
+
+        for m in _TOKEN_RE.finditer(raw, pos):
+            kind = m.lastgroup
+            if kind == "san":
+                san = m.group("san").rstrip(_ANNOTATION)
+                if san:
+                    yield "san", san
+            elif kind == "header":
+                yield "header", (m.group("tag"), m.group("value").replace('\\"', '"').replace("\\\\", "\\"))
+            elif kind == "comment":
+                if m.group("closed") is None:
+                    comment = [m.group("text").strip()]
+                    break
+                yield "comment", m.group("text").strip()
+            elif kind in ("open", "close", "result"):
+                yield kind, m.group(kind)
+
+
+def read_games(source: str | TextIO | Iterable[str]) -> Iterator[PGNGame]:
+    """
+    逐局读取 PGN。source 可以是文件路径、文本流或任意按行产出字符串的可迭代对象。
+    一局在主线出现结果记号时结束；缺少结果记号时，遇到下一局的标签也会结束当前局。
+    结果记号之后、下一局开始之前的注释属于刚结束的一局，因此一局在读到下一局的第一个记号时才产出。
+    """
+    game: PGNGame | None = None
+    finished: PGNGame | None = None # 已读到结果记号、尚未产出的一局
+    stack: list[PGNLine] = []
+    line: PGNLine | None = None
+    has_moves = False
+
+    for kind, value in _tokens(_lines(source)):
+        if finished is not None:
+            if kind == "comment":
+                finished.mainline.comments.setdefault(len(finished.moves), []).append(value)
+                continue
+            yield finished
+            finished = None
+
+        if kind == "header":
+            if game is not None and has_moves:
+                yield game
+                game = None
+            if game is None:
+                game, has_moves = PGNGame(), False
+                line, stack = game.mainline, []
+            game.headers[value[0]] = value[1]
+            continue
+        if game is None:
+            if kind in ("close", "result"):
+                continue # 对局之外多余的括号与结果记号
+            # 走法、注释或变着都开始一局没有标签的新对局
+            game, has_moves = PGNGame(), False
+            line, stack = game.mainline, []
+
+        if kind == "san":
+            line.moves.append(value)
+            has_moves = True
+        elif kind == "comment":
+            line.comments.setdefault(len(line.moves), []).append(value)
+        elif kind == "open":
+            # 变着替代当前序列的最后一步
+            variation = PGNLine()
+            line.variations.setdefault(max(len(line.moves) - 1, 0), []).append(variation)
+            stack.append(line)
+            line = variation
+        elif kind == "close":
+            if stack:
+                line = stack.pop()
+        elif kind == "result":
+            if stack: # 变着内的结果记号只表示变着的结论
+                continue
+            game.result = value
+            finished = game
+            game, line, stack, has_moves = None, None, [], False
+
+    if finished is not None:
+        yield finished
+    if game is not None and (has_moves or game.headers):
+        yield game
+
+
+def read_games_from_string(content: str) -> Iterator[PGNGame]:
+    return read_games(io.StringIO(content))
@@ -1,13 +1,16 @@
 from __future__ import annotations
-from typing import Any, Generator, TYPE_CHECKING
+from typing import Any, Callable, Generator
 
 from .constants import Color, PieceType
 from .rules import MoveRules
 
-if TYPE_CHECKING:
-    from .move import Move
+# (颜色, 类型) -> FEN 字符，生成 FEN 时查表而不是逐格访问枚举值
+PIECE_SYMBOLS = {(color, piece_type): piece_type.value.upper() if color == Color.WHITE else piece_type.value.lower()
+                 for color in Color for piece_type in PieceType}
 
 class Piece:
+    __slots__ = ("color", "position", "type", "step")
+
     def __init__(self, color: Color, position: tuple[int, int], piece_type: PieceType):
         self.color = color
         self.position = position  # (row, col)
@@ -22,8 +25,7 @@ class Piece:
         return Piece(color, position, PieceType(char.upper()))
 
     def __str__(self):
-        symbol = self.type.value
-        return symbol.upper() if self.color == Color.WHITE else symbol.lower()
+        return PIECE_SYMBOLS[self.color, self.type]
 
     def to_dict(self):
         return {
@@ -33,20 +35,24 @@ class Piece:
             "step": self.step
         }
 
-    def get_valid_moves(self, grid: list[list[Piece | None]], rows: int, cols: int, last_move: Any) -> Generator[Move, None, None]:
+    def get_valid_moves(self, grid: list[list[Piece | None]], rows: int, cols: int, last_move: Any, is_attacked: Callable[[tuple[int, int]], bool] | None = None) -> Generator[int, None, None]:
         """
-        动态派发策略：根据当前的 type 调用对应的 MoveRules
+        动态派发策略：根据当前的 type 调用对应的 MoveRules，产生 MoveCode 编码的伪合法走法
+        is_attacked 仅用于王的易位路径校验，可传入查表函数代替逐格扫描
         """
-        rule_map = {
-            PieceType.PAWN: lambda: MoveRules.get_pawn_moves(grid, rows, cols, last_move, self.position, self.color),
-            PieceType.ROOK: lambda: MoveRules.get_rook_moves(grid, rows, cols, self.position, self.color),
-            PieceType.KNIGHT: lambda: MoveRules.get_knight_moves(grid, rows, cols, self.position, self.color),
-            PieceType.BISHOP: lambda: MoveRules.get_bishop_moves(grid, rows, cols, self.position, self.color),
-            PieceType.QUEEN: lambda: MoveRules.get_queen_moves(grid, rows, cols, self.position, self.color),
-            PieceType.KING: lambda: MoveRules.get_king_moves(grid, rows, cols, self.position, self.color),
-        }
-        method = rule_map.get(self.type)
+        method = MOVE_GENERATORS.get(self.type)
         if not method:
             raise NotImplementedError
-        
-        yield from method()
+        return method(grid, rows, cols, last_move, self.position, self.color, is_attacked)
+
+
+# 静态派发表：按棋子类型映射到 MoveRules 生成器，统一签名为
+# (grid, rows, cols, last_move, pos, color, is_attacked)，只在模块加载时构建一次
+MOVE_GENERATORS: dict[PieceType, Callable[..., Generator[int, None, None]]] = {
+    PieceType.PAWN: lambda grid, rows, cols, last_move, pos, color, is_attacked: MoveRules.get_pawn_moves(grid, rows, cols, last_move, pos, color),
+    PieceType.ROOK: lambda grid, rows, cols, last_move, pos, color, is_attacked: MoveRules.get_rook_moves(grid, rows, cols, pos, color),
+    PieceType.KNIGHT: lambda grid, rows, cols, last_move, pos, color, is_attacked: MoveRules.get_knight_moves(grid, rows, cols, pos, color),
+    PieceType.BISHOP: lambda grid, rows, cols, last_move, pos, color, is_attacked: MoveRules.get_bishop_moves(grid, rows, cols, pos, color),
+    PieceType.QUEEN: lambda grid, rows, cols, last_move, pos, color, is_attacked: MoveRules.get_queen_moves(grid, rows, cols, pos, color),
+    PieceType.KING: lambda grid, rows, cols, last_move, pos, color, is_attacked: MoveRules.get_king_moves(grid, rows, cols, pos, color, is_attacked),
+}
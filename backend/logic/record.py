@@ -0,0 +1,207 @@
+"""
+紧凑的二进制对局存档：起始局面 + 打包的走法编码 + FEN 检查点索引。
+
+文件布局（小端）：
+    头部       magic "CHRC" | 版本 u8 | rows u8 | cols u8 | 保留 u8 |
+               步数 u32 | 检查点间隔 u16 | 检查点数 u16 | FEN 区长度 u32 | SAN 区长度 u32 | 元数据长度 u32
+    走法编码   步数 × u32（MoveCode）
+    SAN 索引   步数 × u32，每一步的 SAN 在 SAN 区内的起始偏移（版本 2 起）
+    检查点表   检查点数 × (步数 u32, FEN 区内偏移 u32, 长度 u16)，第一个检查点为起始局面
+    FEN 区     检查点 FEN 依次拼接
+    SAN 区     以空格分隔的 SAN
+    元数据     JSON（对局状态、PGN 标签等）
+
+读取方可以对文件做内存映射：取任意一步的局面只需读头部、一个检查点和至多 间隔-1 个走法编码，
+取任意一步的 SAN 只需读两个偏移，都不必解析整局。版本 1 的文件没有 SAN 索引，仍可读取。
+JSON 格式（get_state_dict）仍作为导出格式保留。
+"""
+from __future__ import annotations
+import json
+import mmap
+import struct
+from typing import Any
+
+from .board import Board
+from .constants import Color
+from .move import MoveCode
+from .notation import NotationHandler
+
+MAGIC = b"CHRC"
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+_HEADER = struct.Struct("<4sBBBBIHHIII")
+_CHECKPOINT = struct.Struct("<IIH")
+
+
+def encode_record(start_fen: str, codes: list[int], checkpoints: dict[int, str], sans: list[str],
+                  meta: dict[str, Any], rows: int = 8, cols: int = 8, interval: int = 16) -> bytes:
+    """checkpoints 为 {步数: FEN}，须包含第 0 步（起始局面）；sans 与 codes 一一对应"""
+    if len(sans) != len(codes):
+        raise ValueError("SAN 与走法编码数量不一致")
+    if 0 not in checkpoints:
+        checkpoints = {0: start_fen, **checkpoints}
+    plies = sorted(p for p in checkpoints if p <= len(codes))
+    table = bytearray()
+    fens = bytearray()
+    for ply in plies:
+        fen = checkpoints[ply].encode()
+        table += _CHECKPOINT.pack(ply, len(fens), len(fen))
+        fens += fen
+    encoded = [san.encode() for san in sans]
+    offsets, offset = [], 0
+    for san in encoded:
+        offsets.append(offset)
+        offset += len(san) + 1
+    san_blob = b" ".join(encoded)
+    meta_blob = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode()
+    header = _HEADER.pack(MAGIC, VERSION, rows, cols, 0, len(codes), interval, len(plies),
+                          len(fens), len(san_blob), len(meta_blob))
+    return b"".join((header, struct.pack(f"<{len(codes)}I", *codes), struct.pack(f"<{len(offsets)}I", *offsets),
+                     table, fens, san_blob, meta_blob))
+
+
+def encode_game(game, meta: dict[str, Any] | None = None) -> bytes:
+    """把对局（Game）编码为二进制存档；检查点直接复用对局 FEN 历史中的检查点"""
+    history = game.fen_history
+    state = {"turn": game.turn.value, "status": game.status.value, **(meta or {})}
+    return encode_record(history.start_fen, history.codes, history.checkpoints, [m.san for m in game.history],
+                         state, game.board.rows, game.board.cols, history.interval)
+
+
+class GameRecord:
+    """
+    二进制存档的读取器，buf 可以是 bytes 或 mmap。
+    头部在构造时解析，其余各区按需读取。
+    """
+    def __init__(self, buf):
+        self.buf = buf
+        (magic, version, self.rows, self.cols, _, self.plies, self.interval, n_checkpoints,
+         fen_len, san_len, meta_len) = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version not in READABLE_VERSIONS:
+            raise ValueError("不是有效的对局存档")
+        self.version = version
+        self._codes_at = _HEADER.size
+        self._san_index_at = self._codes_at + 4 * self.plies
+        self._table_at = self._san_index_at + (4 * self.plies if version >= 2 else 0)
+        self._fens_at = self._table_at + _CHECKPOINT.size * n_checkpoints
+        self._sans_at = self._fens_at + fen_len
+        self._meta_at = self._sans_at + san_len
+        self._end = self._meta_at + meta_len
+        self.n_checkpoints = n_checkpoints
+        self._mmap = None
+        self._file = None
+
+    @classmethod
+    def open(cls, path: str) -> GameRecord:
+        f = open(path, "rb")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        record = cls(mm)
+        record._mmap, record._file = mm, f
+        return record
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- 按区读取 ---
+    def codes(self, start: int = 0, end: int | None = None) -> tuple[int, ...]:
+        end = self.plies if end is None else min(end, self.plies)
+        if end <= start:
+            return ()
+        return struct.unpack_from(f"<{end - start}I", self.buf, self._codes_at + 4 * start)
+
+    def checkpoint(self, index: int) -> tuple[int, str]:
+        ply, offset, length = _CHECKPOINT.unpack_from(self.buf, self._table_at + _CHECKPOINT.size * index)
+        at = self._fens_at + offset
+        return ply, bytes(self.buf[at:at + length]).decode()
+
+    def _nearest_checkpoint(self, ply: int) -> tuple[int, str]:
+        # 检查点按步数递增；通常等间隔，先按间隔直接定位再向前修正
+        index = min(ply // self.interval, self.n_checkpoints - 1) if self.interval else 0
+        while index > 0 and self.checkpoint(index)[0] > ply:
+            index -= 1
+        return self.checkpoint(index)
+
+    @property
+    def start_fen(self) -> str:
+        return self.checkpoint(0)[1]
+
+    def sans(self, start: int = 0, end: int | None = None) -> list[str]:
+        """第 start 到 end 步（从 0 计，不含 end）的 SAN；有 SAN 索引时只解码这一段"""
+        end = self.plies if end is None else min(end, self.plies)
+        if end <= start:
+            return []
+        if self.version < 2:
+            return bytes(self.buf[self._sans_at:self._meta_at]).decode().split(" ")[start:end]
+        lo = self._sans_at + self._san_offset(start)
+        hi = self._sans_at + self._san_offset(end) - 1 if end < self.plies else self._meta_at
+        return bytes(self.buf[lo:hi]).decode().split(" ")
+
+    def _san_offset(self, index: int) -> int:
+        return struct.unpack_from("<I", self.buf, self._san_index_at + 4 * index)[0]
+
+    def san_at(self, ply: int) -> str:
+        """走到第 ply 步（从 1 计）的那一步的 SAN"""
+        if not 0 < ply <= self.plies:
+            raise IndexError("步数越界")
+        return self.sans(ply - 1, ply)[0]
+
+    def meta(self) -> dict:
+        return json.loads(bytes(self.buf[self._meta_at:self._end]))
+
+    # --- 局面重建 ---
+    def _board_at(self, ply: int) -> tuple[Board, Color]:
+        if not 0 <= ply <= self.plies:
+            raise IndexError("步数越界")
+        base, fen = self._nearest_checkpoint(ply)
+        board = Board(self.rows, self.cols)
+        board.track_attacks = False # 只需执行走法与生成 FEN
+        NotationHandler.parse_fen_to_board(board, fen)
+        parts = fen.split()
+        turn = Color.BLACK if len(parts) > 1 and parts[1] == 'b' else Color.WHITE
+        for code in self.codes(base, ply):
+            MoveCode.to_move(board, code).execute(board)
+            turn = turn.opposite()
+        return board, turn
+
+    def fen_at(self, ply: int) -> str:
+        """第 ply 步之后的局面（0 为起始局面，与 Game.fen_history[0] 一致，返回载入时的 FEN 原文）"""
+        if 0 <= ply <= self.plies:
+            # 恰好落在检查点上时直接返回（第 0 步是简写 FEN 时仍需规范化）
+            base, fen = self._nearest_checkpoint(ply)
+            if base == ply and (ply > 0 or NotationHandler.is_complete_fen(fen)):
+                return fen
+        return NotationHandler.generate_board_fen(*self._board_at(ply))
+
+    def fen_history(self, end: int | None = None) -> list[str]:
+        """第 0 步到第 end 步（缺省为最后一步）的局面"""
+        board, turn = self._board_at(0)
+        fens = [NotationHandler.generate_board_fen(board, turn)]
+        for code in self.codes(0, end):
+            MoveCode.to_move(board, code).execute(board)
+            turn = turn.opposite()
+            fens.append(NotationHandler.generate_board_fen(board, turn))
+        return fens
+
+    def to_state_dict(self) -> dict:
+        """导出为与 Game.get_state_dict 相同结构的 JSON 对象（附带元数据中的其他字段）"""
+        meta = self.meta()
+        return {
+            "turn": meta.pop("turn", None),
+            "status": meta.pop("status", None),
+            "history": self.sans(),
+            "fen_history": [self.fen_at(0)] + self.fen_history()[1:],
+            **meta,
+        }
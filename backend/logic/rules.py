@@ -1,40 +1,116 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Generator
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Generator
 from .constants import Color, PieceType, MoveType
-from .move import Move, CastlingMove, EnPassantMove, PromotionMove
+from .move import Move, MoveCode
 
 if TYPE_CHECKING:
     from .piece import Piece
 
+Square = tuple[int, int]
+
+
+class MoveTables:
+    """
+    某一棋盘尺寸下预先算好的目标格表，按 (rows, cols) 缓存，走法生成时只需遍历列表，无需边界检查。
+    所有表均以 [r][c] 索引。
+    """
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+
+        def steps(offsets):
+            return [[[(r + dr, c + dc) for dr, dc in offsets
+                      if 0 <= r + dr < rows and 0 <= c + dc < cols]
+                     for c in range(cols)] for r in range(rows)]
+
+        def ray(r, c, dr, dc):
+            res = []
+            nr, nc = r + dr, c + dc
+            while 0 <= nr < rows and 0 <= nc < cols:
+                res.append((nr, nc))
+                nr, nc = nr + dr, nc + dc
+            return res
+
+        self.knight = steps(MoveRules.KNIGHT_OFFSETS)
+        self.king = steps(MoveRules.STRAIGHT_DIRS + MoveRules.DIAGONAL_DIRS)
+        # 某颜色的兵位于 [r][c] 时可吃子的格子；白兵向行号减小的方向前进
+        self.pawn_captures = {
+            Color.WHITE: steps([(-1, -1), (-1, 1)]),
+            Color.BLACK: steps([(1, -1), (1, 1)]),
+        }
+        # 射线：[r][c] 处按 SLIDING_DIRS 顺序排列的 8 条射线（由近及远，不含起点）
+        self.rays = [[[ray(r, c, dr, dc) for (dr, dc), _ in MoveRules.SLIDING_DIRS]
+                      for c in range(cols)] for r in range(rows)]
+        self.straight_rays = [[rays[:4] for rays in row] for row in self.rays]
+        self.diagonal_rays = [[rays[4:] for rays in row] for row in self.rays]
+
+
 class MoveRules:
     # 基础移动向量
     STRAIGHT_DIRS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
     DIAGONAL_DIRS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
     KNIGHT_OFFSETS = [(2,1), (2,-1), (-2,1), (-2,-1), (1,2), (1,-2), (-1,2), (-1,-2)]
 
+    # 滑行方向及沿该方向滑行的棋子类型
+    SLIDING_DIRS = [(d, (PieceType.ROOK, PieceType.QUEEN)) for d in STRAIGHT_DIRS] + \
+                   [(d, (PieceType.BISHOP, PieceType.QUEEN)) for d in DIAGONAL_DIRS]
+    # SLIDING_DIRS 中每个方向的反方向下标
+    OPPOSITE_DIR = [1, 0, 3, 2, 7, 6, 5, 4]
+    STRAIGHT_SLIDERS = (PieceType.ROOK, PieceType.QUEEN)
+    DIAGONAL_SLIDERS = (PieceType.BISHOP, PieceType.QUEEN)
+
     @staticmethod
-    def is_square_attacked(grid: list[list[Piece | None]], rows: int, cols: int, pos: tuple[int, int], by_color: Color) -> bool:
+    @lru_cache(maxsize=None)
+    def tables(rows: int, cols: int) -> MoveTables:
+        return MoveTables(rows, cols)
+
+    @staticmethod
+    def get_attacked_squares(grid: list[list[Piece | None]], rows: int, cols: int, piece: Piece) -> Generator[Square, None, None]:
+        """棋子控制的全部格子（不论格子上是否有棋子），滑行子的射线止于第一个阻挡格（含）"""
+        r, c = piece.position
+        tables = MoveRules.tables(rows, cols)
+        p_type = piece.type
+        if p_type == PieceType.PAWN:
+            yield from tables.pawn_captures[piece.color][r][c]
+        elif p_type == PieceType.KNIGHT:
+            yield from tables.knight[r][c]
+        elif p_type == PieceType.KING:
+            yield from tables.king[r][c]
+        else:
+            if p_type == PieceType.ROOK:
+                rays = tables.straight_rays[r][c]
+            elif p_type == PieceType.BISHOP:
+                rays = tables.diagonal_rays[r][c]
+            else:
+                rays = tables.rays[r][c]
+            for ray in rays:
+                for nr, nc in ray:
+                    yield (nr, nc)
+                    if grid[nr][nc]: break
+
+    @staticmethod
+    def is_square_attacked(grid: list[list[Piece | None]], rows: int, cols: int, pos: Square, by_color: Color) -> bool:
         """
         不再依赖 Board 对象，直接接收 grid 和维度的纯函数。
         """
         r, c = pos
-        pawn_offset = 1 if by_color == Color.WHITE else -1
-        max_range = max(rows, cols)
-        
-        # (方向向量, 匹配的棋子类型, 最大射程)
-        configs = [
-            (MoveRules.KNIGHT_OFFSETS, [PieceType.KNIGHT], 1),
-            (MoveRules.STRAIGHT_DIRS, [PieceType.ROOK, PieceType.QUEEN], max_range),
-            (MoveRules.DIAGONAL_DIRS, [PieceType.BISHOP, PieceType.QUEEN], max_range),
-            ([(pawn_offset, -1), (pawn_offset, 1)], [PieceType.PAWN], 1),
-            (MoveRules.STRAIGHT_DIRS + MoveRules.DIAGONAL_DIRS, [PieceType.KING], 1)
-        ]
-
-        for dirs, p_types, limit in configs:
-            for dr, dc in dirs:
-                for i in range(1, limit + 1):
-                    nr, nc = r + dr * i, c + dc * i
-                    if not (0 <= nr < rows and 0 <= nc < cols): break
+        tables = MoveRules.tables(rows, cols)
+
+        # 能攻击 pos 的兵 = 从 pos 出发按对方（被攻击方）兵的吃子方向找到的兵
+        for nr, nc in tables.pawn_captures[by_color.opposite()][r][c]:
+            p = grid[nr][nc]
+            if p and p.color == by_color and p.type == PieceType.PAWN:
+                return True
+        for targets, p_type in ((tables.knight[r][c], PieceType.KNIGHT), (tables.king[r][c], PieceType.KING)):
+            for nr, nc in targets:
+                p = grid[nr][nc]
+                if p and p.color == by_color and p.type == p_type:
+                    return True
+        for rays, p_types in ((tables.straight_rays[r][c], MoveRules.STRAIGHT_SLIDERS),
+                              (tables.diagonal_rays[r][c], MoveRules.DIAGONAL_SLIDERS)):
+            for ray in rays:
+                for nr, nc in ray:
                     p = grid[nr][nc]
                     if p:
                         if p.color == by_color and p.type in p_types:
@@ -43,101 +119,179 @@ class MoveRules:
         return False
 
     @staticmethod
-    def _get_moves_in_directions(grid: list[list[Piece | None]], rows: int, cols: int, pos: tuple[int, int], color: Color, directions: list[tuple[int, int]], limit: int | None = None) -> Generator[Move, None, None]:
-        if limit is None:
-            limit = max(rows, cols)
-            
+    def get_attackers(grid: list[list[Piece | None]], rows: int, cols: int, pos: Square, color: Color, p_type: PieceType) -> list[Square]:
+        """
+        反向查表：color 方哪些 p_type 棋子（兵除外）可以走到/攻击 pos。
+        从目标格出发按该棋子的走法反向扫描，代价只与射线长度有关，与双方棋子数和走法数无关。
+        """
         r, c = pos
-        piece = grid[r][c]
-        if not piece: return
+        tables = MoveRules.tables(rows, cols)
+        if p_type in (PieceType.KNIGHT, PieceType.KING):
+            targets = tables.knight[r][c] if p_type == PieceType.KNIGHT else tables.king[r][c]
+            return [(nr, nc) for nr, nc in targets
+                    if (p := grid[nr][nc]) and p.color == color and p.type == p_type]
 
-        for dr, dc in directions:
-            for i in range(1, limit + 1):
-                nr, nc = r + dr * i, c + dc * i
-                if not (0 <= nr < rows and 0 <= nc < cols): break
+        if p_type == PieceType.ROOK:
+            rays = tables.straight_rays[r][c]
+        elif p_type == PieceType.BISHOP:
+            rays = tables.diagonal_rays[r][c]
+        else:
+            rays = tables.rays[r][c]
+        attackers = []
+        for ray in rays:
+            for nr, nc in ray:
+                p = grid[nr][nc]
+                if p:
+                    if p.color == color and p.type == p_type:
+                        attackers.append((nr, nc))
+                    break
+        return attackers
+
+    @staticmethod
+    def get_check_info(grid: list[list[Piece | None]], rows: int, cols: int, king_pos: Square, color: Color) -> tuple[list[Square], set[int] | None, dict[Square, set[int]]]:
+        """
+        从王的位置出发一次性扫描，计算将军者与牵制关系。
+        返回 (将军者坐标列表, 单将时可解将的格子下标集合(无将军为 None), {被牵制棋子坐标: 可移动的直线格子下标})。
+        """
+        r, c = king_pos
+        tables = MoveRules.tables(rows, cols)
+        enemy = color.opposite()
+        checkers: list[Square] = []
+        block: set[int] | None = None
+        pins: dict[Square, set[int]] = {}
+
+        # 1. 直线与斜线：第一个己方棋子之后若是对应的敌方滑行子，则构成牵制
+        for rays, p_types in ((tables.straight_rays[r][c], MoveRules.STRAIGHT_SLIDERS),
+                              (tables.diagonal_rays[r][c], MoveRules.DIAGONAL_SLIDERS)):
+            for ray in rays:
+                shield = None
+                for i, (nr, nc) in enumerate(ray):
+                    p = grid[nr][nc]
+                    if p:
+                        if p.color == color:
+                            if shield: break
+                            shield = (nr, nc)
+                        else:
+                            if p.type in p_types:
+                                line = {lr * cols + lc for lr, lc in ray[:i + 1]}
+                                if shield:
+                                    pins[shield] = line
+                                else:
+                                    checkers.append((nr, nc))
+                                    block = line
+                            break
+
+        # 2. 马与兵只能直接将军，解将只能吃掉它
+        for targets, p_type in ((tables.knight[r][c], PieceType.KNIGHT),
+                                (tables.pawn_captures[color][r][c], PieceType.PAWN)):
+            for nr, nc in targets:
+                p = grid[nr][nc]
+                if p and p.color == enemy and p.type == p_type:
+                    checkers.append((nr, nc))
+                    block = {nr * cols + nc}
+
+        if len(checkers) > 1:
+            block = set() # 双将：只能移动王
+        return checkers, block, pins
+
+    @staticmethod
+    def _slide_moves(grid: list[list[Piece | None]], cols: int, pos: Square, color: Color, rays: list[list[Square]]) -> Generator[int, None, None]:
+        r, c = pos
+        if not grid[r][c]: return
+        start = r * cols + c
+
+        for ray in rays:
+            for nr, nc in ray:
                 target = grid[nr][nc]
                 if target is None:
-                    yield Move(pos, (nr, nc), piece)
+                    yield start | (nr * cols + nc) << MoveCode.TO_SHIFT
                 elif target.color != color:
-                    yield Move(pos, (nr, nc), piece, captured_piece=target)
+                    yield start | (nr * cols + nc) << MoveCode.TO_SHIFT
                     break
                 else: break
 
     @staticmethod
-    def get_rook_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: tuple[int, int], color: Color) -> Generator[Move, None, None]:
-        return MoveRules._get_moves_in_directions(grid, rows, cols, pos, color, MoveRules.STRAIGHT_DIRS)
+    def _step_moves(grid: list[list[Piece | None]], cols: int, pos: Square, color: Color, targets: list[Square]) -> Generator[int, None, None]:
+        r, c = pos
+        if not grid[r][c]: return
+        start = r * cols + c
+
+        for nr, nc in targets:
+            target = grid[nr][nc]
+            if target is None or target.color != color:
+                yield start | (nr * cols + nc) << MoveCode.TO_SHIFT
+
+    @staticmethod
+    def get_rook_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: Square, color: Color) -> Generator[int, None, None]:
+        return MoveRules._slide_moves(grid, cols, pos, color, MoveRules.tables(rows, cols).straight_rays[pos[0]][pos[1]])
 
     @staticmethod
-    def get_bishop_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: tuple[int, int], color: Color) -> Generator[Move, None, None]:
-        return MoveRules._get_moves_in_directions(grid, rows, cols, pos, color, MoveRules.DIAGONAL_DIRS)
+    def get_bishop_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: Square, color: Color) -> Generator[int, None, None]:
+        return MoveRules._slide_moves(grid, cols, pos, color, MoveRules.tables(rows, cols).diagonal_rays[pos[0]][pos[1]])
 
     @staticmethod
-    def get_queen_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: tuple[int, int], color: Color) -> Generator[Move, None, None]:
-        yield from MoveRules.get_rook_moves(grid, rows, cols, pos, color)
-        yield from MoveRules.get_bishop_moves(grid, rows, cols, pos, color)
+    def get_queen_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: Square, color: Color) -> Generator[int, None, None]:
+        return MoveRules._slide_moves(grid, cols, pos, color, MoveRules.tables(rows, cols).rays[pos[0]][pos[1]])
 
     @staticmethod
-    def get_knight_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: tuple[int, int], color: Color) -> Generator[Move, None, None]:
-        return MoveRules._get_moves_in_directions(grid, rows, cols, pos, color, MoveRules.KNIGHT_OFFSETS, limit=1)
+    def get_knight_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: Square, color: Color) -> Generator[int, None, None]:
+        return MoveRules._step_moves(grid, cols, pos, color, MoveRules.tables(rows, cols).knight[pos[0]][pos[1]])
 
     @staticmethod
-    def get_pawn_moves(grid: list[list[Piece | None]], rows: int, cols: int, last_move: Move | None, pos: tuple[int, int], color: Color) -> Generator[Move, None, None]:
+    def get_pawn_moves(grid: list[list[Piece | None]], rows: int, cols: int, last_move: Move | None, pos: Square, color: Color) -> Generator[int, None, None]:
         r, c = pos
         piece = grid[r][c]
         if not piece: return
+        start = r * cols + c
         direction = -1 if color == Color.WHITE else 1
         promotion_row = 0 if color == Color.WHITE else rows - 1
-        
+
         # 1. 前进
         tr, tc = r + direction, c
-        if 0 <= tr < rows and 0 <= tc < cols and grid[tr][tc] is None:
+        if 0 <= tr < rows and grid[tr][tc] is None:
             if tr == promotion_row:
-                #WARNING:注意这里并没有考虑升变棋子，但不影响对局
-                #如果后续考虑ai搜索，需要改成多产出几种升变选择
-                yield PromotionMove(pos, (tr, tc), piece)
+                # 升变只生成一次，具体选择由 promotion_choice 决定（perft/搜索会展开四种选择）
+                yield start | (tr * cols + tc) << MoveCode.TO_SHIFT | MoveCode.PROMOTION
             else:
-                yield Move(pos, (tr, tc), piece)
+                yield start | (tr * cols + tc) << MoveCode.TO_SHIFT
                 if piece.step == 0:
-                    tr2, tc2 = tr + direction, tc
-                    if 0 <= tr2 < rows and 0 <= tc2 < cols and grid[tr2][tc2] is None:
-                        yield Move(pos, (tr2, tc2), piece)
-        
+                    tr2 = tr + direction
+                    if 0 <= tr2 < rows and grid[tr2][tc] is None:
+                        yield start | (tr2 * cols + tc) << MoveCode.TO_SHIFT
+
         # 2. 吃子与过路兵
-        for dc in [-1, 1]:
-            tr, tc = r + direction, c + dc
-            if not (0 <= tr < rows and 0 <= tc < cols): continue
-            
+        for tr, tc in MoveRules.tables(rows, cols).pawn_captures[color][r][c]:
             target = grid[tr][tc]
             if target and target.color != color:
                 if tr == promotion_row:
-                    yield PromotionMove(pos, (tr, tc), piece, captured_piece=target)
+                    yield start | (tr * cols + tc) << MoveCode.TO_SHIFT | MoveCode.PROMOTION
                 else:
-                    yield Move(pos, (tr, tc), piece, captured_piece=target)
+                    yield start | (tr * cols + tc) << MoveCode.TO_SHIFT
             elif target is None and last_move:
                 # 只有当上一步是对方兵跃进两格时，才能吃过路兵
                 l_start, l_end, l_piece = last_move.start, last_move.end, last_move.piece
-                
+
                 if l_piece and l_piece.type == PieceType.PAWN and l_piece.color != color:
-                    if l_end == (r, c + dc) and abs(l_start[0] - l_end[0]) == 2:
-                        # 过路兵被吃的是 l_piece，位于 (r, c + dc)
-                        yield EnPassantMove(pos, (tr, tc), piece, captured_piece=l_piece)
+                    if l_end == (r, tc) and abs(l_start[0] - l_end[0]) == 2:
+                        # 过路兵被吃的是 l_piece，位于 (r, tc)
+                        yield start | (tr * cols + tc) << MoveCode.TO_SHIFT | MoveCode.EN_PASSANT
 
     @staticmethod
-    def get_king_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: tuple[int, int], color: Color) -> Generator[Move, None, None]:
+    def get_king_moves(grid: list[list[Piece | None]], rows: int, cols: int, pos: Square, color: Color, is_attacked: Callable[[Square], bool] | None = None) -> Generator[int, None, None]:
         # 1. 基础移动
-        yield from MoveRules._get_moves_in_directions(
-            grid, rows, cols, pos, color, 
-            MoveRules.STRAIGHT_DIRS + MoveRules.DIAGONAL_DIRS, 
-            limit=1
-        )
-        
+        yield from MoveRules._step_moves(grid, cols, pos, color, MoveRules.tables(rows, cols).king[pos[0]][pos[1]])
+
         # 2. 王车易位 (需要检查格点是否被攻击)
         r, c = pos
         king = grid[r][c]
         if not king or king.step > 0: return
 
+        # is_attacked 可由调用方提供（如棋盘维护的攻击表），否则逐格扫描
+        if is_attacked is None:
+            is_attacked = lambda square: MoveRules.is_square_attacked(grid, rows, cols, square, color.opposite())
+
         # 只有在不被将军时才能发起易位
-        if not MoveRules.is_square_attacked(grid, rows, cols, pos, color.opposite()):
+        if not is_attacked(pos):
             for rook_col in [0, cols - 1]:
                 rook = grid[r][rook_col]
                 if rook and rook.type == PieceType.ROOK and rook.step == 0:
@@ -148,5 +302,5 @@ class MoveRules:
                     target_col = c + 2 * step
                     # 检查路径格子是否受攻击（不包括王起始位置，因为已经检查过了）
                     check_path = range(c + step, target_col + step, step)
-                    if all(not MoveRules.is_square_attacked(grid, rows, cols, (r, col), color.opposite()) for col in check_path):
-                        yield CastlingMove(pos, (r, target_col), king, is_kingside=(rook_col > c))
+                    if not any(is_attacked((r, col)) for col in check_path):
+                        yield MoveCode.pack(r * cols + c, r * cols + target_col, MoveCode.CASTLING)
@@ -0,0 +1,383 @@
+"""
+搜索引擎：迭代加深 alpha-beta（negamax 形式）+ 置换表 + 静态搜索。
+走法排序依次为：置换表最佳着、MVV-LVA 吃子/升变、杀手着、历史启发。
+"""
+from __future__ import annotations
+import time
+from functools import lru_cache
+from typing import NamedTuple
+
+from .board import Board
+from .constants import Color, PieceType
+from .move import MoveCode
+
+# 子力价值（厘兵）
+PIECE_VALUES = {
+    PieceType.PAWN: 100,
+    PieceType.KNIGHT: 320,
+    PieceType.BISHOP: 330,
+    PieceType.ROOK: 500,
+    PieceType.QUEEN: 900,
+    PieceType.KING: 0,
+}
+MATE = 100000
+MATE_BOUND = MATE - 1000 # 超过此值视为杀棋分，需按层数修正
+INF = MATE + 1
+MAX_PLY = 64
+# 搜索只展开后和马两种升变，车/象升变几乎不会优于升后
+SEARCH_PROMOTIONS = ("Q", "N")
+# 静态搜索的增量剪枝余量：吃子后仍远低于 alpha 的走法不再展开
+DELTA_MARGIN = 200
+# 残局判定：双方非兵子力之和不超过此值时，王改为趋向中心
+ENDGAME_MATERIAL = 1300
+
+
+class SearchResult(NamedTuple):
+    code: int | None  # 最佳走法的 MoveCode，无合法走法时为 None
+    score: int        # 以行棋方视角的评估分（厘兵）
+    depth: int        # 完整搜索完成的深度
+    nodes: int
+    elapsed: float
+
+    @property
+    def nps(self) -> int:
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+
+class TTEntry(NamedTuple):
+    key: int
+    depth: int
+    score: int
+    flag: int
+    code: int | None
+
+
+class TranspositionTable:
+    """固定容量的置换表：以局面哈希取模定位槽位，同一局面直接覆盖，不同局面深度优先替换"""
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, size: int = 1 << 16):
+        self.size = size
+        self.slots: list[TTEntry | None] = [None] * size
+
+    def get(self, key: int) -> TTEntry | None:
+        entry = self.slots[key % self.size]
+        return entry if entry and entry.key == key else None
+
+    def store(self, key: int, depth: int, score: int, flag: int, code: int | None):
+        idx = key % self.size
+        old = self.slots[idx]
+        if old is None or old.key == key or depth >= old.depth:
+            self.slots[idx] = TTEntry(key, depth, score, flag, code)
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+
+@lru_cache(maxsize=None)
+def _position_tables(rows: int, cols: int) -> dict[tuple[Color, PieceType], list[int]]:
+    """
+    按棋盘尺寸生成的子力+位置分表，下标为 r * cols + c。
+    兵按前进距离加分，轻子与后按靠近中心加分，王（中局）按远离中心加分。
+    """
+    center_r, center_c = (rows - 1) / 2, (cols - 1) / 2
+    max_dist = center_r + center_c
+    tables = {}
+    for color in Color:
+        for p_type in PieceType:
+            table = []
+            for r in range(rows):
+                for c in range(cols):
+                    centrality = max_dist - (abs(r - center_r) + abs(c - center_c))
+                    advance = (rows - 2 - r) if color == Color.WHITE else (r - 1)
+                    if p_type == PieceType.PAWN:
+                        bonus = max(advance, 0) * 8 + (4 if abs(c - center_c) < 1 else 0)
+                    elif p_type in (PieceType.KNIGHT, PieceType.BISHOP):
+                        bonus = centrality * 6
+                    elif p_type == PieceType.QUEEN:
+                        bonus = centrality * 2
+                    elif p_type == PieceType.KING:
+                        bonus = -centrality * 6
+                    else:
+                        bonus = 0
+                    table.append(PIECE_VALUES[p_type] + int(bonus))
+            tables[(color, p_type)] = table
+    return tables
+
+
+# 计入残局判定的子力（兵与王不计）
+PHASE_VALUES = {p_type: (0 if p_type in (PieceType.PAWN, PieceType.KING) else value)
+                for p_type, value in PIECE_VALUES.items()}
+
+
+def evaluate(board: Board, color: Color) -> int:
+    """静态评估：子力 + 位置加分，返回 color 视角的分数"""
+    tables = _position_tables(board.rows, board.cols)
+    cols = board.cols
+    score = 0
+    material = 0
+    king_terms = 0
+    for side in Color:
+        sign = 1 if side == color else -1
+        for piece in board.pieces[side]:
+            r, c = piece.position
+            p_type = piece.type
+            value = tables[(side, p_type)][r * cols + c]
+            if p_type == PieceType.KING:
+                king_terms += sign * value
+            else:
+                material += PHASE_VALUES[p_type]
+                score += sign * value
+    # 残局时王应当积极参与，位置分取反
+    return score + (-king_terms if material <= ENDGAME_MATERIAL else king_terms)
+
+
+class SearchTimeout(Exception):
+    """时间预算用尽，中止当前迭代"""
+
+
+class Searcher:
+    """
+    在给定棋盘上搜索最佳走法。搜索过程会原地执行/撤销走法，结束后棋盘恢复原状；
+    调用方应传入独立的棋盘（如由 FEN 重建），避免与对局中的棋盘并发修改。
+    """
+    def __init__(self, board: Board, tt: TranspositionTable | None = None):
+        self.board = board
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.nodes = 0
+        self.deadline: float | None = None
+        self.seen: set[int] = set()  # 对局中已出现过的局面，再次出现按和棋处理
+        self.path: set[int] = set()  # 当前搜索路径上的局面
+        self.killers: list[list[int | None]] = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history: dict[tuple[Color, int], int] = {}
+        self.root_code: int | None = None
+
+    def search(self, color: Color, max_depth: int | None = None, time_limit: float | None = None,
+               seen: set[int] | None = None) -> SearchResult:
+        """迭代加深搜索；max_depth 与 time_limit 至少给出一个，超时后返回最后一个完整深度的结果"""
+        if max_depth is None:
+            max_depth = MAX_PLY if time_limit else 4
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit else None
+        self.nodes = 0
+        self.seen = set(seen or ())
+        self.path = set()
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = {}
+
+        best_code, best_score, completed = None, 0, 0
+        for depth in range(1, max_depth + 1):
+            self.root_code = None
+            try:
+                score = self._negamax(depth, -INF, INF, 0, color)
+            except SearchTimeout:
+                break
+            best_code, best_score, completed = self.root_code, score, depth
+            if best_code is None or abs(score) >= MATE_BOUND:
+                break # 无子可动或已找到杀棋
+        if best_code is None and completed == 0:
+            # 连第一层都没搜完：退回到任意合法走法
+            best_code = next(self.board._legal_move_generator(color), None)
+        return SearchResult(best_code, best_score, completed, self.nodes, time.perf_counter() - start)
+
+    # --- 内部实现 ---
+    def _tick(self):
+        self.nodes += 1
+        if self.deadline and not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int, color: Color) -> int:
+        self._tick()
+        board = self.board
+        key = board.hash
+        if ply > 0 and (key in self.path or key in self.seen):
+            return 0 # 重复局面
+        if ply >= MAX_PLY:
+            return evaluate(board, color)
+
+        in_check = board.is_in_check(color)
+        if in_check:
+            depth += 1 # 将军延伸
+        if depth <= 0:
+            return self._quiesce(alpha, beta, ply, color)
+
+        entry = self.tt.get(key)
+        tt_code = None
+        if entry:
+            tt_code = entry.code
+            if ply > 0 and entry.depth >= depth:
+                score = _score_from_tt(entry.score, ply)
+                if entry.flag == TranspositionTable.EXACT:
+                    return score
+                if entry.flag == TranspositionTable.LOWER and score >= beta:
+                    return score
+                if entry.flag == TranspositionTable.UPPER and score <= alpha:
+                    return score
+
+        codes = self._ordered(color, ply, tt_code, board._legal_move_generator(color))
+        if not codes:
+            return -MATE + ply if in_check else 0
+
+        alpha_orig = alpha
+        best, best_code = -INF, None
+        opponent = color.opposite()
+        self.path.add(key)
+        try:
+            for code in codes:
+                move = MoveCode.to_move(board, code)
+                move.execute(board)
+                try:
+                    score = -self._negamax(depth - 1, -beta, -alpha, ply + 1, opponent)
+                finally:
+                    move.undo(board)
+                if score > best:
+                    best, best_code = score, code
+                    if ply == 0:
+                        self.root_code = code
+                if score > alpha:
+                    alpha = score
+                if alpha >= beta:
+                    if self._is_quiet(code):
+                        self._record_cutoff(color, ply, code, depth)
+                    break
+        finally:
+            self.path.discard(key)
+
+        if best <= alpha_orig:
+            flag = TranspositionTable.UPPER
+        elif best >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self.tt.store(key, depth, _score_to_tt(best, ply), flag, best_code)
+        return best
+
+    def _quiesce(self, alpha: int, beta: int, ply: int, color: Color) -> int:
+        """静态搜索：只展开吃子与升变（被将军时展开全部应将），避免在交换中途评估"""
+        self._tick()
+        board = self.board
+        if ply >= MAX_PLY:
+            return evaluate(board, color)
+        in_check = board.is_in_check(color)
+        if not in_check:
+            stand_pat = evaluate(board, color)
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+
+        codes = board._legal_move_generator(color)
+        if not in_check:
+            codes = (code for code in codes if not self._is_quiet(code))
+        codes = self._ordered(color, ply, None, codes, use_killers=False)
+        if in_check and not codes:
+            return -MATE + ply
+
+        opponent = color.opposite()
+        for code in codes:
+            if not in_check:
+                gain = self._capture_gain(code)
+                if stand_pat + gain + DELTA_MARGIN < alpha or self._is_losing_capture(code, gain, opponent):
+                    continue
+            move = MoveCode.to_move(board, code)
+            move.execute(board)
+            try:
+                score = -self._quiesce(-beta, -alpha, ply + 1, opponent)
+            finally:
+                move.undo(board)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _is_quiet(self, code: int) -> bool:
+        """既非吃子也非升变的走法"""
+        flag = code & MoveCode.TYPE_MASK
+        if flag == MoveCode.EN_PASSANT or flag == MoveCode.PROMOTION:
+            return False
+        r, c = divmod(MoveCode.end_sq(code), self.board.cols)
+        return self.board.grid[r][c] is None
+
+    def _capture_gain(self, code: int) -> int:
+        """吃子与升变带来的子力增益"""
+        grid = self.board.grid
+        cols = self.board.cols
+        flag = code & MoveCode.TYPE_MASK
+        if flag == MoveCode.EN_PASSANT:
+            return PIECE_VALUES[PieceType.PAWN]
+        r, c = divmod(MoveCode.end_sq(code), cols)
+        gain = PIECE_VALUES[grid[r][c].type] if grid[r][c] else 0
+        if flag == MoveCode.PROMOTION:
+            gain += PIECE_VALUES[PieceType(MoveCode.promotion_choice(code))] - PIECE_VALUES[PieceType.PAWN]
+        return gain
+
+    def _is_losing_capture(self, code: int, gain: int, opponent: Color) -> bool:
+        """简化的交换评估：用更值钱的子去吃对方有保护的子，视为亏损"""
+        board = self.board
+        sr, sc = divmod(MoveCode.start_sq(code), board.cols)
+        attacker = PIECE_VALUES[board.grid[sr][sc].type]
+        if attacker <= gain or code & MoveCode.TYPE_MASK == MoveCode.PROMOTION:
+            return False
+        return board.is_square_attacked(divmod(MoveCode.end_sq(code), board.cols), opponent)
+
+    def _record_cutoff(self, color: Color, ply: int, code: int, depth: int):
+        killers = self.killers[ply]
+        if killers[0] != code:
+            killers[1] = killers[0]
+            killers[0] = code
+        key = (color, code & MoveCode.SQUARES_MASK)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def _ordered(self, color: Color, ply: int, tt_code: int | None, codes, use_killers: bool = True) -> list[int]:
+        """展开升变选择并按启发式排序（分数越高越先搜索）"""
+        grid = self.board.grid
+        cols = self.board.cols
+        killers = self.killers[ply] if use_killers else (None, None)
+        history = self.history
+        scored = []
+        for code in codes:
+            flag = code & MoveCode.TYPE_MASK
+            if flag == MoveCode.PROMOTION:
+                variants = [MoveCode.with_promotion(code, choice) for choice in SEARCH_PROMOTIONS]
+            else:
+                variants = (code,)
+            sr, sc = divmod(MoveCode.start_sq(code), cols)
+            er, ec = divmod(MoveCode.end_sq(code), cols)
+            attacker = PIECE_VALUES[grid[sr][sc].type]
+            victim_piece = grid[sr][ec] if flag == MoveCode.EN_PASSANT else grid[er][ec]
+            for variant in variants:
+                if variant == tt_code:
+                    score = 1 << 30
+                elif victim_piece or flag == MoveCode.PROMOTION:
+                    # MVV-LVA：先吃价值高的子，同价值时用价值低的子去吃
+                    victim = PIECE_VALUES[victim_piece.type] if victim_piece else 0
+                    promo = MoveCode.promotion_choice(variant)
+                    if promo:
+                        victim += PIECE_VALUES[PieceType(promo)]
+                    score = (1 << 20) + victim * 16 - attacker // 100
+                elif variant == killers[0]:
+                    score = (1 << 19) + 1
+                elif variant == killers[1]:
+                    score = 1 << 19
+                else:
+                    score = history.get((color, variant & MoveCode.SQUARES_MASK), 0)
+                scored.append((score, variant))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [code for _, code in scored]
+
+
+def _score_to_tt(score: int, ply: int) -> int:
+    """杀棋分以当前节点为基准存储，读取时再换算回根节点的层数"""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
@@ -0,0 +1,80 @@
+from __future__ import annotations
+import random
+from typing import TYPE_CHECKING
+
+from .constants import Color, PieceType
+
+if TYPE_CHECKING:
+    from .board import Board
+    from .move import Move
+    from .piece import Piece
+
+# 固定种子：同一局面在任何进程、任何时刻得到相同的哈希，可用作持久化索引的键
+ZOBRIST_SEED = 0x5EED_C4E55
+
+
+class Zobrist:
+    """
+    某一棋盘尺寸下的 Zobrist 随机数表，按尺寸全局缓存。
+    局面哈希 = 各棋子键 ^ 易位权键 ^ 过路兵列键 ^ 轮到黑方键。
+    易位权键与 FEN 的易位权一致：每一项易位权（王与对应角上的车都未动过）计入该角格子的键。
+    """
+    _cache: dict[tuple[int, int], Zobrist] = {}
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        rng = random.Random(ZOBRIST_SEED ^ (rows << 8) ^ cols)
+        n = rows * cols
+        self.pieces: dict[tuple[Color, PieceType], list[int]] = {
+            (color, p_type): [rng.getrandbits(64) for _ in range(n)]
+            for color in Color for p_type in PieceType
+        }
+        self.castling = [rng.getrandbits(64) for _ in range(n)]
+        self.en_passant = [rng.getrandbits(64) for _ in range(cols)]
+        self.side = rng.getrandbits(64)
+
+    @classmethod
+    def get(cls, rows: int, cols: int) -> Zobrist:
+        key = (rows, cols)
+        table = cls._cache.get(key)
+        if table is None:
+            table = cls._cache[key] = Zobrist(rows, cols)
+        return table
+
+    def piece_key(self, piece: Piece, pos: tuple[int, int]) -> int:
+        return self.pieces[(piece.color, piece.type)][pos[0] * self.cols + pos[1]]
+
+    def castling_key(self, board: Board) -> int:
+        """当前易位权的键：王未动过且位于底线时，对应角上未动过的己方车各计入一项（与 generate_board_fen 一致）"""
+        h = 0
+        grid = board.grid
+        for color, row in ((Color.WHITE, self.rows - 1), (Color.BLACK, 0)):
+            king_pos = board.king_pos[color]
+            if not king_pos or king_pos[0] != row:
+                continue
+            king = grid[row][king_pos[1]]
+            if king is None or king.type != PieceType.KING or king.color != color or king.step != 0:
+                continue
+            for col in (self.cols - 1, 0):
+                rook = grid[row][col]
+                if rook and rook.type == PieceType.ROOK and rook.color == color and rook.step == 0:
+                    h ^= self.castling[row * self.cols + col]
+        return h
+
+    def en_passant_key(self, last_move: Move | None) -> int:
+        """与 FEN 一致：上一步为兵跃进两格时记录过路兵列"""
+        if last_move and last_move.piece.type == PieceType.PAWN and abs(last_move.start[0] - last_move.end[0]) == 2:
+            return self.en_passant[last_move.start[1]]
+        return 0
+
+    def compute(self, board: Board, turn: Color) -> int:
+        """从零计算整个局面的哈希（用于初始化与校验增量结果）"""
+        h = self.castling_key(board)
+        for color in Color:
+            for piece in board.pieces[color]:
+                h ^= self.piece_key(piece, piece.position)
+        h ^= self.en_passant_key(board.last_move)
+        if turn == Color.BLACK:
+            h ^= self.side
+        return h
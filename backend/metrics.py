@@ -0,0 +1,185 @@
+"""
+进程内的计数器与直方图，GET /metrics 以 Prometheus 文本格式导出。
+
+记录一次观测只是一次二分查找加几次累加（持一把很少竞争的锁），约 1 微秒，相对落子、走法生成可以忽略；
+文本只在被抓取时生成，房间数、连接数等状态量也只在抓取时通过回调读取。
+CHESS_METRICS=0 时所有记录直接返回。
+
+多个工作进程时每个进程各自导出，由 Prometheus 按实例区分。
+"""
+from __future__ import annotations
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+ENABLED = os.environ.get("CHESS_METRICS", "1") != "0"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 秒：覆盖从亚毫秒级的落子到秒级的搜索与保存
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """各桶的计数分开存放，抓取时再累加为 Prometheus 要求的累积计数"""
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {} # 标签 -> [各桶计数（最后一个为 +Inf）, 总和]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels) -> _Timer:
+        return _Timer(self, labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class _Timer:
+    """with 语句计时；比 contextlib.contextmanager 少一层生成器"""
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Sampled:
+    """抓取时才读取的量：回调返回单个数值，或 {标签值元组: 数值}"""
+    def __init__(self, name: str, help: str, read: Callable[[], float | dict], labels: tuple[str, ...] = (),
+                 kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labelnames = labels
+        self.kind = kind
+
+    def render(self) -> Iterable[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            print(f"读取指标 {self.name} 失败: {e}")
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram | Sampled] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def sampled(self, name: str, help: str, read: Callable[[], float | dict], labels: tuple[str, ...] = (),
+                kind: str = "gauge") -> Sampled:
+        return self.register(Sampled(name, help, read, labels, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- 热路径 ---
+WS_MESSAGE_SECONDS = REGISTRY.histogram("chess_ws_message_seconds", "WebSocket 消息处理耗时（按消息类型）", ("type",))
+MAKE_MOVE_SECONDS = REGISTRY.histogram("chess_make_move_seconds", "Game.make_move 耗时（按来源：玩家或电脑）", ("source",))
+LEGAL_MOVES_SECONDS = REGISTRY.histogram("chess_legal_moves_seconds", "合法走法生成耗时（单个棋子或整张走法表）", ("scope",))
+ANALYZE_SECONDS = REGISTRY.histogram("chess_analyze_seconds", "分析接口耗时", ("endpoint",))
+BROADCAST_SECONDS = REGISTRY.histogram("chess_broadcast_seconds", "一次房间广播向本进程全部连接发送的耗时")
+BROADCAST_MESSAGES = REGISTRY.counter("chess_broadcast_messages_total", "广播发出的消息条数（每个连接计一次）")
+ARCHIVE_SECONDS = REGISTRY.histogram("chess_archive_seconds", "存档保存与读取耗时", ("op",))
+
+
+def timed(fn: Callable, *args):
+    """在执行器（可能是子进程）中运行 fn 并返回 (结果, 耗时)，耗时由调用方在本进程记录"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
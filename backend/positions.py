@@ -0,0 +1,244 @@
+"""
+局面倒排索引（SQLite）：局面键 -> (存档, 步数)。保存与导入时增量写入，也可从存档目录离线重建：
+    python -m backend.positions --rebuild
+
+局面键为规范化 FEN（布局、行棋方、易位权、过路兵四段；过路兵格只在确实可吃时保留）的 64 位摘要。
+不直接使用棋盘的增量 Zobrist 哈希：它在兵跃进两格后总是计入过路兵列，无论能否吃过路兵，
+按“同一局面”查询时会把本应相同的局面分开。
+数据按 (键, 对局, 步数) 聚簇存放在磁盘上，查询只读取匹配的 B 树页，不把索引载入内存。
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Any, Iterable
+
+from . import archive
+from .catalog import decode_cursor, encode_cursor
+from .logic.board import Board
+from .logic.constants import Color
+from .logic.notation import NotationHandler
+from .logic.record import GameRecord
+
+POSITIONS_FILE = "positions.sqlite3"
+# 单次查询返回的匹配条数默认值与上限
+MATCH_LIMIT = 100
+MATCH_LIMIT_MAX = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    gid INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    keys BLOB
+);
+CREATE TABLE IF NOT EXISTS positions (
+    key INTEGER NOT NULL,
+    gid INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    PRIMARY KEY (key, gid, ply)
+) WITHOUT ROWID;
+"""
+
+
+def _expand_rows(placement: str) -> list[str]:
+    return ["".join("." * int(ch) if ch.isdigit() else ch for ch in row) for row in placement.split("/")]
+
+
+def position_key(fen: str) -> int:
+    """
+    规范化 FEN 的 64 位摘要（转为 SQLite 的有符号整数）。
+    FEN 在兵跃进两格后总是写出过路兵格；只有行棋方确实有兵可以吃过路兵时才计入，
+    否则经不同走法顺序到达的同一局面会得到不同的键。
+    """
+    parts = fen.split()[:4]
+    if len(parts) == 4 and parts[3] != '-':
+        rows = _expand_rows(parts[0])
+        col = ord(parts[3][0]) - ord('a')
+        row = len(rows) - int(parts[3][1:])
+        pawn, pawn_row = ('P', row + 1) if parts[1] == 'w' else ('p', row - 1)
+        capturable = 0 <= pawn_row < len(rows) and any(
+            0 <= c < len(rows[pawn_row]) and rows[pawn_row][c] == pawn for c in (col - 1, col + 1))
+        if not capturable:
+            parts[3] = '-'
+    digest = hashlib.blake2b(" ".join(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def canonical_fen(fen: str, rows: int = 8, cols: int = 8) -> str:
+    """把外部输入的 FEN 经棋盘解析后重新生成，使易位权、过路兵的写法与存档一致"""
+    board = Board(rows, cols)
+    board.track_attacks = False
+    NotationHandler.parse_fen_to_board(board, fen)
+    parts = fen.split()
+    turn = Color.BLACK if len(parts) > 1 and parts[1] == 'b' else Color.WHITE
+    return NotationHandler.generate_board_fen(board, turn)
+
+
+def history_keys(fens: Iterable[str]) -> list[int]:
+    """对局 fen_history 各项的局面键；第 0 项是载入时的 FEN 原文，先规范化（易位权按实际棋子）"""
+    keys = []
+    for ply, fen in enumerate(fens):
+        if ply == 0:
+            rows = fen.split()[0].split("/")
+            fen = canonical_fen(fen, len(rows), sum(int(ch) if ch.isdigit() else 1 for ch in rows[0]))
+        keys.append(position_key(fen))
+    return keys
+
+
+def record_keys(record: GameRecord) -> list[int]:
+    """一局每一步之后（含起始局面）的局面键"""
+    return [position_key(fen) for fen in record.fen_history()]
+
+
+class PositionIndex:
+    """单个 SQLite 连接加锁，供事件循环与导入线程共用"""
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.created = not os.path.exists(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> PositionIndex:
+        """CHESS_POSITIONS 指定索引文件，默认放在索引目录 saved_indexes 下"""
+        return cls(os.environ.get("CHESS_POSITIONS") or archive.index_path(POSITIONS_FILE))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- 维护 ---
+    def _clear(self, gid: int, blob: bytes | None):
+        # 每局的局面键另存一份，删除时按主键逐条删除，不需要 gid 上的二级索引
+        if blob:
+            keys = struct.unpack(f"<{len(blob) // 8}q", blob)
+            self._conn.executemany("DELETE FROM positions WHERE key = ? AND gid = ?", [(key, gid) for key in set(keys)])
+
+    def add_many(self, games: Iterable[tuple[str, list[int]]]):
+        """写入 [(存档 ID, 各步局面键)]，同一存档的旧条目被替换；整批在一个事务中提交"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for game_id, keys in games:
+                    blob = struct.pack(f"<{len(keys)}q", *keys)
+                    row = self._conn.execute("SELECT gid, keys FROM games WHERE id = ?", (game_id,)).fetchone()
+                    if row is None:
+                        gid = self._conn.execute("INSERT INTO games (id, keys) VALUES (?, ?)", (game_id, blob)).lastrowid
+                    else:
+                        gid = row[0]
+                        self._clear(gid, row[1])
+                        self._conn.execute("UPDATE games SET keys = ? WHERE gid = ?", (blob, gid))
+                    # 同一局面在一局中重复出现时每次都记录（不同步数）
+                    self._conn.executemany("INSERT OR IGNORE INTO positions (key, gid, ply) VALUES (?, ?, ?)",
+                                           [(key, gid, ply) for ply, key in enumerate(keys)])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add(self, game_id: str, keys: list[int]):
+        self.add_many([(game_id, keys)])
+
+    def rename(self, old_id: str, new_id: str) -> bool:
+        """只改存档 ID 映射，局面条目按内部编号存放，无需改写"""
+        with self._lock:
+            return self._conn.execute("UPDATE games SET id = ? WHERE id = ?", (new_id, old_id)).rowcount > 0
+
+    def remove(self, game_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT gid, keys FROM games WHERE id = ?", (game_id,)).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("BEGIN")
+            self._clear(*row)
+            self._conn.execute("DELETE FROM games WHERE gid = ?", (row[0],))
+            self._conn.execute("COMMIT")
+            return True
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def rebuild(self, batch: int = 200) -> int:
+        """清空并从存档目录重建，返回索引的局数"""
+        with self._lock:
+            self._conn.execute("DELETE FROM positions")
+            self._conn.execute("DELETE FROM games")
+        if not os.path.isdir(archive.ARCHIVE_DIR):
+            return 0
+        total = 0
+        pending = []
+        for game_id in os.listdir(archive.ARCHIVE_DIR):
+            if not os.path.isdir(archive.archive_dir(game_id)):
+                continue
+            try:
+                keys = archive_keys(game_id)
+            except Exception as e:
+                print(f"索引存档 {game_id} 的局面失败: {e}")
+                continue
+            if keys is None:
+                continue
+            pending.append((game_id, keys))
+            if len(pending) >= batch:
+                self.add_many(pending)
+                total += len(pending)
+                pending = []
+        self.add_many(pending)
+        return total + len(pending)
+
+    # --- 查询 ---
+    def lookup(self, fen: str, limit: int = MATCH_LIMIT, cursor: str | None = None) -> dict[str, Any]:
+        """
+        返回到达该局面的存档与步数 {"matches": [{"id", "ply"}], "next_cursor"}，按存档内部编号、步数排序。
+        键集分页，游标不合法时抛出 ValueError。
+        """
+        limit = max(1, min(limit, MATCH_LIMIT_MAX))
+        key = position_key(canonical_fen(fen))
+        sql = "SELECT p.gid, g.id, p.ply FROM positions p JOIN games g ON g.gid = p.gid WHERE p.key = ?"
+        params: list = [key]
+        if cursor:
+            sql += " AND (p.gid, p.ply) > (?, ?)"
+            params += decode_cursor(cursor)
+        with self._lock:
+            rows = self._conn.execute(f"{sql} ORDER BY p.gid, p.ply LIMIT ?", (*params, limit + 1)).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][0], rows[-1][2]])
+        return {"matches": [{"id": game_id, "ply": ply} for _, game_id, ply in rows], "next_cursor": next_cursor}
+
+
+def archive_keys(game_id: str) -> list[int] | None:
+    """读取存档目录中的一局计算各步局面键（二进制记录或旧版 JSON）"""
+    record = archive.open_record(game_id)
+    if record is not None:
+        with record:
+            return record_keys(record)
+    data = archive.read_archive(game_id)
+    if data is None:
+        return None
+    return history_keys(data["fen_history"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="局面索引维护")
+    parser.add_argument("--rebuild", action="store_true", help="从存档目录重建索引")
+    parser.add_argument("--db", default=None, help="索引文件路径，默认为 CHESS_POSITIONS 或 saved_indexes/positions.sqlite3")
+    args = parser.parse_args()
+    index = PositionIndex(args.db) if args.db else PositionIndex.from_env()
+    if args.rebuild:
+        start = time.perf_counter()
+        total = index.rebuild()
+        print(f"已索引 {total} 局，耗时 {time.perf_counter() - start:.2f} 秒")
+    else:
+        print(f"索引中共 {index.count()} 个局面条目")
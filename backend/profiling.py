@@ -0,0 +1,377 @@
+"""
+按需剖析：不重启服务，对指定房间的操作或接下来若干次 /analyze 计算做 cProfile 或采样剖析，
+并对房间内存做 tracemalloc 快照。默认关闭，CHESS_PROFILING=1 时开放 /admin/profile 接口
+（设置了 CHESS_ADMIN_TOKEN 时须带 X-Admin-Token 请求头）。
+
+结果写入 CHESS_PROFILE_DIR（默认 profiles）：
+    *.prof        pstats 格式，可用 python -m pstats、snakeviz 等查看
+    *.folded      采样得到的折叠调用栈（"帧;帧;帧 次数"），可直接交给 flamegraph.pl / speedscope
+    *.txt         按累计耗时排序的前若干个函数
+    *.tracemalloc tracemalloc 快照（tracemalloc.Snapshot.load 读取）与同名 .json 房间内存报告
+
+剖析的是执行器中的计算（落子、走法生成、搜索、走法表），事件循环上的收发不计入。
+进程池模式下子进程中的计算（搜索、走法表）只能用 cProfile（统计在子进程中收集后传回），
+采样方式只覆盖持房间锁在本进程线程池中执行的操作。
+"""
+from __future__ import annotations
+import asyncio
+import cProfile
+import gc
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter
+from functools import partial
+from typing import Any, Callable
+
+from .logic.bitboard import Geometry
+from .logic.zobrist import Zobrist
+
+PROFILE_DIR = "profiles"
+MODES = ("cprofile", "sample")
+# 采样间隔（秒）与单个会话的时长上限
+SAMPLE_INTERVAL = 0.002
+MAX_SECONDS = 600.0
+# 文本摘要与内存报告中列出的条目数
+TOP_ENTRIES = 30
+
+
+def profiled_call(fn: Callable, *args) -> tuple[Any, dict]:
+    """在执行器中（可能是子进程）以 cProfile 运行 fn，返回 (结果, 原始统计)；统计可以跨进程传回"""
+    profile = cProfile.Profile()
+    try:
+        result = profile.runcall(fn, *args)
+    finally:
+        profile.create_stats()
+    return result, profile.stats
+
+
+class _RawStats:
+    """pstats.Stats 可以从带 create_stats/stats 的对象读取统计"""
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class Sampler:
+    """后台线程定期读取被标记线程的调用栈，按折叠栈计数"""
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._threads: dict[int, int] = {} # 线程 ID -> 嵌套层数
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chess-sampler", daemon=True)
+        self._thread.start()
+
+    def tagged(self, fn: Callable, *args) -> Any:
+        """在当前线程执行 fn，执行期间该线程被采样"""
+        ident = threading.get_ident()
+        self._threads[ident] = self._threads.get(ident, 0) + 1
+        try:
+            return fn(*args)
+        finally:
+            if self._threads[ident] == 1:
+                del self._threads[ident]
+            else:
+                self._threads[ident] -= 1
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if not self._threads:
+                continue
+            frames = sys._current_frames()
+            for ident in list(self._threads):
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Session:
+    """一次剖析：max_calls 或 seconds 到达后自动结束并写出结果"""
+    def __init__(self, key: str, mode: str, max_calls: int | None = None, seconds: float | None = None):
+        if mode not in MODES:
+            raise ValueError(f"不支持的剖析方式: {mode}")
+        self.key = key
+        self.mode = mode
+        self.max_calls = max_calls
+        self.deadline = time.monotonic() + min(seconds or MAX_SECONDS, MAX_SECONDS)
+        self.started = time.time()
+        self.calls = 0
+        self.stats: pstats.Stats | None = None
+        self.sampler = Sampler() if mode == "sample" else None
+        self._lock = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline or (self.max_calls is not None and self.calls >= self.max_calls)
+
+    def add(self, raw: dict):
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(_RawStats(raw))
+            else:
+                self.stats.add(_RawStats(raw))
+
+    async def run(self, executor, fn: Callable, *args, **kwargs) -> Any:
+        """经执行器运行 fn(*args) 并收集剖析数据；kwargs 原样交给 executor.run（lock、timeout）"""
+        self.calls += 1
+        if self.mode == "cprofile":
+            result, raw = await executor.run(profiled_call, fn, *args, **kwargs)
+            self.add(raw)
+            return result
+        if executor.kind == "process" and kwargs.get("lock") is None:
+            # 采样线程看不到子进程的调用栈：这类调用（如进程池中的搜索）不计入
+            self.calls -= 1
+            return await executor.run(fn, *args, **kwargs)
+        return await executor.run(partial(self.sampler.tagged, fn), *args, **kwargs)
+
+    def finish(self, directory: str) -> list[str]:
+        """结束会话并写出结果文件，返回路径"""
+        if self.sampler is not None:
+            self.sampler.stop()
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{_safe_name(self.key)}-{_stamp(self.started)}")
+        paths = []
+        if self.stats is not None:
+            self.stats.dump_stats(base + ".prof")
+            summary = io.StringIO()
+            pstats.Stats(base + ".prof", stream=summary).sort_stats("cumulative").print_stats(TOP_ENTRIES)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(f"{self.key}: {self.calls} 次调用\n{summary.getvalue()}")
+            paths += [base + ".prof", base + ".txt"]
+        if self.sampler is not None and self.sampler.stacks:
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in self.sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            paths.append(base + ".folded")
+        return paths
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "mode": self.mode,
+            "calls": self.calls,
+            "max_calls": self.max_calls,
+            "remaining": round(max(0.0, self.deadline - time.monotonic()), 1),
+            "samples": self.sampler.samples if self.sampler else None,
+        }
+
+
+def _safe_name(key: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", key)
+
+
+def _stamp(t: float) -> str:
+    """文件名中的时间，精确到毫秒，连续两次报告不会互相覆盖"""
+    return time.strftime("%Y%m%d-%H%M%S", time.localtime(t)) + f"-{int(t * 1000) % 1000:03d}"
+
+
+# --- 内存 ---
+_SKIP = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_size(obj, seen: set[int]) -> tuple[int, int]:
+    """从 obj 出发可达对象的 (总字节数, 对象数)；seen 中的对象不重复计入，类型、模块与函数跳过"""
+    size = count = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIP):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        count += 1
+        stack.extend(gc.get_referents(item))
+    return size, count
+
+
+def room_memory(game) -> dict:
+    """
+    一个房间的对局各部分占用的内存（须持房间锁调用）。按 走法历史、棋盘、FEN 历史、重复计数 的顺序统计，
+    走法与棋盘共享的对象只计入先统计到的一方。走法历史在棋盘之前：棋盘的 last_move 经每步走法的
+    prev_last_move 链到全部走法，先统计棋盘会把整个走法历史算到棋盘上。
+    按棋盘尺寸全局缓存的 Zobrist 表与位棋盘几何表不计入。
+    """
+    shared = list(Zobrist._cache.values()) + list(Geometry._cache.values())
+    seen: set[int] = {id(table) for table in shared}
+    parts = {}
+    for name, obj in (("history", game.history), ("board", game.board),
+                      ("fen_history", game.fen_history), ("position_counts", game.position_counts)):
+        size, count = deep_size(obj, seen)
+        parts[name] = {"bytes": size, "objects": count}
+    return {
+        "plies": len(game.history),
+        "bytes": sum(p["bytes"] for p in parts.values()),
+        "parts": parts,
+    }
+
+
+def tracemalloc_report(path: str | None, top: int = TOP_ENTRIES) -> dict:
+    """tracemalloc 快照：按源码行汇总项目代码中的分配，path 不为空时同时写出快照文件"""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    snapshot = tracemalloc.take_snapshot()
+    if path:
+        snapshot.dump(path)
+    package = os.path.dirname(os.path.abspath(__file__))
+    stats = snapshot.filter_traces([tracemalloc.Filter(True, os.path.join(package, "*"))]).statistics("lineno")
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "top": [{"line": str(stat.traceback[0]), "bytes": stat.size, "blocks": stat.count} for stat in stats[:top]],
+    }
+
+
+class Profiler:
+    """进程内的剖析会话表；会话以 "room:<房间 ID>" 或 "analyze" 为键"""
+    def __init__(self, enabled: bool = False, directory: str = PROFILE_DIR, token: str | None = None):
+        self.enabled = enabled
+        self.directory = directory
+        self.token = token
+        self.sessions: dict[str, Session] = {}
+        self.results: list[dict] = []
+
+    @classmethod
+    def from_env(cls) -> Profiler:
+        frames = int(os.environ.get("CHESS_TRACEMALLOC", "0"))
+        if frames and not tracemalloc.is_tracing():
+            tracemalloc.start(frames) # 尽早开始追踪，启动后的分配都能定位到源码行
+        return cls(os.environ.get("CHESS_PROFILING", "0") == "1",
+                   os.environ.get("CHESS_PROFILE_DIR", PROFILE_DIR),
+                   os.environ.get("CHESS_ADMIN_TOKEN") or None)
+
+    def authorize(self, token: str | None) -> str | None:
+        """返回错误信息；None 表示允许"""
+        if not self.enabled:
+            return "未开启剖析接口（CHESS_PROFILING=1）"
+        if self.token is not None and token != self.token:
+            return "管理口令无效"
+        return None
+
+    def active(self, key: str) -> Session | None:
+        """热路径上调用：没有会话时只是一次字典查询"""
+        if not self.sessions:
+            return None
+        session = self.sessions.get(key)
+        if session is not None and session.expired:
+            self._stop_later(key)
+            return None
+        return session
+
+    def start(self, key: str, mode: str = "cprofile", max_calls: int | None = None,
+              seconds: float | None = None) -> Session:
+        if key in self.sessions:
+            raise ValueError(f"{key} 已在剖析中")
+        session = self.sessions[key] = Session(key, mode, max_calls, seconds)
+        # 到时没有新的调用也会结束并写出结果
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            loop.call_later(session.deadline - time.monotonic(), self._expire, key, session)
+        return session
+
+    async def run(self, key: str, executor, fn: Callable, *args, **kwargs) -> Any:
+        """经执行器运行 fn(*args)；key 有剖析会话时在会话中运行，达到调用次数后结束会话"""
+        session = self.active(key)
+        if session is None:
+            return await executor.run(fn, *args, **kwargs)
+        try:
+            return await session.run(executor, fn, *args, **kwargs)
+        finally:
+            if session.expired and self.sessions.get(key) is session:
+                self._stop_later(key)
+
+    def _expire(self, key: str, session: Session):
+        if self.sessions.get(key) is session:
+            self._stop_later(key)
+
+    def stop(self, key: str) -> dict | None:
+        """结束会话并写出结果；会阻塞（导出 pstats、写文件、等待采样线程），不要在事件循环上调用"""
+        session = self.sessions.pop(key, None)
+        if session is None:
+            return None
+        return self._finish(session)
+
+    def _stop_later(self, key: str):
+        """在事件循环上结束会话：立即从会话表移除，写出结果交给线程池"""
+        session = self.sessions.pop(key, None)
+        if session is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._finish(session)
+            return
+        loop.run_in_executor(None, self._finish, session)
+
+    def _finish(self, session: Session) -> dict:
+        try:
+            paths = session.finish(self.directory)
+        except Exception as e:
+            print(f"写出剖析结果失败: {e}")
+            paths = []
+        result = {**session.to_dict(), "files": paths}
+        self.results.append(result)
+        return result
+
+    def memory(self, rooms: dict[str, dict], stop: bool = False) -> dict:
+        """
+        汇总各房间的内存报告与 tracemalloc 快照并写出。未在追踪时开始追踪；
+        stop 为真时取完快照后停止追踪（追踪期间每次分配都更慢并占用额外内存），未在追踪时也不再开始。
+        """
+        started = False
+        if not stop and not tracemalloc.is_tracing():
+            tracemalloc.start(int(os.environ.get("CHESS_TRACEMALLOC", "0")) or 1)
+            started = True
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, "memory-" + _stamp(time.time()))
+        # 刚开始追踪时快照里只有此后的分配，稍后再取一次才有意义
+        snapshot = base + ".tracemalloc" if tracemalloc.is_tracing() and not started else None
+        report = {
+            "rooms": rooms,
+            "tracemalloc": tracemalloc_report(snapshot),
+            "tracing_started": started,
+            "tracing_stopped": stop and tracemalloc.is_tracing(),
+        }
+        if report["tracing_stopped"]:
+            tracemalloc.stop()
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        files = [base + ".json"] + ([snapshot] if snapshot else [])
+        self.results.append({"key": "memory", "files": files})
+        return {**report, "files": files}
+
+    def status(self) -> dict:
+        return {
+            "sessions": [session.to_dict() for session in self.sessions.values()],
+            "results": self.results[-20:],
+            "tracemalloc": tracemalloc.is_tracing(),
+            "directory": self.directory,
+        }
+
@@ -0,0 +1,85 @@
+"""
+房间的 WebSocket 同步协议（版本 2）：
+
+- init:   {"type": "init", "protocol": 2, "seq": n, "state": 完整状态}，连接、重置与 resync 时发送；
+- update: {"type": "update", "seq": n, "op": "move" | "undo", "ply": 步数, "fen": 当前局面, "turn", "status", ...}
+          只携带这一步的变化，move 额外带 "san" 与 "last_move"，大小与对局长度无关；
+- 客户端收到 seq 不连续的 update 时发送 {"type": "resync"}，服务器回复 init。
+
+seq 即对局的 version：每次落子/撤销加一，重置后的新对局从旧对局的 version + 1 开始，
+因此过期消息（seq 不大于本地）可以直接丢弃。
+"""
+import asyncio
+import json
+from typing import Dict, List
+
+from fastapi import WebSocket
+
+from .logic.game import Game
+from .metrics import BROADCAST_MESSAGES, BROADCAST_SECONDS
+
+PROTOCOL_VERSION = 2
+
+
+def init_message(game: Game) -> dict:
+    return {"type": "init", "protocol": PROTOCOL_VERSION, "seq": game.version, "state": game.get_state_dict()}
+
+
+def move_delta(game: Game) -> dict:
+    """刚执行的一步对应的增量（须持房间锁调用）"""
+    last = game.history[-1]
+    return {
+        "type": "update",
+        "seq": game.version,
+        "op": "move",
+        "ply": len(game.history),
+        "san": last.san,
+        "fen": game.fen_history[-1],
+        "turn": game.turn.value,
+        "status": game.status.value,
+        "last_move": {"start": last.start, "end": last.end},
+    }
+
+
+def undo_delta(game: Game) -> dict:
+    return {
+        "type": "update",
+        "seq": game.version,
+        "op": "undo",
+        "ply": len(game.history),
+        "fen": game.fen_history[-1],
+        "turn": game.turn.value,
+        "status": game.status.value,
+    }
+
+
+class ConnectionManager:
+    def __init__(self):
+        self.active_connections: Dict[str, List[WebSocket]] = {}
+
+    async def connect(self, room_id: str, websocket: WebSocket):
+        await websocket.accept()
+        if room_id not in self.active_connections:
+            self.active_connections[room_id] = []
+        self.active_connections[room_id].append(websocket)
+
+    def disconnect(self, room_id: str, websocket: WebSocket):
+        connections = self.active_connections.get(room_id)
+        if connections and websocket in connections:
+            connections.remove(websocket)
+        # 空房间不保留条目，否则字典随用过的房间 ID 无限增长
+        if connections is not None and not connections:
+            del self.active_connections[room_id]
+
+    async def broadcast(self, room_id: str, message: dict):
+        """每次广播只编码一次，并发发送给房间内所有连接；发送失败的连接被移除"""
+        connections = list(self.active_connections.get(room_id, ()))
+        if not connections:
+            return
+        with BROADCAST_SECONDS.time():
+            text = json.dumps(message)
+            results = await asyncio.gather(*[c.send_text(text) for c in connections], return_exceptions=True)
+        BROADCAST_MESSAGES.inc(amount=len(connections))
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(room_id, connection)
@@ -0,0 +1,410 @@
+"""
+房间生命周期管理：进程内只保留活跃的对局，空闲房间写入房间存储后释放。
+
+- 没有连接且超过 CHESS_ROOM_TTL 秒（默认 600）未操作的房间被逐出；
+- 内存中的房间数超过 CHESS_MAX_ROOMS（默认 1000）时，按最近最少使用逐出没有连接的房间；
+- 客户端重新连接该房间时从存储中重放走法恢复。
+
+房间存储（CHESS_ROOM_STORE）：
+    file    默认。逐出的房间以二进制对局记录（见 logic/record.py）保存在 CHESS_ROOMS_DIR（默认 saved_rooms）下，
+            恢复后删除文件；房间状态只存在于本进程，只能运行单个工作进程。
+    sqlite  多个工作进程共享 CHESS_ROOM_DB（默认 saved_rooms/rooms.sqlite3）。每次修改对局都在
+            跨进程的写事务中完成：先追上其他进程的修改，执行操作，再写回带版本号的对局记录。
+
+有连接的房间与正在执行操作（房间锁被占用）的房间不会被逐出。
+存储中的状态无法恢复时不删除：file 存储改名为 .failed 文件，sqlite 存储移到 failed_rooms 表，房间以新对局打开。
+"""
+from __future__ import annotations
+import base64
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from . import archive
+from .logic import record
+from .logic.board import Board
+from .logic.game import Game
+from .logic.record import GameRecord
+
+ROOMS_DIR = "saved_rooms"
+ROOM_FILE_SUFFIX = ".bin"
+FAILED_FILE_SUFFIX = ".failed"
+ROOM_DB_FILE = "rooms.sqlite3"
+ROOM_TTL = 600.0
+MAX_ROOMS = 1000
+# 周期性检查空闲房间的间隔（秒）
+SWEEP_INTERVAL = 30.0
+
+
+class RoomEvicted(KeyError):
+    """房间已不在内存中（已被逐出）：调用方重新 open 后重试"""
+
+
+def encode_room(game: Game) -> bytes:
+    return record.encode_game(game, {"version": game.version})
+
+
+def sync_game(game: Game, saved: GameRecord):
+    """
+    把内存中的对局原地更新为记录中的状态：撤销到两者走法序列的公共前缀，再重放其余走法。
+    其他进程通常只是多走了几步，只需重放新增的走法，不必重建整局。
+    """
+    codes = saved.codes()
+    if saved.start_fen != game.fen_history.start_fen:
+        game.load_fen(saved.start_fen)
+    local = game.fen_history.codes
+    common = 0
+    while common < min(len(local), len(codes)) and local[common] == codes[common]:
+        common += 1
+    while len(game.history) > common:
+        game.undo_move()
+    for code in codes[common:]:
+        success, msg = game.play_code(code)
+        if not success:
+            raise ValueError(f"重放第 {len(game.history) + 1} 步失败: {msg}")
+    game.version = saved.meta().get("version", game.version)
+
+
+def restore_game(data: bytes, board_cls: type[Board] = Board) -> Game:
+    """由二进制记录重放出对局（保留 Move 历史，可继续撤销），并恢复版本号"""
+    game = Game(board_cls)
+    sync_game(game, GameRecord(data))
+    return game
+
+
+class FileRoomStore:
+    """单进程：只在逐出时写入文件，恢复后删除"""
+    shared = False
+
+    def __init__(self, directory: str = ROOMS_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, room_id: str) -> str:
+        # 房间 ID 来自 URL，编码后作为文件名，不同 ID 不会映射到同一文件
+        name = base64.urlsafe_b64encode(room_id.encode()).decode().rstrip("=")
+        return os.path.join(self.directory, name + ROOM_FILE_SUFFIX)
+
+    def load(self, room_id: str, newer_than: int = -1) -> bytes | None:
+        try:
+            with open(self._path(room_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, room_id: str, version: int, data: bytes):
+        archive.atomic_write(self._path(room_id), data, durable=False)
+
+    def remove(self, room_id: str):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(room_id))
+
+    def set_aside(self, room_id: str) -> str | None:
+        """无法恢复的房间文件改名保留以便检查，返回新路径"""
+        path = self._path(room_id)
+        failed = f"{path}.{int(time.time() * 1000)}{FAILED_FILE_SUFFIX}"
+        try:
+            os.replace(path, failed)
+        except FileNotFoundError:
+            return None
+        return failed
+
+    def exists(self, room_id: str) -> bool:
+        return os.path.exists(self._path(room_id))
+
+    def count(self) -> int:
+        try:
+            return sum(1 for name in os.listdir(self.directory) if name.endswith(ROOM_FILE_SUFFIX))
+        except OSError:
+            return 0
+
+    def transaction(self):
+        return contextlib.nullcontext()
+
+    def close(self):
+        pass
+
+
+class SqliteRoomStore:
+    """
+    多进程共享：每个房间一行（版本号 + 对局记录）。transaction 以 BEGIN IMMEDIATE 取得数据库写锁，
+    同一时刻只有一个进程（线程）在修改对局，修改完成即提交，其他进程下次访问该房间时按版本号追上。
+    """
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 同一线程在事务内还会读写，使用可重入锁
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rooms ("
+                           "id TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL, updated REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS failed_rooms ("
+                           "id TEXT NOT NULL, version INTEGER NOT NULL, data BLOB NOT NULL, failed REAL NOT NULL)")
+
+    def load(self, room_id: str, newer_than: int = -1) -> bytes | None:
+        """版本号大于 newer_than 时返回对局记录，否则返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM rooms WHERE id = ? AND version > ?",
+                                     (room_id, newer_than)).fetchone()
+        return row[0] if row else None
+
+    def save(self, room_id: str, version: int, data: bytes):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO rooms (id, version, data, updated) VALUES (?, ?, ?, ?)",
+                               (room_id, version, data, time.time()))
+
+    def insert(self, room_id: str, version: int, data: bytes):
+        """新建房间；其他进程已经建立时保留已有的状态"""
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO rooms (id, version, data, updated) VALUES (?, ?, ?, ?)",
+                               (room_id, version, data, time.time()))
+
+    def remove(self, room_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM rooms WHERE id = ?", (room_id,))
+
+    def set_aside(self, room_id: str) -> str | None:
+        """无法恢复的房间移到 failed_rooms 表保留以便检查"""
+        with self.transaction():
+            moved = self._conn.execute("INSERT INTO failed_rooms (id, version, data, failed) "
+                                       "SELECT id, version, data, ? FROM rooms WHERE id = ?",
+                                       (time.time(), room_id)).rowcount
+            self._conn.execute("DELETE FROM rooms WHERE id = ?", (room_id,))
+        return f"{self.path}:failed_rooms" if moved else None
+
+    def exists(self, room_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM rooms WHERE id = ?", (room_id,)).fetchone() is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rooms").fetchone()[0]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def store_from_env() -> FileRoomStore | SqliteRoomStore:
+    directory = os.environ.get("CHESS_ROOMS_DIR", ROOMS_DIR)
+    kind = os.environ.get("CHESS_ROOM_STORE", "file")
+    if kind == "file":
+        return FileRoomStore(directory)
+    if kind == "sqlite":
+        return SqliteRoomStore(os.environ.get("CHESS_ROOM_DB", os.path.join(directory, ROOM_DB_FILE)))
+    raise ValueError(f"未知的房间存储类型: {kind}")
+
+
+class RoomManager:
+    """
+    房间表与各房间的锁。open 可能在线程中执行（从存储恢复需要重放），
+    open 与逐出由一把管理锁串行化，避免同一房间被恢复两次。
+    """
+    def __init__(self, board_cls: type[Board] = Board, store: FileRoomStore | SqliteRoomStore | None = None,
+                 ttl: float = ROOM_TTL, max_rooms: int = MAX_ROOMS):
+        self.board_cls = board_cls
+        self.store = store if store is not None else FileRoomStore()
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self.games: dict[str, Game] = {}
+        self.locks: dict[str, threading.Lock] = {}
+        self.last_active: OrderedDict[str, float] = OrderedDict() # 按最近操作时间排序，最久未用的在前
+        self.created = 0
+        self.evicted = 0
+        self.rehydrated = 0
+        self.synced = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, board_cls: type[Board] = Board) -> RoomManager:
+        return cls(
+            board_cls,
+            store_from_env(),
+            float(os.environ.get("CHESS_ROOM_TTL", ROOM_TTL)),
+            int(os.environ.get("CHESS_MAX_ROOMS", MAX_ROOMS)),
+        )
+
+    # --- 房间表 ---
+    def get(self, room_id: str) -> Game | None:
+        return self.games.get(room_id)
+
+    def lock(self, room_id: str) -> threading.Lock | None:
+        return self.locks.get(room_id)
+
+    def exists(self, room_id: str) -> bool:
+        """房间在内存中或在房间存储中（已被逐出，或由其他进程创建）"""
+        return room_id in self.games or self.store.exists(room_id)
+
+    def touch(self, room_id: str):
+        # 不取管理锁：事件循环上每条消息都会调用，不能等待其他房间的恢复
+        if room_id in self.games:
+            self.last_active[room_id] = time.monotonic()
+            with contextlib.suppress(KeyError):
+                self.last_active.move_to_end(room_id)
+
+    def open(self, room_id: str) -> tuple[Game, threading.Lock]:
+        """取出房间；不在内存中时先尝试从存储恢复，否则新建对局"""
+        with self._lock:
+            game = self.games.get(room_id)
+            if game is None:
+                game = self._load(room_id)
+                if game is None:
+                    game = Game(self.board_cls)
+                    self.created += 1
+                    if self.store.shared:
+                        self.store.insert(room_id, game.version, encode_room(game))
+                self.games[room_id] = game
+            lock = self.locks.setdefault(room_id, threading.Lock())
+            self.touch(room_id)
+            return game, lock
+
+    def replace(self, room_id: str, game: Game):
+        """reset 时替换房间内的对局对象"""
+        self.games[room_id] = game
+        self.touch(room_id)
+
+    def _load(self, room_id: str) -> Game | None:
+        data = self.store.load(room_id)
+        if data is None:
+            return None
+        try:
+            game = restore_game(data, self.board_cls)
+        except Exception as e:
+            # 不删除这份状态：它可能是该房间唯一的副本
+            print(f"恢复房间 {room_id} 失败: {e}，已另存为 {self.store.set_aside(room_id)}")
+            self.failed += 1
+            return None
+        # 单进程存储只是逐出的暂存，恢复后即删除；共享存储保存的就是房间状态本身，保留
+        if not self.store.shared:
+            self.store.remove(room_id)
+        self.rehydrated += 1
+        return game
+
+    # --- 房间操作：在执行器线程中持房间锁调用 ---
+    def _sync(self, room_id: str, game: Game):
+        # 共享存储中的版本比本进程新：其他进程修改过该房间
+        data = self.store.load(room_id, game.version) if self.store.shared else None
+        if data is not None:
+            sync_game(game, GameRecord(data))
+            self.synced += 1
+
+    def _commit(self, room_id: str, game: Game, version: int):
+        if self.store.shared and game.version != version:
+            self.store.save(room_id, game.version, encode_room(game))
+
+    def _live(self, room_id: str) -> Game:
+        game = self.games.get(room_id)
+        if game is None:
+            raise RoomEvicted(room_id)
+        return game
+
+    def call(self, room_id: str, fn: Callable[..., Any], *args, write: bool = False) -> Any:
+        """
+        对房间当前的对局执行 fn(game, *args)。共享存储时先追上其他进程的修改；
+        write 为真时整个过程在存储的写事务中执行，对局被修改后写回。房间已被逐出时抛出 RoomEvicted。
+        """
+        game = self._live(room_id)
+        if not write:
+            self._sync(room_id, game)
+            return fn(game, *args)
+        with self.store.transaction():
+            self._sync(room_id, game)
+            version = game.version
+            result = fn(game, *args)
+            self._commit(room_id, game, version)
+        return result
+
+    def reset(self, room_id: str, fn: Callable[[Game], tuple[Game, Any]]) -> Any:
+        """fn(旧对局) -> (新对局, 结果)：替换房间内的对局并写回存储，返回结果"""
+        game = self._live(room_id)
+        with self.store.transaction():
+            self._sync(room_id, game)
+            new_game, result = fn(game)
+            self.replace(room_id, new_game)
+            self._commit(room_id, new_game, game.version)
+        return result
+
+    # --- 逐出 ---
+    def evict(self, room_id: str, last: float | None = None) -> bool:
+        """
+        把房间写入存储并从内存移除；房间锁被占用（正在执行操作）时跳过。
+        给出 last 时，房间在此之后被使用过（如选出后又有连接打开了它）也跳过。
+        """
+        with self._lock:
+            game = self.games.get(room_id)
+            if game is None:
+                self.last_active.pop(room_id, None)
+                return False
+            if last is not None and self.last_active.get(room_id, last) != last:
+                return False
+            lock = self.locks[room_id]
+            if not lock.acquire(blocking=False):
+                return False
+            try:
+                # 共享存储在每次修改时已写回，只需释放内存
+                if not self.store.shared:
+                    self.store.save(room_id, game.version, encode_room(game))
+            except Exception as e:
+                print(f"逐出房间 {room_id} 失败: {e}")
+                return False
+            finally:
+                lock.release()
+            del self.games[room_id]
+            del self.locks[room_id]
+            self.last_active.pop(room_id, None)
+            self.evicted += 1
+            return True
+
+    def sweep(self, connected=(), now: float | None = None) -> list[str]:
+        """
+        逐出超过空闲时间的房间，以及超出数量上限时最久未用的房间；connected 中的房间保留。
+        在线程中调用：connected 是调用时的快照，之后才打开的房间由 evict 的 last 检查保留。
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            excess = len(self.games) - self.max_rooms
+            items = list(self.last_active.items())
+        victims = []
+        for room_id, last in items:
+            if room_id in connected:
+                continue
+            if now - last >= self.ttl or excess > 0:
+                victims.append((room_id, last))
+                excess -= 1
+        return [room_id for room_id, last in victims if self.evict(room_id, last)]
+
+    def stats(self) -> dict:
+        return {
+            "live": len(self.games),
+            "stored": self.store.count(),
+            "shared": self.store.shared,
+            "created": self.created,
+            "evicted": self.evicted,
+            "rehydrated": self.rehydrated,
+            "synced": self.synced,
+            "failed": self.failed,
+            "ttl": self.ttl,
+            "max_rooms": self.max_rooms,
+        }
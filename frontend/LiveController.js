@@ -14,6 +14,7 @@ class LiveController extends BaseChessController {
     resetState() {
         if (this.ws) { this.ws.close(); this.ws = null; }
         this.data = null;
+        this.seq = null;
         this.viewIdx = null;
         this.selected = null;
         this.pieceMovesCache = {};
@@ -44,12 +45,25 @@ class LiveController extends BaseChessController {
         
         ws.onmessage = (e) => {
             const msg = JSON.parse(e.data);
-            if (msg.type === 'init' || msg.type === 'update') {
+            if (msg.type === 'init') {
+                // 完整状态：连接、重置或 resync 时收到
                 this.data = msg.state;
+                this.seq = msg.seq;
+                this.viewIdx = null;
                 this.pieceMovesCache = {};
                 this.selected = null;
                 UI.text(this.uiMap.roomIdLabel, this.roomId);
-                if (msg.type === 'init') this.viewIdx = null;
+                this.refreshUI();
+            } else if (msg.type === 'update') {
+                // 增量：只有紧接本地版本的一条才能应用，过期的丢弃，出现缺口时请求完整状态
+                if (this.seq === null || msg.seq <= this.seq) return;
+                if (msg.seq !== this.seq + 1 || !this.applyDelta(msg)) {
+                    ws.send(JSON.stringify({ type: 'resync' }));
+                    return;
+                }
+                this.seq = msg.seq;
+                this.pieceMovesCache = {};
+                this.selected = null;
                 this.refreshUI();
             } else if (msg.type === 'piece_moves') {
                 this.pieceMovesCache[`${msg.pos[0]},${msg.pos[1]}`] = msg.moves;
@@ -68,6 +82,29 @@ class LiveController extends BaseChessController {
         };
     }
 
+    /**
+     * 把一条增量合并进本地状态；步数对不上时返回 false，由调用方请求 resync
+     */
+    applyDelta(msg) {
+        const d = this.data;
+        if (msg.op === 'move') {
+            if (d.history.length !== msg.ply - 1) return false;
+            d.history.push(msg.san);
+            d.fen_history.push(msg.fen);
+        } else if (msg.op === 'undo') {
+            if (d.history.length !== msg.ply + 1) return false;
+            d.history.length = msg.ply;
+            d.fen_history.length = msg.ply + 1;
+            d.fen_history[msg.ply] = msg.fen;
+            if (this.viewIdx !== null && this.viewIdx >= msg.ply) this.viewIdx = null;
+        } else {
+            return false;
+        }
+        d.turn = msg.turn;
+        d.status = msg.status;
+        return true;
+    }
+
     handleSquareClick(r, c) {
         const base = this.getBaseClickGrid();
         if (!base) return;
@@ -125,6 +125,9 @@ window.showView = showView; // 暴露给某些需要跳转的地方
  * 加载仪表盘内容
  */
 let dashboardDirty = true; // 标记仪表盘是否需要从后端刷新
+const DASHBOARD_PAGE = 100;
+let dashboardIds = [];      // 已加载的存档 ID（按服务器顺序）
+let dashboardCursor = null; // 下一页的游标，为空表示已全部加载
 async function loadDashboard() {
     const grid = document.getElementById('dashboard-grid');
     if (!grid) return;
@@ -133,15 +136,41 @@ async function loadDashboard() {
     if (!dashboardDirty && grid.children.length > 1) return;
     
     try {
-        const r = await fetch('/archives');
-        const d = await r.json();
-        renderDashboard(d.games || []);
+        const d = await fetchArchivePage(null);
+        dashboardIds = (d.games || []).map(g => g.id);
+        dashboardCursor = d.next_cursor || null;
+        renderDashboard(dashboardIds);
         dashboardDirty = false;
     } catch (e) {
         UI.html('dashboard-grid', '<div class="card-error">加载失败</div>');
     }
+    UI.show('dashboard-more', !!dashboardCursor);
 }
 
+async function fetchArchivePage(cursor) {
+    const query = `limit=${DASHBOARD_PAGE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+    const r = await fetch(`/archives?${query}`);
+    return r.json();
+}
+
+/**
+ * 按游标加载下一页存档，追加在已有卡片之后
+ */
+async function loadMoreArchives() {
+    if (!dashboardCursor) return;
+    try {
+        const d = await fetchArchivePage(dashboardCursor);
+        const known = new Set(dashboardIds);
+        dashboardIds = dashboardIds.concat((d.games || []).map(g => g.id).filter(id => !known.has(id)));
+        dashboardCursor = d.next_cursor || null;
+        renderDashboard(dashboardIds);
+    } catch (e) {
+        UI.toast("加载失败", true);
+    }
+    UI.show('dashboard-more', !!dashboardCursor);
+}
+window.loadMoreArchives = loadMoreArchives;
+
 function renderDashboard(games) {
     const grid = document.getElementById('dashboard-grid');
     if (!grid) return;
@@ -193,6 +222,7 @@ function renderDashboard(games) {
                     card.classList.remove('removing'); 
                 } else { 
                     card.remove(); 
+                    dashboardIds = dashboardIds.filter(x => x !== id);
                     UI.toast("棋谱已删除"); 
                 }
             };
@@ -258,12 +288,16 @@ async function saveCurrentGame(filename) {
         screenshot = (snapshotResult instanceof Promise) ? await snapshotResult : snapshotResult;
     } 
     
+    // 截图以文件形式随 multipart 表单上传，服务器分块接收，不再经过 Base64 与 JSON
+    const form = new FormData();
+    form.append('filename', filename);
+    if (screenshot) {
+        const blob = await (await fetch(screenshot)).blob();
+        form.append('screenshot', blob, 'preview.png');
+    }
+
     try {
-        await fetch(`/archives/save/${ROOM_ID}`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ filename, screenshot })
-        });
+        await fetch(`/archives/save/${ROOM_ID}`, { method: 'POST', body: form });
         dashboardDirty = true; // 保存新对局后，标记仪表盘为脏，下次打开时更新列表
     } catch (e) {
         console.error("保存失败", e);
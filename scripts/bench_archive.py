@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 将项目根目录添加到路径以便导入
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+from backend import archive
+from backend.logic.constants import GameStatus
+from backend.logic.game import Game
+from backend.logic.record import encode_game
+
+def random_game(rng, max_plies):
+    game = Game()
+    while game.status == GameStatus.ONGOING and len(game.history) < max_plies:
+        moves = game.board.get_legal_moves(game.turn)
+        start = rng.choice(sorted(moves))
+        game.make_move(start, rng.choice(moves[start]).end, "Q")
+    return game
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+def timed(fn, ids):
+    start = time.perf_counter()
+    for game_id in ids:
+        fn(game_id)
+    return (time.perf_counter() - start) / len(ids) * 1e3
+
+def main():
+    parser = argparse.ArgumentParser(description="比较 JSON 存档与二进制对局记录的磁盘占用和读取耗时")
+    parser.add_argument("--games", type=int, default=2000, help="存档局数")
+    parser.add_argument("--plies", type=int, default=120, help="每局最多步数")
+    parser.add_argument("--templates", type=int, default=50, help="随机生成的不同对局数（循环写入）")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    templates = [random_game(rng, args.plies) for _ in range(args.templates)]
+    with tempfile.TemporaryDirectory() as tmp:
+        json_root, bin_root = os.path.join(tmp, "json"), os.path.join(tmp, "bin")
+        ids = [f"g{i:06d}" for i in range(args.games)]
+        archive.ARCHIVE_DIR = json_root
+        for i, game_id in enumerate(ids):
+            archive.write_archive(game_id, templates[i % args.templates].get_state_dict())
+        archive.ARCHIVE_DIR = bin_root
+        for i, game_id in enumerate(ids):
+            archive.write_record(game_id, encode_game(templates[i % args.templates]))
+        plies = sum(len(templates[i % args.templates].history) for i in range(args.games))
+        json_bytes, bin_bytes = dir_size(json_root), dir_size(bin_root)
+        print(f"{args.games} 局 / {plies} 步")
+        print(f"磁盘占用: JSON {json_bytes / 1e6:.2f} MB，二进制 {bin_bytes / 1e6:.2f} MB（{json_bytes / bin_bytes:.1f}x）")
+
+        sample = rng.sample(ids, min(500, len(ids)))
+        ply_of = {game_id: rng.randrange(len(templates[int(game_id[1:]) % args.templates].history) + 1) for game_id in sample}
+
+        def json_load(game_id):
+            with open(os.path.join(json_root, game_id, archive.DATA_FILE), encoding="utf-8") as f:
+                return json.load(f)
+
+        def json_ply(game_id):
+            return json_load(game_id)["fen_history"][ply_of[game_id]]
+
+        def bin_ply(game_id):
+            with archive.open_record(game_id) as record:
+                return record.fen_at(ply_of[game_id])
+
+        def bin_meta(game_id):
+            with archive.open_record(game_id) as record:
+                return record.plies, record.meta()
+
+        def json_meta(game_id):
+            data = json_load(game_id)
+            return len(data["history"]), data["status"]
+
+        rows = [
+            ("单步局面", timed(json_ply, sample), timed(bin_ply, sample)),
+            ("步数与状态", timed(json_meta, sample), timed(bin_meta, sample)),
+            ("整局导出", timed(json_load, sample), timed(archive.read_archive, sample)),
+        ]
+        for name, json_ms, bin_ms in rows:
+            print(f"{name}: JSON {json_ms:.3f} ms/局，二进制 {bin_ms:.3f} ms/局")
+
+if __name__ == "__main__":
+    main()
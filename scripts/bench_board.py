@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+
+# 将项目根目录添加到路径以便导入
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+from backend.logic.board import Board
+from backend.logic.bitboard import BitBoard
+from backend.logic.constants import Color
+from backend.logic.notation import NotationHandler
+from backend.logic.perft import perft
+
+POSITIONS = {
+    "start": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "kiwipete": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "middlegame": "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P3/2NP1N2/PPP1QPPP/R4RK1 w - - 0 10",
+}
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def bench(repeat=200, depth=3):
+    # perft 同时覆盖走法生成与执行/撤销，最接近搜索中的真实负载
+    print(f"{'position':<12}{'impl':<10}{'legal_moves(us)':>16}{'is_in_check(us)':>16}{f'perft({depth})(ms)':>16}")
+    for name, fen in POSITIONS.items():
+        results = {}
+        for cls in (Board, BitBoard):
+            board = cls()
+            NotationHandler.parse_fen_to_board(board, fen)
+            gen = timed(lambda: board.get_legal_moves(Color.WHITE), repeat)
+            chk = timed(lambda: board.is_in_check(Color.WHITE), repeat * 10)
+            tree = timed(lambda: perft(board, Color.WHITE, depth), 1) / 1000
+            results[cls.__name__] = (gen, chk, tree)
+            print(f"{name:<12}{cls.__name__:<10}{gen:>16.1f}{chk:>16.2f}{tree:>16.1f}")
+        base, fast = results["Board"], results["BitBoard"]
+        print(f"{'':<12}{'speedup':<10}" + "".join(f"{b / f:>15.1f}x" for b, f in zip(base, fast)))
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+
+# 将项目根目录添加到路径以便导入
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+from backend.logic.board import Board
+from backend.logic.constants import Color
+from backend.logic.notation import NotationHandler
+
+POSITIONS = {
+    "start": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "kiwipete": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "middlegame": "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P3/2NP1N2/PPP1QPPP/R4RK1 w - - 0 10",
+    "in_check": "4k3/8/8/8/1b6/8/5N2/R3K2R w KQ - 0 1",
+}
+
+def execute_undo_moves(board, color):
+    """旧做法：每个伪合法走法都执行、检查将军、再撤销"""
+    moves = []
+    for piece in list(board.pieces[color]):
+        for code in piece.get_valid_moves(board.grid, board.rows, board.cols, board.last_move):
+            if board._is_legal_by_execution(code, color):
+                moves.append(code)
+    return moves
+
+def pin_aware_moves(board, color):
+    # 每轮清空缓存，保证计入将军/牵制信息的计算成本
+    board._check_info_key = None
+    return list(board._legal_move_generator(color))
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def bench(repeat=200):
+    print(f"{'position':<12}{'execute/undo(us)':>18}{'pin-aware(us)':>16}{'speedup':>10}")
+    for name, fen in POSITIONS.items():
+        board = Board()
+        NotationHandler.parse_fen_to_board(board, fen)
+        assert len(execute_undo_moves(board, Color.WHITE)) == len(pin_aware_moves(board, Color.WHITE))
+        old = timed(lambda: execute_undo_moves(board, Color.WHITE), repeat)
+        new = timed(lambda: pin_aware_moves(board, Color.WHITE), repeat)
+        print(f"{name:<12}{old:>18.1f}{new:>16.1f}{old / new:>9.1f}x")
+
+if __name__ == "__main__":
+    bench()
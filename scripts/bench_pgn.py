@@ -0,0 +1,85 @@
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import textwrap
+import time
+
+# 将项目根目录添加到路径以便导入
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+from backend.logic.game import Game
+from backend.logic.constants import GameStatus
+from backend.logic.notation import NotationHandler
+from backend.logic.pgn import read_games
+
+def random_game(rng, max_plies=80):
+    """随机走子生成一局的 SAN 序列与结果"""
+    game = Game()
+    while game.status == GameStatus.ONGOING and len(game.history) < max_plies:
+        moves = game.board.get_legal_moves(game.turn)
+        start = rng.choice(sorted(moves))
+        game.make_move(start, rng.choice(moves[start]).end, "Q")
+    winner = game.turn.opposite() if game.status in (GameStatus.WHITE_WIN, GameStatus.BLACK_WIN) else None
+    return [m.san for m in game.history], winner, game.status != GameStatus.ONGOING
+
+def write_sample(path, games, seed=1, pool=20):
+    """生成样本文件：少量随机对局反复出现，附带标签、注释与嵌套变着"""
+    rng = random.Random(seed)
+    templates = []
+    for _ in range(pool):
+        history, winner, is_over = random_game(rng)
+        movetext = NotationHandler.generate_pgn(history, winner, is_over)
+        if len(history) > 6:
+            # 在第 3 回合后插入一段注释和一个嵌套变着
+            head, sep, tail = movetext.partition("4. ")
+            movetext = f"{head}{{benchmark comment}} ({sep}{history[6]} (4. {history[6]}) ) {sep}{tail}"
+        templates.append(textwrap.fill(movetext, 79)) # 与常见的 PGN 导出一样按 80 列折行
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(games):
+            f.write(f'[Event "Bench"]\n[Site "?"]\n[Round "{i + 1}"]\n[White "W{i}"]\n[Black "B{i}"]\n\n')
+            f.write(templates[i % pool] + "\n\n")
+
+def bench(path, replay):
+    size = os.path.getsize(path)
+    start = time.perf_counter()
+    games = moves = 0
+    replay_time = 0.0
+    failed = 0
+    for pgn_game in read_games(path):
+        games += 1
+        moves += len(pgn_game.moves)
+        if replay:
+            t = time.perf_counter()
+            game = Game()
+            for san in pgn_game.moves:
+                s, e, promo = NotationHandler.parse_san_to_move(san, game.turn, game.board)
+                if s is None or not game.make_move(s, e, promo)[0]:
+                    failed += 1
+                    break
+            replay_time += time.perf_counter() - t
+    elapsed = time.perf_counter() - start
+    parse_time = elapsed - replay_time
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"file={path} size={size / 1e6:.1f}MB games={games} moves={moves}")
+    print(f"parse: {parse_time:.2f}s {games / parse_time:.0f} games/s {size / 1e6 / parse_time:.1f} MB/s")
+    if replay:
+        print(f"replay: {replay_time:.2f}s {games / replay_time:.1f} games/s failed={failed}")
+    print(f"peak rss: {peak_mb:.1f}MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="流式 PGN 读取吞吐量（局/秒）")
+    parser.add_argument("file", nargs="?", help="PGN 文件；缺省时生成样本文件")
+    parser.add_argument("--games", type=int, default=20000, help="生成样本的对局数")
+    parser.add_argument("--replay", action="store_true", help="同时在棋盘上重放主线（SAN 解析与走子）")
+    args = parser.parse_args()
+    if args.file:
+        bench(args.file, args.replay)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sample.pgn")
+            write_sample(path, args.games)
+            bench(path, args.replay)
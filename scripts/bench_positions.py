@@ -0,0 +1,69 @@
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+# 将项目根目录添加到路径以便导入
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+from backend.logic.constants import GameStatus
+from backend.logic.game import Game
+from backend.positions import PositionIndex, position_key
+
+def random_fens(rng, plies):
+    game = Game()
+    while game.status == GameStatus.ONGOING and len(game.history) < plies:
+        moves = game.board.get_legal_moves(game.turn)
+        start = rng.choice(sorted(moves))
+        game.make_move(start, rng.choice(moves[start]).end, "Q")
+    return list(game.fen_history)
+
+def main():
+    parser = argparse.ArgumentParser(description="局面倒排索引的写入速度、磁盘占用与查询延迟")
+    parser.add_argument("--games", type=int, default=50000, help="索引的对局数")
+    parser.add_argument("--plies", type=int, default=80, help="每局最多步数")
+    parser.add_argument("--templates", type=int, default=200, help="随机生成的不同对局数；其余对局在模板后接随机局面键")
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    templates = [random_fens(rng, args.plies) for _ in range(args.templates)]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = PositionIndex(os.path.join(tmp, "positions.sqlite3"))
+        start = time.perf_counter()
+        batch = []
+        total = 0
+        for i in range(args.games):
+            fens = templates[i % args.templates]
+            # 前 10 步取自模板（开局重复率高），其后为各局独有的局面
+            keys = [position_key(fen) for fen in fens[:10]] + [rng.getrandbits(63) for _ in fens[10:]]
+            batch.append((f"g{i:07d}", keys))
+            total += len(keys)
+            if len(batch) >= 1000:
+                index.add_many(batch)
+                batch = []
+        index.add_many(batch)
+        elapsed = time.perf_counter() - start
+        index.close()
+        index = PositionIndex(os.path.join(tmp, "positions.sqlite3")) # 关闭时 WAL 合并回主文件
+        size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+        print(f"{args.games} 局 / {total} 个局面条目，写入 {elapsed:.1f} 秒（{total / elapsed:.0f} 条/秒），磁盘 {size / 1e6:.1f} MB")
+
+        queries = [rng.choice(rng.choice(templates)) for _ in range(args.queries)]
+        latencies = []
+        for fen in queries:
+            t = time.perf_counter()
+            index.lookup(fen, limit=100)
+            latencies.append((time.perf_counter() - t) * 1e3)
+        latencies.sort()
+        print(f"查询 {args.queries} 次：中位数 {latencies[len(latencies) // 2]:.2f} ms，"
+              f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms，最大 {latencies[-1]:.2f} ms")
+        print(f"峰值内存: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+        index.close()
+
+if __name__ == "__main__":
+    main()
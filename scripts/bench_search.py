@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+
+# 将项目根目录添加到路径以便导入
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+from backend.logic.perft import BOARDS, setup
+from backend.logic.search import Searcher
+
+POSITIONS = {
+    "start": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "kiwipete": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "middlegame": "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P3/2NP1N2/PPP1QPPP/R4RK1 w - - 0 10",
+    "endgame": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+}
+
+def time_to_depth(fen, board_cls, max_depth):
+    """逐个深度从头搜索（新置换表），返回 [(深度, 耗时秒, 节点数)]"""
+    rows = []
+    for depth in range(1, max_depth + 1):
+        board, turn = setup(fen, board_cls)
+        result = Searcher(board).search(turn, max_depth=depth)
+        rows.append((depth, result.elapsed, result.nodes))
+    return rows
+
+def bench(max_depth=4, board_name="grid", move_interval=10.0):
+    board_cls = BOARDS[board_name]
+    print(f"board={board_name}")
+    print(f"{'position':<12}{'depth':>6}{'time(s)':>10}{'nodes':>10}{'nps':>10}")
+    total_nodes, total_time = 0, 0.0
+    deepest = []
+    for name, fen in POSITIONS.items():
+        rows = time_to_depth(fen, board_cls, max_depth)
+        for depth, elapsed, nodes in rows:
+            print(f"{name:<12}{depth:>6}{elapsed:>10.3f}{nodes:>10}{int(nodes / elapsed) if elapsed else 0:>10}")
+        depth, elapsed, nodes = rows[-1]
+        total_nodes += nodes
+        total_time += elapsed
+        deepest.append(elapsed)
+
+    avg = sum(deepest) / len(deepest)
+    print(f"\naverage {int(total_nodes / total_time)} nps, {avg:.3f}s per move at depth {max_depth}")
+    # 每个引擎对局平均每 move_interval 秒需要思考一步，单核可同时承载的对局数
+    print(f"one core sustains ~{move_interval / avg:.1f} concurrent engine games "
+          f"at depth {max_depth} (one engine move every {move_interval:g}s per game)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="搜索引擎测速：每秒节点数与到达各深度的耗时")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--board", choices=sorted(BOARDS), default="grid")
+    parser.add_argument("--interval", type=float, default=10.0, help="每局两步引擎走法之间的平均间隔（秒）")
+    args = parser.parse_args()
+    bench(args.depth, args.board, args.interval)
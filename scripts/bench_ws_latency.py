@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+# 将项目根目录添加到路径以便导入
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import websockets
+
+MODES = ("inline", "thread", "process")
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def wait_ready(url, deadline=15.0):
+    start = time.perf_counter()
+    while time.perf_counter() - start < deadline:
+        try:
+            async with websockets.connect(url):
+                return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("服务器未能启动")
+
+async def probe(base, room, duration, latencies):
+    """轻量房间：不断请求某个棋子的走法并记录往返时间"""
+    async with websockets.connect(f"{base}/ws/{room}") as ws:
+        await ws.recv() # init
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            await ws.send(json.dumps({"type": "get_moves", "pos": [6, 4]}))
+            await ws.recv()
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.01)
+
+async def heavy(base, room, duration, think):
+    """重负载房间：不断让引擎限时搜索"""
+    async with websockets.connect(f"{base}/ws/{room}") as ws:
+        await ws.recv()
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            await ws.send(json.dumps({"type": "ai_move", "time": think}))
+            msg = json.loads(await ws.recv())
+            if msg.get("state", {}).get("status", "ongoing") != "ongoing":
+                await ws.send(json.dumps({"type": "reset"}))
+                await ws.recv()
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+async def measure(port, probes, heavies, duration, think):
+    base = f"ws://127.0.0.1:{port}"
+    await wait_ready(f"{base}/ws/warmup")
+    latencies = []
+    tasks = [probe(base, f"probe{i}", duration, latencies) for i in range(probes)]
+    tasks += [heavy(base, f"heavy{i}", duration, think) for i in range(heavies)]
+    await asyncio.gather(*tasks)
+    return latencies
+
+def bench(modes, probes, heavies, duration, think):
+    print(f"probes={probes} heavy_rooms={heavies} duration={duration}s think={think}s")
+    print(f"{'executor':<10}{'heavy':>6}{'requests':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for mode in modes:
+        for heavy_rooms in (0, heavies):
+            port = free_port()
+            env = dict(os.environ, CHESS_EXECUTOR=mode)
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port), "--log-level", "warning"],
+                cwd=root_dir, env=env)
+            try:
+                latencies = asyncio.run(measure(port, probes, heavy_rooms, duration, think))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{mode:<10}{heavy_rooms:>6}{len(latencies):>10}{percentile(latencies, 50):>10.1f}"
+                  f"{percentile(latencies, 99):>10.1f}{max(latencies):>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重负载房间存在时其他房间的 WebSocket 往返延迟")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--probes", type=int, default=4, help="轻量房间数")
+    parser.add_argument("--heavy", type=int, default=2, help="同时进行引擎搜索的房间数")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--think", type=float, default=1.0, help="每次引擎搜索的时间（秒）")
+    args = parser.parse_args()
+    bench(args.modes, args.probes, args.heavy, args.duration, args.think)
@@ -1,4 +1,3 @@
-import json
 import os
 import sys
 
@@ -7,7 +6,9 @@ root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(root_dir)
 os.chdir(root_dir)
 
+from backend import archive
 from backend.logic.game import Game
+from backend.logic.record import encode_game
 
 def create_scholar_mate():
     game = Game()
@@ -30,14 +31,9 @@ def create_scholar_mate():
     
     # 确保目录结构符合新版规范
     game_id = "scholar_mate_sample"
-    game_dir = os.path.join("saved_games", game_id)
-    if not os.path.exists(game_dir):
-        os.makedirs(game_dir)
-        
-    filename = os.path.join(game_dir, "game_data.json")
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(game.get_state_dict(), f, indent=2, ensure_ascii=False)
-        
+    archive.write_record(game_id, encode_game(game))
+    filename = os.path.join(archive.archive_dir(game_id), archive.RECORD_FILE)
+
     print(f"测试棋谱已按照新版结构创建: {filename}")
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+import os
+import sys
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.analysis import MoveMapCache, analyze_fen, build_move_map, select_moves
+from backend.logic.bitboard import BitBoard
+from backend.logic.board import Board
+from backend.logic.game import Game
+
+def test_analyze_fen():
+    for board_cls in (Board, BitBoard):
+        start = Game.analyze_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", board_cls=board_cls)
+        assert start["turn"] == "white" and not start["in_check"]
+        assert sum(len(v) for v in start["moves"].values()) == 20
+        assert sorted(m["san"] for m in start["moves"]["g1"]) == ["Nf3", "Nh3"]
+
+        # SAN 带消歧、将军与将死标记
+        result = Game.analyze_fen("4k3/8/8/8/8/5N2/8/1N2K3 w - - 0 1", [(7, 1), (5, 5)], board_cls)
+        sans = {m["san"] for moves in result["moves"].values() for m in moves}
+        assert {"Nbd2", "Nfd2", "Nc3"} <= sans
+        result = Game.analyze_fen("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", [(7, 3)], board_cls)
+        assert "Rd8#" in {m["san"] for m in result["moves"]["d1"]}
+
+        mate = Game.analyze_fen("R6k/8/6K1/8/8/8/8/R7 b - - 0 1", board_cls=board_cls)
+        assert mate["in_check"] and mate["checkmate"] and not mate["moves"]
+        stalemate = Game.analyze_fen("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", board_cls=board_cls)
+        assert stalemate["stalemate"] and not stalemate["checkmate"]
+    print("Batch analysis logic passed!")
+
+def test_move_map_cache():
+    start = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    cache = MoveMapCache(max_entries=2)
+    entry = cache.get_or_compute(start, lambda: build_move_map(start))
+    # 半回合计数与回合数不同的同一局面命中同一条目
+    assert cache.get(start.replace("0 1", "4 9")) is entry
+    # 共享条目时返回的 fen 仍是各自请求的 FEN
+    assert analyze_fen(start)["fen"] == start
+    assert analyze_fen(start.replace("0 1", "4 9"))["fen"] == start.replace("0 1", "4 9")
+    assert select_moves(entry, None, 8, start.replace("0 1", "2 3"))["fen"] == start.replace("0 1", "2 3")
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    others = ["4k3/8/8/8/8/8/8/4K3 w - - 0 1", "4k3/8/8/8/8/8/8/4K3 b - - 0 1"]
+    cache.put(others[0], build_move_map(others[0]))
+    cache.get(start) # 起始局面变为最近使用，淘汰 others[0]
+    cache.put(others[1], build_move_map(others[1]))
+    assert cache.get(others[0]) is None and cache.get(start) is entry
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+
+    # 总字节数上限
+    small = MoveMapCache(max_entries=100, max_bytes=stats["bytes"] // 2)
+    small.put(start, entry)
+    for fen in others:
+        small.put(fen, build_move_map(fen))
+    assert small.stats()["bytes"] <= small.max_bytes and small.get(start) is None
+    print("Move map cache passed!")
+
+if __name__ == "__main__":
+    test_analyze_fen()
+    test_move_map_cache()
@@ -0,0 +1,125 @@
+import io
+import os
+import random
+import sys
+import tempfile
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import archive
+from backend.logic.bitboard import BitBoard
+from backend.logic.board import Board
+from backend.logic.constants import GameStatus
+from backend.logic.game import Game
+from backend.logic.record import GameRecord, encode_game
+
+def play_random(board_cls, seed, plies=90, fen=None):
+    rng = random.Random(seed)
+    game = Game(board_cls)
+    if fen:
+        game.load_fen(fen)
+    while game.status == GameStatus.ONGOING and len(game.history) < plies:
+        moves = game.board.get_legal_moves(game.turn)
+        start = rng.choice(sorted(moves))
+        game.make_move(start, rng.choice(moves[start]).end, rng.choice("QRBN"))
+    return game
+
+def test_record_round_trip():
+    for board_cls in (Board, BitBoard):
+        for seed in range(4):
+            game = play_random(board_cls, seed)
+            expected = game.get_state_dict()
+            data = encode_game(game, {"result": "*"})
+            record = GameRecord(data)
+            assert record.plies == len(game.history)
+            # 任意一步都可以单独解码
+            for ply in range(record.plies + 1):
+                assert record.fen_at(ply) == expected["fen_history"][ply]
+            state = record.to_state_dict()
+            assert state == {**expected, "result": "*"}
+            print(f"{board_cls.__name__} seed={seed}: {len(data)} 字节 / {record.plies} 步")
+
+def test_record_from_fen_and_empty():
+    fen = "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1"
+    game = play_random(Board, 7, plies=20, fen=fen)
+    record = GameRecord(encode_game(game))
+    assert record.start_fen == fen
+    assert record.to_state_dict()["fen_history"] == list(game.fen_history)
+
+    empty = GameRecord(encode_game(Game()))
+    assert empty.plies == 0 and empty.sans() == []
+    assert empty.to_state_dict()["fen_history"] == [Game().current_fen()]
+
+def test_san_index_and_version_1_records():
+    game = play_random(Board, 5, plies=30)
+    data = encode_game(game)
+    record = GameRecord(data)
+    sans = [m.san for m in game.history]
+    assert record.sans() == sans and record.sans(10, 13) == sans[10:13] and record.sans(25, 99) == sans[25:]
+    assert [record.san_at(ply) for ply in (1, 17, 30)] == [sans[0], sans[16], sans[29]]
+
+    # 去掉 SAN 索引即为版本 1 的布局，仍可读取
+    codes_end = record._san_index_at
+    v1 = bytearray(data[:codes_end] + data[codes_end + 4 * record.plies:])
+    v1[4] = 1
+    old = GameRecord(bytes(v1))
+    assert old.version == 1 and old.sans() == sans and old.san_at(17) == sans[16]
+    assert old.to_state_dict() == record.to_state_dict()
+
+def test_archive_mmap_and_legacy_json():
+    saved = archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = tmp
+        try:
+            game = play_random(Board, 3, plies=40)
+            archive.write_record("bin", encode_game(game))
+            archive.write_archive("legacy", game.get_state_dict())
+            with archive.open_record("bin") as record:
+                assert record.fen_at(17) == game.fen_history[17]
+            assert archive.read_archive("bin") == archive.read_archive("legacy") == game.get_state_dict()
+            for game_id in ("bin", "legacy"):
+                ply = archive.read_ply(game_id, 5)
+                assert ply["fen"] == game.fen_history[5] and ply["san"] == game.history[4].san
+                assert ply["plies"] == len(game.history)
+            assert archive.read_archive("missing") is None
+            json_size = os.path.getsize(os.path.join(tmp, "legacy", archive.DATA_FILE))
+            bin_size = os.path.getsize(os.path.join(tmp, "bin", archive.RECORD_FILE))
+            print(f"40 步对局：JSON {json_size} 字节，二进制 {bin_size} 字节")
+            assert bin_size < json_size / 4
+        finally:
+            archive.ARCHIVE_DIR = saved
+
+def test_atomic_writes_and_preview():
+    saved = archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = tmp
+        try:
+            game = play_random(Board, 5, plies=10)
+            archive.write_record("g", encode_game(game))
+            archive.write_record("g", encode_game(game), durable=False)
+            archive.write_archive("g", game.get_state_dict())
+            # 只留下目标文件，没有残留的临时文件
+            assert sorted(os.listdir(archive.archive_dir("g"))) == [archive.RECORD_FILE, archive.DATA_FILE]
+
+            # 非 PNG 内容不会成为预览图，暂存文件被清理
+            archive.write_preview("g", archive.stage_upload("g", io.BytesIO(b"<html>")))
+            assert sorted(os.listdir(archive.archive_dir("g"))) == [archive.RECORD_FILE, archive.DATA_FILE]
+
+            if archive.Image is None:
+                png = archive.PNG_MAGIC + b"\0" * 64
+                staged = archive.stage_upload("g", io.BytesIO(png))
+                assert os.path.dirname(staged) == archive.archive_dir("g")
+                archive.write_preview("g", staged)
+                assert not os.path.exists(staged)
+                with open(os.path.join(archive.archive_dir("g"), archive.PREVIEW_FILE), "rb") as f:
+                    assert f.read() == png
+        finally:
+            archive.ARCHIVE_DIR = saved
+
+if __name__ == "__main__":
+    test_san_index_and_version_1_records()
+    test_atomic_writes_and_preview()
+    test_record_round_trip()
+    test_record_from_fen_and_empty()
+    test_archive_mmap_and_legacy_json()
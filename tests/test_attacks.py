@@ -0,0 +1,80 @@
+import os
+import sys
+import random
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.board import Board
+from backend.logic.constants import Color, PieceType
+from backend.logic.game import Game
+from backend.logic.rules import MoveRules
+
+def full_attack_map(board, color):
+    counts = [0] * (board.rows * board.cols)
+    for piece in board.pieces[color]:
+        for r, c in MoveRules.get_attacked_squares(board.grid, board.rows, board.cols, piece):
+            counts[r * board.cols + c] += 1
+    return counts
+
+def test_attack_map_stays_in_sync():
+    rng = random.Random(5)
+    game = Game()
+    game.load_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    for _ in range(300):
+        board = game.board
+        for color in Color:
+            assert board.attacks[color] == full_attack_map(board, color)
+            # 查表结果与逐格扫描一致
+            for r in range(board.rows):
+                for c in range(board.cols):
+                    assert board.is_square_attacked((r, c), color) == \
+                        MoveRules.is_square_attacked(board.grid, board.rows, board.cols, (r, c), color)
+        moves = board.get_legal_moves(game.turn)
+        if game.status.value != "ongoing" or not moves:
+            game.load_fen("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1")
+            continue
+        if game.history and rng.random() < 0.2:
+            game.undo_move()
+            continue
+        start = rng.choice(sorted(moves))
+        game.make_move(start, rng.choice(moves[start]).end, rng.choice("QRBN"))
+    print("Attack maps verified!")
+
+def brute_force_attacked(board, pos, by_color):
+    """不依赖预计算表的逐方向扫描，用于校验非标准尺寸棋盘"""
+    r, c = pos
+    for piece in board.pieces[by_color]:
+        pr, pc = piece.position
+        dr, dc = r - pr, c - pc
+        if piece.type == PieceType.PAWN:
+            if dr == (-1 if by_color == Color.WHITE else 1) and abs(dc) == 1: return True
+        elif piece.type == PieceType.KNIGHT:
+            if {abs(dr), abs(dc)} == {1, 2}: return True
+        elif piece.type == PieceType.KING:
+            if max(abs(dr), abs(dc)) == 1: return True
+        elif (dr, dc) != (0, 0):
+            straight, diagonal = dr == 0 or dc == 0, abs(dr) == abs(dc)
+            if (straight and piece.type != PieceType.BISHOP) or (diagonal and piece.type != PieceType.ROOK):
+                if straight or diagonal:
+                    sr, sc = (dr > 0) - (dr < 0), (dc > 0) - (dc < 0)
+                    nr, nc = pr + sr, pc + sc
+                    while (nr, nc) != (r, c) and board.grid[nr][nc] is None:
+                        nr, nc = nr + sr, nc + sc
+                    if (nr, nc) == (r, c): return True
+    return False
+
+def test_non_standard_geometry():
+    from backend.logic.notation import NotationHandler
+    board = Board(6, 10)
+    NotationHandler.parse_fen_to_board(board, "rnbqkkqbnr/pppppppppp/10/3Q2n3/PPPPPPPPPP/RNBQKKQBNR w - - 0 1")
+    for color in Color:
+        assert board.attacks[color] == full_attack_map(board, color)
+        for r in range(board.rows):
+            for c in range(board.cols):
+                assert board.is_square_attacked((r, c), color) == brute_force_attacked(board, (r, c), color)
+    print("Non-standard geometry verified!")
+
+if __name__ == "__main__":
+    test_attack_map_stays_in_sync()
+    test_non_standard_geometry()
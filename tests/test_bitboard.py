@@ -0,0 +1,53 @@
+import os
+import sys
+import random
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.board import Board
+from backend.logic.bitboard import BitBoard
+from backend.logic.constants import Color
+from backend.logic.game import Game
+from backend.logic.perft import REFERENCE_POSITIONS, perft, setup
+
+POSITIONS = [(case.fen, 3) for case in REFERENCE_POSITIONS[:5]]
+
+def test_perft_matches_grid_board():
+    for fen, depth in POSITIONS:
+        counts = []
+        for cls in (Board, BitBoard):
+            board, turn = setup(fen, cls)
+            counts.append(perft(board, turn, depth))
+        print(f"{fen} depth {depth}: Board={counts[0]} BitBoard={counts[1]}")
+        assert counts[0] == counts[1]
+
+def test_random_games_match():
+    rng = random.Random(7)
+    for _ in range(5):
+        grid_game, bit_game = Game(), Game(BitBoard)
+        for _ in range(80):
+            moves = grid_game.board.get_legal_moves(grid_game.turn)
+            bit_moves = bit_game.board.get_legal_moves(bit_game.turn)
+            assert {(m.start, m.end) for ms in moves.values() for m in ms} == \
+                   {(m.start, m.end) for ms in bit_moves.values() for m in ms}
+            if grid_game.status.value != "ongoing":
+                break
+            start = rng.choice(sorted(moves))
+            end = rng.choice(moves[start]).end
+            assert grid_game.make_move(start, end)[0]
+            assert bit_game.make_move(start, end)[0]
+            assert grid_game.fen_history[-1] == bit_game.fen_history[-1]
+            assert bit_game.board.is_in_check(bit_game.turn) == grid_game.board.is_in_check(grid_game.turn)
+        # 撤销全部移动后，位掩码必须与网格完全一致
+        while bit_game.history:
+            bit_game.undo_move()
+        assert bit_game.fen_history[-1] == grid_game.fen_history[0]
+        for color in Color:
+            expected = sum(1 << (p.position[0] * 8 + p.position[1]) for p in bit_game.board.pieces[color])
+            assert bit_game.board.occ[color] == expected
+    print("Random games matched!")
+
+if __name__ == "__main__":
+    test_perft_matches_grid_board()
+    test_random_games_match()
@@ -0,0 +1,130 @@
+import os
+import sys
+import tempfile
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import archive
+from backend.catalog import Catalog, entry_from_record, make_entry
+from backend.importer import import_pgn
+from backend.logic.game import Game
+from backend.logic.record import GameRecord, encode_game
+
+PGN = """[Event "Club"]
+[White "Alice"]
+[Black "Bob"]
+[Result "1-0"]
+[Opening "Italian Game"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 1-0
+
+[Event "Club"]
+[White "Bob"]
+[Black "Carol"]
+[Result "1/2-1/2"]
+
+1. d4 d5 2. c4 e6 3. Nc3 Nf6 4. Bg5 Be7 1/2-1/2
+"""
+
+def make_catalog(tmp):
+    return Catalog(os.path.join(tmp, "catalog.sqlite3"))
+
+def test_entries_and_filters():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = make_catalog(tmp)
+        entries = []
+        for i in range(25):
+            sans = ["e4", "e5", "Nf3"][: i % 4]
+            meta = {"status": "ongoing" if i % 2 else "white_win",
+                    "headers": {"White": f"P{i % 3}", "Black": f"P{(i + 1) % 3}"}}
+            entries.append(make_entry(f"g{i:02d}", meta, sans, timestamp=1000.0 + i))
+        catalog.upsert_many(entries)
+        assert catalog.count() == 25
+
+        # 逐页翻完，顺序与直接排序一致，且不重复、不遗漏
+        for sort, order in (("updated", "desc"), ("plies", "asc"), ("id", "desc")):
+            seen, cursor = [], None
+            while True:
+                page = catalog.query(limit=7, cursor=cursor, sort=sort, order=order)
+                seen += page["games"]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            expected = sorted(entries, key=lambda e: (e[sort], e["id"]), reverse=order == "desc")
+            assert [e["id"] for e in seen] == [e["id"] for e in expected], sort
+
+        assert {e["id"] for e in catalog.query(player="P0", limit=100)["games"]} == \
+               {e["id"] for e in entries if "P0" in (e["white"], e["black"])}
+        assert all(e["result"] == "1-0" for e in catalog.query(result="1-0")["games"])
+        assert [e["plies"] for e in catalog.query(min_plies=3, max_plies=3, limit=100)["games"]] == [3] * 6
+        assert len(catalog.query(opening="e4 e5", limit=100)["games"]) == 12
+        # LIKE 通配符按字面匹配
+        assert catalog.query(opening="%")["games"] == []
+
+        # 重复保存保留创建时间
+        catalog.upsert(make_entry("g00", {"status": "draw"}, [], timestamp=5000.0))
+        entry = catalog.get("g00")
+        assert entry["created"] == 1000.0 and entry["updated"] == 5000.0 and entry["result"] == "1/2-1/2"
+
+        assert catalog.rename("g00", "renamed") and catalog.get("g00") is None and catalog.get("renamed")
+        assert catalog.delete("renamed") and catalog.count() == 24
+        for bad in ({"sort": "white"}, {"order": "up"}, {"cursor": "???"}):
+            try:
+                catalog.query(**bad)
+                assert False, bad
+            except ValueError as e:
+                print(f"{bad}: {e}")
+        catalog.close()
+
+def test_import_and_rebuild():
+    saved = archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = os.path.join(tmp, "games")
+        try:
+            catalog = make_catalog(tmp)
+            report = import_pgn(PGN.splitlines(keepends=True), "club", workers=1, kind="thread", catalog=catalog)
+            assert report.imported == 2
+            first = catalog.get("club_000001")
+            assert (first["white"], first["black"], first["result"], first["plies"], first["opening"]) == \
+                   ("Alice", "Bob", "1-0", 6, "Italian Game")
+            assert catalog.get("club_000002")["opening"] == "d4 d5 c4 e6 Nc3 Nf6"
+            assert [e["id"] for e in catalog.query(player="Bob", sort="id", order="asc")["games"]] == ["club_000001", "club_000002"]
+
+            # 存档目录中的 JSON 旧存档与二进制记录都能重建进索引
+            game = Game()
+            game.make_move((6, 4), (4, 4))
+            archive.write_archive("legacy", game.get_state_dict())
+            archive.write_record("live", encode_game(game))
+            assert entry_from_record("live", GameRecord(encode_game(game)))["plies"] == 1
+            catalog.delete("club_000002")
+            assert catalog.rebuild() == 4
+            assert {e["id"] for e in catalog.query()["games"]} == {"club_000001", "club_000002", "legacy", "live"}
+            assert catalog.get("legacy")["result"] == "*" and catalog.get("legacy")["plies"] == 1
+            catalog.close()
+        finally:
+            archive.ARCHIVE_DIR = saved
+
+def test_index_outside_served_archive_dir():
+    saved = archive.ARCHIVE_DIR, archive.INDEX_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = os.path.join(tmp, "games")
+        archive.INDEX_DIR = os.path.join(tmp, "indexes")
+        try:
+            # 旧版放在存档目录下的索引（连同 WAL 文件）移入索引目录
+            os.makedirs(archive.ARCHIVE_DIR)
+            legacy = Catalog(os.path.join(archive.ARCHIVE_DIR, "catalog.sqlite3"))
+            legacy.upsert_many([make_entry("old", {}, ["e4"], 1.0)])
+            legacy.close()
+            catalog = Catalog.from_env()
+            assert os.path.dirname(catalog.path) == archive.INDEX_DIR and not catalog.created
+            assert catalog.get("old") is not None
+            assert not [name for name in os.listdir(archive.ARCHIVE_DIR) if name.startswith("catalog")]
+            catalog.close()
+        finally:
+            archive.ARCHIVE_DIR, archive.INDEX_DIR = saved
+
+if __name__ == "__main__":
+    test_entries_and_filters()
+    test_import_and_rebuild()
+    test_index_outside_served_archive_dir()
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.executor import ExecutorBusy, ExecutorTimeout, LogicExecutor
+from backend.logic.game import Game
+
+def test_queue_depth_and_timeout():
+    async def scenario():
+        executor = LogicExecutor("thread", workers=1, max_pending=2, timeout=5)
+        gate = threading.Event()
+        first = asyncio.ensure_future(executor.run(gate.wait))
+        second = asyncio.ensure_future(executor.run(gate.wait))
+        await asyncio.sleep(0.05)
+        try:
+            await executor.run(sum, [1, 2])
+            assert False, "应当因队列已满被拒绝"
+        except ExecutorBusy:
+            pass
+        gate.set()
+        await asyncio.gather(first, second)
+        assert executor.pending == 0
+
+        try:
+            await executor.run(time.sleep, 0.5, timeout=0.05)
+            assert False, "应当超时"
+        except ExecutorTimeout:
+            pass
+        # 超时的任务仍占用名额，直到真正结束
+        assert executor.pending == 1
+        await asyncio.sleep(0.6)
+        assert executor.pending == 0
+        executor.shutdown()
+    asyncio.run(scenario())
+    print("Queue depth and timeout passed!")
+
+def test_room_lock_serializes_game():
+    async def scenario():
+        executor = LogicExecutor("thread", workers=4)
+        game = Game()
+        lock = threading.Lock()
+        moves = [((6, 4), (4, 4)), ((1, 4), (3, 4)), ((7, 6), (5, 5)), ((0, 1), (2, 2))]
+        for start, end in moves:
+            success, _ = await executor.run(game.make_move, start, end, lock=lock)
+            assert success
+        results = await asyncio.gather(*[executor.run(game.get_piece_legal_moves, (7, 5), lock=lock) for _ in range(8)])
+        assert all(len(r) == 5 for r in results)
+        executor.shutdown()
+    asyncio.run(scenario())
+    print("Room lock passed!")
+
+def test_process_pool_runs_stateless_logic():
+    async def scenario():
+        executor = LogicExecutor("process", workers=2)
+        fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+        moves = await executor.run(Game.get_moves_for_fen, fen, (6, 4))
+        assert sorted(m.end for m in moves) == [(4, 4), (5, 4)]
+        result = await executor.run(Game.search_fen, fen, 2)
+        assert result.code is not None
+        executor.shutdown()
+    asyncio.run(scenario())
+    print("Process pool passed!")
+
+if __name__ == "__main__":
+    test_queue_depth_and_timeout()
+    test_room_lock_serializes_game()
+    test_process_pool_runs_stateless_logic()
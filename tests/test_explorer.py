@@ -0,0 +1,99 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import archive
+from backend.explorer import OpeningExplorer
+from backend.importer import import_pgn
+from backend.logic.game import Game
+from backend.logic.notation import NotationHandler
+from backend.logic.record import GameRecord, encode_game
+from backend.positions import record_keys
+
+PGN = """[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 1-0
+
+[Result "0-1"]
+
+1. e4 c5 2. Nf3 d6 0-1
+
+[Result "1/2-1/2"]
+
+1. Nf3 Nc6 2. e4 e5 3. Bc4 1/2-1/2
+
+[Result "*"]
+
+1. d4 *
+"""
+
+def play(sans):
+    game = Game()
+    for san in sans:
+        start, end, promo = NotationHandler.parse_san_to_move(san, game.turn, game.board)
+        assert game.make_move(start, end, promo)[0], san
+    return game
+
+def moves_of(node):
+    return {m["san"]: (m["games"], m["white"], m["draws"], m["black"]) for m in node["moves"]}
+
+def test_tree_statistics_and_updates():
+    saved = archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = os.path.join(tmp, "games")
+        try:
+            explorer = OpeningExplorer(os.path.join(tmp, "explorer.sqlite3"), depth=3)
+            report = import_pgn(PGN.splitlines(keepends=True), "o", workers=1, kind="thread", explorer=explorer)
+            assert report.imported == 4
+
+            root = explorer.lookup(NotationHandler.DEFAULT_FEN)
+            assert (root["games"], root["white"], root["draws"], root["black"]) == (4, 1, 1, 1)
+            assert moves_of(root) == {"e4": (2, 1, 0, 1), "Nf3": (1, 0, 1, 0), "d4": (1, 0, 0, 0)}
+            assert [m["san"] for m in root["moves"]] == ["e4", "Nf3", "d4"]
+
+            # 换序到达的同一局面合并；第 4 步起超出统计深度
+            node = explorer.lookup(play(["e4", "e5", "Nf3", "Nc6"]).current_fen())
+            assert node["games"] == 0
+            node = explorer.lookup(play(["e4", "e5", "Nf3"]).current_fen())
+            assert node["games"] == 1 and node["moves"] == []
+            after_e4 = explorer.lookup(play(["e4"]).current_fen())
+            assert moves_of(after_e4) == {"e5": (1, 1, 0, 0), "c5": (1, 0, 0, 1)}
+
+            # 重复保存同一存档：旧统计被扣除
+            game = play(["d4", "d5"])
+            explorer.add_many([explorer.game_item("o_000004", record_keys(GameRecord(encode_game(game))), GameRecord(encode_game(game)))])
+            assert moves_of(explorer.lookup(NotationHandler.DEFAULT_FEN))["d4"] == (1, 0, 0, 0)
+            assert moves_of(explorer.lookup(play(["d4"]).current_fen())) == {"d5": (1, 0, 0, 0)}
+
+            # 删除后节点计数归零的行被移除；重命名不影响统计
+            assert explorer.rename("o_000002", "sicilian")
+            assert explorer.remove("sicilian") and not explorer.remove("sicilian")
+            assert moves_of(explorer.lookup(play(["e4"]).current_fen())) == {"e5": (1, 1, 0, 0)}
+            assert explorer.lookup(play(["e4", "c5"]).current_fen())["games"] == 0
+
+            # 重建与增量结果一致（存档目录中仍有被删除的 o_000002，这里一并删除）
+            archive.write_record("o_000004", encode_game(game))
+            shutil.rmtree(archive.archive_dir("o_000002"))
+            incremental = explorer.lookup(NotationHandler.DEFAULT_FEN)
+            assert explorer.rebuild() == 3
+            assert explorer.lookup(NotationHandler.DEFAULT_FEN) == incremental
+            explorer.close()
+
+            # 统计深度改变时标记为需要重建
+            reopened = OpeningExplorer(os.path.join(tmp, "explorer.sqlite3"), depth=5)
+            assert reopened.stale and not reopened.created
+            reopened.rebuild()
+            assert not reopened.stale
+            # 深度 5 时第 4 步之后的局面也被统计（两局换序到达）
+            node = reopened.lookup(play(["e4", "e5", "Nf3", "Nc6"]).current_fen())
+            assert node["games"] == 2 and moves_of(node) == {"Bb5": (1, 1, 0, 0), "Bc4": (1, 0, 1, 0)}
+            reopened.close()
+        finally:
+            archive.ARCHIVE_DIR = saved
+
+if __name__ == "__main__":
+    test_tree_statistics_and_updates()
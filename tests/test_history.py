@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.bitboard import BitBoard
+from backend.logic.board import Board
+from backend.logic.constants import GameStatus
+from backend.logic.game import Game
+from backend.logic.history import FenHistory
+from backend.logic.record import GameRecord, encode_game
+from backend.positions import history_keys, record_keys
+
+def test_lazy_fen_history_matches_eager():
+    rng = random.Random(9)
+    for board_cls in (Board, BitBoard):
+        for interval in (3, 16):
+            game = Game(board_cls)
+            game.fen_history = FenHistory(game.fen_history[0], game.current_fen, interval=interval, memo_size=4)
+            eager = [game.current_fen()]
+            for _ in range(150):
+                moves = game.board.get_legal_moves(game.turn)
+                if game.status != GameStatus.ONGOING or not moves:
+                    break
+                if game.history and rng.random() < 0.2:
+                    game.undo_move()
+                    eager.pop()
+                    continue
+                start = rng.choice(sorted(moves))
+                game.make_move(start, rng.choice(moves[start]).end, "Q")
+                eager.append(game.current_fen())
+                # 随机访问若干历史局面（走检查点重放与缓存两条路径）
+                for _ in range(2):
+                    i = rng.randrange(len(eager))
+                    assert game.fen_history[i] == eager[i]
+            assert len(game.fen_history) == len(eager)
+            assert list(game.fen_history) == eager
+            assert game.fen_history[-1] == eager[-1] and game.fen_history[1:4] == eager[1:4]
+            assert len(game.fen_history._memo) <= 4
+            assert len(game.fen_history.checkpoints) == 1 + (len(eager) - 1) // interval
+    print("Lazy FEN history passed!")
+
+def test_placement_only_start():
+    # 仅布局的简写 FEN：第 0 步按规范化后的完整 FEN 返回，重放仍从原始输入开始
+    game = Game()
+    game.load_fen("4k3/8/8/8/8/8/4P3/4K3")
+    game.make_move((6, 4), (4, 4))
+    game.make_move((0, 4), (0, 3))
+    assert game.fen_history[0] == "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1"
+    assert game.fen_history[1] == "4k3/8/8/8/4P3/8/8/4K3 b - e3 0 1"
+    assert game.get_state_dict()["fen_history"][-1] == "3k4/8/8/8/4P3/8/8/4K3 w - - 0 1"
+    print("Placement-only start passed!")
+
+def test_start_fen_kept_as_loaded():
+    # 完整 FEN（半回合计数、回合数与生成的不同，易位权写了不存在的车）：第 0 步原样返回
+    fen = "4k3/8/8/8/8/8/4P3/4K3 w K - 7 42"
+    game = Game()
+    game.load_fen(fen)
+    assert game.fen_history[0] == fen
+    game.make_move((6, 4), (4, 4))
+    assert game.fen_history[0] == fen and list(game.fen_history)[0] == fen
+    state = game.get_state_dict()
+    record = GameRecord(encode_game(game))
+    assert record.fen_at(0) == fen and record.to_state_dict()["fen_history"] == state["fen_history"]
+    # 局面键仍按规范化的 FEN 计算
+    assert history_keys(game.fen_history) == record_keys(record)
+    print("Start FEN kept as loaded passed!")
+
+if __name__ == "__main__":
+    test_lazy_fen_history_matches_eager()
+    test_placement_only_start()
+    test_start_fen_kept_as_loaded()
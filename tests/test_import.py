@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import archive
+from backend.importer import import_pgn
+
+PGN = """[Event "Scholar"]
+1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 (3... g6) 4. Qxf7# 1-0
+
+[Event "Illegal"]
+1. e4 e5 2. Ke3 *
+
+[Event "Setup"]
+[FEN "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1"]
+1. O-O-O+ Ke7 *
+"""
+
+def run_import(kind):
+    saved = archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = tmp
+        try:
+            lines = (PGN * 3).splitlines(keepends=True)
+            report = import_pgn(lines, "bulk", workers=2, chunk_size=2, kind=kind).to_dict()
+            ids = sorted(os.listdir(tmp))
+            first = archive.read_archive("bulk_000001")
+        finally:
+            archive.ARCHIVE_DIR = saved
+    return report, ids, first
+
+def test_bulk_import_collects_errors():
+    report, ids, first = run_import("thread")
+    assert report["done"] and report["read"] == 9
+    assert report["imported"] == 6 and report["failed"] == 3
+    # 出错的对局不写入存档，也不影响后续对局
+    assert sorted(e["index"] for e in report["errors"]) == [2, 5, 8]
+    assert "Ke3" in report["errors"][0]["error"]
+    assert len(ids) == 6 and "bulk_000002" not in ids
+    assert first["status"] == "white_win" and first["history"][-1] == "Qxf7#"
+    assert first["headers"]["Event"] == "Scholar"
+    print("Bulk import passed!")
+
+def test_bulk_import_process_pool():
+    report, ids, _ = run_import("process")
+    assert report["imported"] == 6 and report["failed"] == 3 and len(ids) == 6
+    print("Bulk import with process pool passed!")
+
+def test_bulk_import_does_not_overwrite():
+    saved = archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = tmp
+        try:
+            archive.write_archive("bulk_000003", {"note": "用户保存的同名存档"})
+            first = import_pgn(PGN.splitlines(keepends=True), "bulk", workers=1, kind="thread").to_dict()
+            assert first["imported"] == 1 and first["skipped"] == 1 and first["failed"] == 1
+            assert archive.read_archive("bulk_000003") == {"note": "用户保存的同名存档"}
+            # 同一前缀再导入一次：全部跳过，之前的存档保持不变
+            again = import_pgn(PGN.splitlines(keepends=True), "bulk", workers=1, kind="thread").to_dict()
+            assert again["imported"] == 0 and again["skipped"] == 2
+            assert {e["id"] for e in again["errors"] if "已存在" in e["error"]} == {"bulk_000001", "bulk_000003"}
+        finally:
+            archive.ARCHIVE_DIR = saved
+    print("Bulk import skips existing ids passed!")
+
+if __name__ == "__main__":
+    test_bulk_import_collects_errors()
+    test_bulk_import_process_pool()
+    test_bulk_import_does_not_overwrite()
@@ -0,0 +1,72 @@
+import os
+import sys
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import metrics
+from backend.metrics import Registry
+
+def parse(text):
+    """Prometheus 文本格式 -> {样本名与标签: 数值}"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    h = registry.histogram("t_seconds", "test", ("type",), buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.01, 0.05, 0.5, 5.0):
+        h.observe(value, "move")
+    h.observe(0.2, 'say "hi"\n')
+    samples = parse(registry.render())
+    assert samples['t_seconds_bucket{type="move",le="0.01"}'] == 2
+    assert samples['t_seconds_bucket{type="move",le="0.1"}'] == 3
+    assert samples['t_seconds_bucket{type="move",le="1.0"}'] == 4
+    assert samples['t_seconds_bucket{type="move",le="+Inf"}'] == 5
+    assert samples['t_seconds_count{type="move"}'] == 5
+    assert abs(samples['t_seconds_sum{type="move"}'] - 5.565) < 1e-9
+    # 标签值中的引号与换行被转义
+    assert samples['t_seconds_count{type="say \\"hi\\"\\n"}'] == 1
+    print("Histogram passed!")
+
+def test_counter_timer_and_sampled():
+    registry = Registry()
+    c = registry.counter("t_total", "test")
+    h = registry.histogram("t_seconds", "test")
+    c.inc()
+    c.inc(amount=3)
+    with h.time():
+        pass
+    registry.sampled("t_live", "test", lambda: 7)
+    registry.sampled("t_events_total", "test", lambda: {("a",): 1, ("b",): 2}, ("event",), "counter")
+    registry.sampled("t_broken", "test", lambda: 1 / 0)
+    text = registry.render()
+    samples = parse(text)
+    assert samples["t_total"] == 4 and samples["t_seconds_count"] == 1 and samples["t_live"] == 7
+    assert samples['t_events_total{event="b"}'] == 2
+    assert "# TYPE t_events_total counter" in text
+    # 回调出错的指标被跳过，不影响其他指标
+    assert "t_broken" not in text
+    print("Counter/sampled passed!")
+
+def test_disabled_records_nothing():
+    registry = Registry()
+    h = registry.histogram("t_seconds", "test")
+    enabled, metrics.ENABLED = metrics.ENABLED, False
+    try:
+        h.observe(1.0)
+        with h.time():
+            pass
+    finally:
+        metrics.ENABLED = enabled
+    assert "t_seconds_count" not in registry.render()
+    print("Disabled metrics passed!")
+
+if __name__ == "__main__":
+    test_histogram_buckets_are_cumulative()
+    test_counter_timer_and_sampled()
+    test_disabled_records_nothing()
@@ -5,7 +5,8 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.logic.board import Board
-from backend.logic.constants import Color
+from backend.logic.constants import Color, MoveType
+from backend.logic.move import MoveCode
 from backend.logic.notation import NotationHandler
 
 def test_moves():
@@ -30,5 +31,31 @@ def test_moves():
     black_moves = board.get_legal_moves(Color.BLACK)
     print(f"Total pieces for Black that can move: {len(black_moves)}")
 
+def test_move_codes():
+    board = Board()
+    NotationHandler.parse_fen_to_board(board, "r3k2r/1P6/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1")
+    codes = list(board._legal_move_generator(Color.WHITE))
+    assert all(isinstance(code, int) for code in codes)
+
+    # 编码与 Move 对象互相转换后保持一致
+    kinds = set()
+    for code in codes:
+        move = MoveCode.to_move(board, code)
+        assert move.start == divmod(MoveCode.start_sq(code), board.cols)
+        assert move.end == divmod(MoveCode.end_sq(code), board.cols)
+        assert move.move_type == MoveCode.move_type(code)
+        assert MoveCode.from_move(move, board.cols) == code
+        kinds.add(move.move_type)
+    assert kinds == set(MoveType)
+
+    promo = next(code for code in codes if MoveCode.move_type(code) == MoveType.PROMOTION)
+    knight = MoveCode.with_promotion(promo, "n")
+    assert MoveCode.promotion_choice(knight) == "N"
+    assert MoveCode.to_move(board, knight).promotion_choice == "N"
+    ep = next(code for code in codes if MoveCode.move_type(code) == MoveType.EN_PASSANT)
+    assert MoveCode.to_move(board, ep).captured_piece is board.grid[3][3]
+    print(f"{len(codes)} move codes verified!")
+
 if __name__ == "__main__":
     test_moves()
+    test_move_codes()
@@ -0,0 +1,27 @@
+import os
+import sys
+import io
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.perft import BOARDS, REFERENCE_POSITIONS, divide, run_suite, setup
+
+def test_reference_suite():
+    for name, board_cls in BOARDS.items():
+        out = io.StringIO()
+        ok = run_suite(3, board_cls, out=out)
+        print(f"[{name}]\n{out.getvalue()}")
+        assert ok
+
+def test_divide_sums_to_perft():
+    case = REFERENCE_POSITIONS[4]  # position5：根节点包含吃子升变与易位
+    board, turn = setup(case.fen)
+    result = divide(board, turn, 2)
+    assert sum(result.values()) == case.nodes[1]
+    assert {"d7c8q", "d7c8n", "e1g1"} <= set(result)
+    print("Divide OK!")
+
+if __name__ == "__main__":
+    test_reference_suite()
+    test_divide_sums_to_perft()
@@ -0,0 +1,83 @@
+import os
+import sys
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.game import Game
+from backend.logic.pgn import read_games, read_games_from_string
+
+PGN = """[Event "Nested"]
+[White "A \\"quoted\\" name"]
+[Result "1-0"]
+
+{Before the first move} 1. e4 e5 (1... c5 2. Nf3 (2. c3 d5) d6) 2. Nf3! $1 Nc6 {multi
+line comment} 3. Bb5 ; rest of line
+% escaped line
+3... a6 1-0
+
+[Event "No result"]
+1.d4 d5 2.c4
+[Event "Setup"]
+[FEN "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1"]
+
+1. O-O-O+ Ke7 *
+"""
+
+def test_multi_game_structure():
+    games = list(read_games_from_string(PGN))
+    assert [g.headers["Event"] for g in games] == ["Nested", "No result", "Setup"]
+
+    first = games[0]
+    assert first.headers["White"] == 'A "quoted" name'
+    assert first.moves == ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"] and first.result == "1-0"
+    assert first.mainline.comments == {0: ["Before the first move"], 4: ["multi line comment"]}
+    variation = first.mainline.variations[1][0]
+    assert variation.moves == ["c5", "Nf3", "d6"]
+    assert variation.variations[1][0].moves == ["c3", "d5"]
+
+    # 缺少结果记号时由下一局的标签结束
+    assert games[1].moves == ["d4", "d5", "c4"] and games[1].result == "*"
+    assert games[2].start_fen == "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1"
+    print("Multi-game PGN structure passed!")
+
+def test_streaming_is_lazy():
+    consumed = []
+    def lines():
+        for line in PGN.splitlines(keepends=True):
+            consumed.append(line)
+            yield line
+    first = next(read_games(lines()))
+    assert first.headers["Event"] == "Nested"
+    assert len(consumed) < len(PGN.splitlines())
+    print("Streaming laziness passed!")
+
+def test_load_pgn_ignores_nested_variations():
+    game = Game()
+    game.load_pgn(PGN)
+    assert [m.san.rstrip("+#") for m in game.history] == ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"]
+
+    # 单独一局中带 FEN 起始局面
+    game = Game()
+    game.load_pgn(PGN[PGN.index('[Event "Setup"]'):])
+    assert [m.san for m in game.history] == ["O-O-O+", "Ke7"]
+    print("Game.load_pgn with variations passed!")
+
+def test_variations_and_comments_at_game_boundaries():
+    # 对局开头的变着不并入主线
+    games = list(read_games_from_string("(1. d4 d5) 1. e4 *"))
+    assert len(games) == 1 and games[0].moves == ["e4"]
+    assert games[0].mainline.variations[0][0].moves == ["d4", "d5"]
+
+    # 结果记号之后的注释属于刚结束的一局
+    games = list(read_games_from_string('[Event "A"]\n1. e4 e5 1-0 {White resigns later}\n\n[Event "B"]\n1. d4 *\n{tail}'))
+    assert [g.headers["Event"] for g in games] == ["A", "B"]
+    assert games[0].mainline.comments == {2: ["White resigns later"]}
+    assert games[1].mainline.comments == {1: ["tail"]}
+    print("Game boundary variations and comments passed!")
+
+if __name__ == "__main__":
+    test_multi_game_structure()
+    test_streaming_is_lazy()
+    test_load_pgn_ignores_nested_variations()
+    test_variations_and_comments_at_game_boundaries()
@@ -0,0 +1,60 @@
+import os
+import sys
+import random
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.board import Board
+from backend.logic.constants import Color
+from backend.logic.game import Game
+from backend.logic.move import Move, MoveCode
+from backend.logic.notation import NotationHandler
+
+def reference_moves(board, color):
+    """旧实现：逐个执行伪合法走法后检查是否被将军"""
+    result = set()
+    for piece in list(board.pieces[color]):
+        for code in piece.get_valid_moves(board.grid, board.rows, board.cols, board.last_move):
+            if board._is_legal_by_execution(code, color):
+                move = MoveCode.to_move(board, code)
+                result.add((move.start, move.end))
+    return result
+
+def generated_moves(board, color):
+    return {(m.start, m.end) for moves in board.get_legal_moves(color).values() for m in moves}
+
+def test_pins_and_checks():
+    cases = [
+        "4k3/8/8/8/4r3/8/4B3/4K3 w - - 0 1",     # 象被车直线牵制，不能动
+        "4k3/8/8/8/4r3/8/4R3/4K3 w - - 0 1",     # 车被牵制，只能沿线移动或吃掉牵制者
+        "4k3/8/8/1b6/8/8/4N3/R3K2R w KQ - 0 1",  # 象将军：挡、吃或走王
+        "4k3/8/8/8/8/5n2/8/R3K2R w KQ - 0 1",    # 马将军：不能易位
+        "4k3/8/8/8/1b6/8/3N4/r3K3 w - - 0 1",    # 双将：只能走王
+        "8/8/8/KPp4r/8/8/8/7k w - - 0 1",        # 吃过路兵会暴露横向将军
+    ]
+    for fen in cases:
+        board = Board()
+        NotationHandler.parse_fen_to_board(board, fen)
+        if fen.startswith("8/8/8/KPp"):
+            board.last_move = Move((1, 2), (3, 2), board.grid[3][2])
+        assert generated_moves(board, Color.WHITE) == reference_moves(board, Color.WHITE), fen
+    print("Pin and check cases passed!")
+
+def test_random_games_match_reference():
+    rng = random.Random(3)
+    for _ in range(8):
+        game = Game()
+        for _ in range(100):
+            board = game.board
+            assert generated_moves(board, game.turn) == reference_moves(board, game.turn)
+            moves = board.get_legal_moves(game.turn)
+            if game.status.value != "ongoing" or not moves:
+                break
+            start = rng.choice(sorted(moves))
+            game.make_move(start, rng.choice(moves[start]).end)
+    print("Random games matched reference!")
+
+if __name__ == "__main__":
+    test_pins_and_checks()
+    test_random_games_match_reference()
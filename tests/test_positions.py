@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import archive
+from backend.importer import import_pgn
+from backend.logic.game import Game
+from backend.logic.notation import NotationHandler
+from backend.logic.record import GameRecord, encode_game
+from backend.positions import PositionIndex, canonical_fen, position_key, record_keys
+
+# 两局经不同走法顺序到达同一局面（1. e4 e5 2. Nf3 Nc6 与 1. Nf3 Nc6 2. e4 e5）
+PGN = """[White "A"]
+[Black "B"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 *
+
+[White "C"]
+[Black "D"]
+
+1. Nf3 Nc6 2. e4 e5 3. Bc4 *
+"""
+
+def play(sans):
+    game = Game()
+    for san in sans:
+        start, end, promo = NotationHandler.parse_san_to_move(san, game.turn, game.board)
+        assert game.make_move(start, end, promo)[0], san
+    return game
+
+def test_keys_match_fen_queries():
+    # 王走过、车未动：重放得到的局面与 FEN 解析得到的局面键一致
+    game = play(["e4", "e5", "Ke2", "Ke7", "Ke1", "Ke8"])
+    keys = record_keys(GameRecord(encode_game(game)))
+    assert keys == [position_key(canonical_fen(fen)) for fen in game.fen_history]
+    # 与初始局面布局相同，但已失去易位权
+    assert keys[-1] != keys[0]
+    # 可以吃过路兵时过路兵格计入局面键，不能吃时忽略
+    fen = play(["e4", "Nf6", "e5", "d5"]).current_fen()
+    assert " d6 " in fen and position_key(fen) != position_key(fen.replace(" d6 ", " - "))
+    fen = play(["e4", "e5"]).current_fen()
+    assert " e6 " in fen and position_key(fen) == position_key(fen.replace(" e6 ", " - "))
+    # 外部 FEN 的步数计数不影响局面键
+    assert position_key(canonical_fen(NotationHandler.DEFAULT_FEN.replace(" 0 1", " 7 30"))) == keys[0]
+
+def test_index_lookup_import_and_rebuild():
+    saved = archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.ARCHIVE_DIR = os.path.join(tmp, "games")
+        try:
+            index = PositionIndex(os.path.join(tmp, "positions.sqlite3"))
+            report = import_pgn(PGN.splitlines(keepends=True), "t", workers=1, kind="thread", positions=index)
+            assert report.imported == 2
+
+            target = play(["e4", "e5", "Nf3", "Nc6"]).current_fen()
+            result = index.lookup(target)
+            assert result["matches"] == [{"id": "t_000001", "ply": 4}, {"id": "t_000002", "ply": 4}]
+            assert result["next_cursor"] is None
+
+            # 分页
+            first = index.lookup(NotationHandler.DEFAULT_FEN, limit=1)
+            assert first["matches"] == [{"id": "t_000001", "ply": 0}]
+            second = index.lookup(NotationHandler.DEFAULT_FEN, limit=1, cursor=first["next_cursor"])
+            assert second["matches"] == [{"id": "t_000002", "ply": 0}] and second["next_cursor"] is None
+
+            # 重命名只改映射，删除移除全部条目
+            assert index.rename("t_000001", "ruy")
+            assert [m["id"] for m in index.lookup(target)["matches"]] == ["ruy", "t_000002"]
+            total = index.count()
+            assert index.remove("ruy")
+            assert index.count() == total - 7
+            assert [m["id"] for m in index.lookup(target)["matches"]] == ["t_000002"]
+
+            # 重复写入同一存档替换旧条目
+            game = play(["e4", "e5", "Nf3", "Nc6", "d4"])
+            index.add("live", record_keys(GameRecord(encode_game(game))))
+            index.add("live", record_keys(GameRecord(encode_game(game))))
+            assert [m["id"] for m in index.lookup(target)["matches"]] == ["t_000002", "live"]
+
+            # 离线重建：二进制记录与旧版 JSON 存档
+            archive.write_archive("legacy", game.get_state_dict())
+            assert index.rebuild() == 3
+            assert {m["id"] for m in index.lookup(target)["matches"]} == {"t_000001", "t_000002", "legacy"}
+            assert index.lookup("8/8/8/8/8/8/8/K6k w - - 0 1")["matches"] == []
+            index.close()
+        finally:
+            archive.ARCHIVE_DIR = saved
+
+if __name__ == "__main__":
+    test_keys_match_fen_queries()
+    test_index_lookup_import_and_rebuild()
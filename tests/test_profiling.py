@@ -0,0 +1,133 @@
+import asyncio
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import profiling
+from backend.executor import LogicExecutor
+from backend.logic.game import Game
+from backend.profiling import Profiler, Sampler, Session
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+def test_cprofile_session_dumps_stats():
+    with tempfile.TemporaryDirectory() as tmp:
+        session = Session("room:a b", "cprofile", max_calls=2)
+        for n in (1000, 2000):
+            result, raw = profiling.profiled_call(busy, n)
+            session.add(raw)
+            session.calls += 1
+        assert result == busy(2000)
+        assert session.expired
+        paths = session.finish(tmp)
+        assert [os.path.splitext(p)[1] for p in paths] == [".prof", ".txt"]
+        assert os.path.basename(paths[0]).startswith("room_a_b-")
+        stats = pstats.Stats(paths[0])
+        calls = {func[2]: stat[0] for func, stat in stats.stats.items()}
+        assert calls["busy"] == 2
+    print("cProfile session passed!")
+
+def test_sampler_folds_tagged_stacks():
+    sampler = Sampler(interval=0.001)
+    try:
+        sampler.tagged(time.sleep, 0.05)
+        threading.Thread(target=time.sleep, args=(0.02,)).start() # 未标记的线程不被采样
+    finally:
+        sampler.stop()
+    assert sampler.samples > 0
+    assert all(stack.split(";")[-1].startswith("tagged") for stack in sampler.stacks)
+    print("Sampler passed!")
+
+def test_room_memory_parts():
+    game = Game()
+    empty = profiling.room_memory(game)
+    for start, end in [((6, 4), (4, 4)), ((1, 4), (3, 4)), ((7, 6), (5, 5)), ((0, 1), (2, 2))]:
+        assert game.make_move(start, end)[0]
+    report = profiling.room_memory(game)
+    assert report["plies"] == 4
+    assert set(report["parts"]) == {"board", "history", "fen_history", "position_counts"}
+    assert report["bytes"] == sum(p["bytes"] for p in report["parts"].values())
+    assert report["parts"]["history"]["bytes"] > empty["parts"]["history"]["bytes"]
+    # 棋盘经 last_move 链到全部走法，走法不能算在棋盘上：多走几步棋盘大小不变
+    assert report["parts"]["board"]["bytes"] <= empty["parts"]["board"]["bytes"] + 512
+    print("Room memory passed!")
+
+def test_memory_report_can_stop_tracing():
+    was_tracing = tracemalloc.is_tracing()
+    profiler = Profiler(enabled=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler.directory = tmp
+        try:
+            first = profiler.memory({})
+            assert tracemalloc.is_tracing() and first["tracing_started"] != was_tracing
+            last = profiler.memory({}, stop=True)
+            assert last["tracing_stopped"] and not tracemalloc.is_tracing()
+            assert last["tracemalloc"]["tracing"] and len(last["files"]) == 2
+            # 已停止时再带 stop 调用不会重新开始追踪
+            again = profiler.memory({}, stop=True)
+            assert not again["tracing_started"] and not tracemalloc.is_tracing()
+        finally:
+            if was_tracing and not tracemalloc.is_tracing():
+                tracemalloc.start()
+    print("Memory report stop passed!")
+
+def test_profiler_authorize_and_call_limit():
+    assert Profiler().authorize(None) is not None
+    profiler = Profiler(enabled=True, token="secret")
+    assert profiler.authorize("wrong") is not None
+    assert profiler.authorize("secret") is None
+
+    async def scenario(directory):
+        profiler.directory = directory
+        executor = LogicExecutor("inline")
+        assert await profiler.run("analyze", executor, busy, 10) == busy(10) # 没有会话时直接执行
+        profiler.start("analyze", "cprofile", max_calls=2)
+        try:
+            profiler.start("analyze")
+            assert False, "同一键不能同时有两个会话"
+        except ValueError:
+            pass
+        await profiler.run("room:x", executor, busy, 10)
+        assert profiler.sessions["analyze"].calls == 0
+        await profiler.run("analyze", executor, busy, 100)
+        await profiler.run("analyze", executor, busy, 100)
+        assert "analyze" not in profiler.sessions
+        # 到时结束的会话在线程池中写出，不在事件循环上导出 pstats
+        loop_thread = threading.get_ident()
+        finish = Session.finish
+        threads = []
+        def record_thread(session, directory):
+            threads.append(threading.get_ident())
+            return finish(session, directory)
+        Session.finish = record_thread
+        try:
+            profiler.start("room:y", "cprofile", seconds=0.05)
+            await profiler.run("room:y", executor, busy, 10)
+            await asyncio.sleep(0.2)
+        finally:
+            Session.finish = finish
+        assert "room:y" not in profiler.sessions
+        assert threads and loop_thread not in threads
+        executor.shutdown()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(tmp))
+        result = next(r for r in profiler.results if r["key"] == "analyze")
+        assert result["calls"] == 2
+        assert all(os.path.exists(path) for path in result["files"])
+    print("Profiler call limit passed!")
+
+if __name__ == "__main__":
+    test_cprofile_session_dumps_stats()
+    test_sampler_folds_tagged_stacks()
+    test_room_memory_parts()
+    test_memory_report_can_stop_tracing()
+    test_profiler_authorize_and_call_limit()
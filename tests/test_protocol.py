@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import sys
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.game import Game
+from backend.protocol import ConnectionManager, init_message, move_delta, undo_delta
+
+class FakeSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("connection closed")
+        self.sent.append(text)
+
+def apply_delta(state, msg):
+    """与前端 LiveController.applyDelta 相同的合并规则"""
+    if msg["op"] == "move":
+        assert len(state["history"]) == msg["ply"] - 1
+        state["history"].append(msg["san"])
+        state["fen_history"].append(msg["fen"])
+    else:
+        assert len(state["history"]) == msg["ply"] + 1
+        del state["history"][msg["ply"]:]
+        del state["fen_history"][msg["ply"] + 1:]
+        state["fen_history"][msg["ply"]] = msg["fen"]
+    state["turn"], state["status"] = msg["turn"], msg["status"]
+
+def test_deltas_rebuild_full_state():
+    game = Game()
+    init = json.loads(json.dumps(init_message(game)))
+    state, seq = init["state"], init["seq"]
+    steps = [((6, 4), (4, 4)), ((1, 4), (3, 4)), ((7, 5), (4, 2)), "undo", ((7, 6), (5, 5)), ((1, 3), (2, 3))]
+    for step in steps:
+        if step == "undo":
+            game.undo_move()
+            msg = undo_delta(game)
+        else:
+            assert game.make_move(*step)[0]
+            msg = move_delta(game)
+        msg = json.loads(json.dumps(msg))
+        assert msg["seq"] == seq + 1
+        apply_delta(state, msg)
+        seq = msg["seq"]
+    assert state == game.get_state_dict()
+    # 增量大小与对局长度无关
+    assert "history" not in msg and "fen_history" not in msg
+    print("Delta protocol passed!")
+
+def test_broadcast_encodes_once_and_fans_out():
+    async def scenario():
+        manager = ConnectionManager()
+        slow, fast, broken = FakeSocket(delay=0.2), FakeSocket(), FakeSocket(fail=True)
+        for ws in (slow, fast, broken):
+            await manager.connect("room", ws)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*[manager.broadcast("room", {"type": "update", "seq": i}) for i in (1, 2, 3)])
+        # 并发发送：三次广播总耗时约等于一次慢连接的发送时间
+        assert loop.time() - start < 0.5
+        assert fast.sent == slow.sent and len(fast.sent) == 3
+        # 同一次广播的所有连接收到的是同一个已编码字符串
+        assert fast.sent[0] is slow.sent[0]
+        assert manager.active_connections["room"] == [slow, fast]
+    asyncio.run(scenario())
+    print("Broadcast fan-out passed!")
+
+if __name__ == "__main__":
+    test_deltas_rebuild_full_state()
+    test_broadcast_encodes_once_and_fans_out()
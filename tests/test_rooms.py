@@ -0,0 +1,214 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.bus import SocketBus
+from backend.logic.bitboard import BitBoard
+from backend.logic.game import Game
+from backend.protocol import ConnectionManager
+from backend.rooms import FileRoomStore, RoomEvicted, RoomManager, SqliteRoomStore, restore_game
+from backend.logic import record
+
+def play(game, moves):
+    for start, end in moves:
+        assert game.make_move(start, end)[0]
+
+OPENING = [((6, 4), (4, 4)), ((1, 4), (3, 4)), ((7, 6), (5, 5)), ((0, 1), (2, 2)), ((7, 5), (4, 2))]
+
+def test_evict_and_rehydrate():
+    with tempfile.TemporaryDirectory() as tmp:
+        rooms = RoomManager(store=FileRoomStore(tmp), ttl=60, max_rooms=10)
+        game, lock = rooms.open("room 1")
+        play(game, OPENING)
+        game.undo_move()
+        state, version = game.get_state_dict(), game.version
+        assert rooms.evict("room 1")
+        assert rooms.get("room 1") is None and rooms.exists("room 1")
+        try:
+            rooms.call("room 1", Game.get_state_dict)
+            assert False, "已逐出的房间应抛出 RoomEvicted"
+        except RoomEvicted:
+            pass
+        assert rooms.stats()["stored"] == 1
+
+        restored, _ = rooms.open("room 1")
+        assert restored is not game
+        assert restored.get_state_dict() == state and restored.version == version
+        # 恢复后的对局保留走法历史，可以继续撤销与落子
+        assert restored.undo_move()[0]
+        assert restored.make_move((7, 5), (3, 1))[0]
+        stats = rooms.stats()
+        assert stats["live"] == 1 and stats["stored"] == 0
+        assert (stats["created"], stats["evicted"], stats["rehydrated"]) == (1, 1, 1)
+    print("Evict/rehydrate passed!")
+
+def test_restore_promotion_and_bitboard():
+    game = Game(BitBoard)
+    game.load_fen("4k3/1P6/8/8/8/8/8/4K3 w - - 0 1")
+    assert game.make_move((1, 1), (0, 1), "N")[0]
+    restored = restore_game(record.encode_game(game, {"version": game.version}), BitBoard)
+    assert isinstance(restored.board, BitBoard)
+    assert restored.get_state_dict() == game.get_state_dict()
+    print("Restore promotion passed!")
+
+def test_sweep_ttl_and_capacity():
+    with tempfile.TemporaryDirectory() as tmp:
+        rooms = RoomManager(store=FileRoomStore(tmp), ttl=100, max_rooms=2)
+        for room_id in ("a", "b", "c", "d"):
+            rooms.open(room_id)
+        now = rooms.last_active["d"]
+        # 超出上限：最久未用且没有连接的房间被逐出，有连接的房间保留
+        assert rooms.sweep({"a"}, now) == ["b", "c"]
+        assert sorted(rooms.games) == ["a", "d"]
+        # 超过空闲时间：没有连接的房间全部逐出
+        assert rooms.sweep({"a"}, now + 100) == ["d"]
+        assert list(rooms.games) == ["a"]
+        # 房间锁被占用（正在执行操作）时不逐出
+        with rooms.lock("a"):
+            assert rooms.sweep((), now + 100) == []
+        assert rooms.sweep((), now + 100) == ["a"]
+        assert rooms.stats()["stored"] == 4
+        # 选出后又被打开（last_active 已变）的房间不逐出
+        rooms.open("b")
+        assert not rooms.evict("b", now) and rooms.get("b") is not None
+    print("Sweep passed!")
+
+def test_disconnect_drops_empty_rooms():
+    class FakeSocket:
+        async def accept(self):
+            pass
+
+    async def scenario():
+        manager = ConnectionManager()
+        ws = FakeSocket()
+        await manager.connect("room", ws)
+        manager.disconnect("room", ws)
+        assert "room" not in manager.active_connections
+    asyncio.run(scenario())
+    print("Disconnect cleanup passed!")
+
+def test_shared_store_across_workers():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rooms.sqlite3")
+        # 两个 RoomManager 各自连接同一数据库，模拟两个工作进程
+        a, b = RoomManager(store=SqliteRoomStore(path)), RoomManager(store=SqliteRoomStore(path))
+        move = lambda game, start, end: game.make_move(start, end)
+        game_a, _ = a.open("room")
+        game_b, _ = b.open("room")
+        assert a.call("room", move, (6, 4), (4, 4), write=True)[0]
+        assert b.call("room", move, (1, 4), (3, 4), write=True)[0]
+        assert a.call("room", move, (7, 6), (5, 5), write=True)[0]
+        # 撤销后换一步：另一进程撤销到公共前缀再重放
+        assert b.call("room", lambda game: game.undo_move(), write=True)[0]
+        assert b.call("room", move, (7, 5), (4, 2), write=True)[0]
+        assert a.call("room", Game.get_state_dict) == b.call("room", Game.get_state_dict)
+        assert game_a.version == game_b.version == 5
+        assert [m.san for m in game_a.history] == ["e4", "e5", "Bc4"]
+        # 重置在另一进程中同样可见，逐出只释放内存，重新打开时从共享存储恢复
+        def reset(game):
+            new_game = Game()
+            new_game.version = game.version + 1
+            return new_game, None
+        a.reset("room", reset)
+        assert b.evict("room") and b.store.exists("room")
+        restored, _ = b.open("room")
+        assert restored.history == [] and restored.version == 6
+    print("Shared room store passed!")
+
+def test_failed_restore_keeps_stored_state():
+    with tempfile.TemporaryDirectory() as tmp:
+        file_store = FileRoomStore(tmp)
+        sqlite_store = SqliteRoomStore(os.path.join(tmp, "rooms.sqlite3"))
+        for store in (file_store, sqlite_store):
+            rooms = RoomManager(store=store)
+            store.save("room", 3, b"not a record")
+            game, _ = rooms.open("room")
+            # 恢复失败时以新对局打开，但存储中的状态另存下来而不是删除
+            assert game.history == [] and rooms.stats()["failed"] == 1
+            assert not store.exists("room") or store.load("room") != b"not a record"
+        failed = [name for name in os.listdir(tmp) if name.endswith(".failed")]
+        assert len(failed) == 1 and file_store.count() == 0
+        with open(os.path.join(tmp, failed[0]), "rb") as f:
+            assert f.read() == b"not a record"
+        row = sqlite_store._conn.execute("SELECT id, version, data FROM failed_rooms").fetchone()
+        assert row == ("room", 3, b"not a record")
+        sqlite_store.close()
+    print("Failed restore keeps state passed!")
+
+def test_socket_bus_fans_out_across_workers():
+    async def scenario(path):
+        received = {"a": [], "b": [], "c": []}
+        buses = {}
+        for name in received:
+            async def handler(room_id, message, name=name):
+                received[name].append((room_id, message["seq"]))
+            buses[name] = SocketBus(path)
+            await buses[name].start(handler)
+        for bus in buses.values():
+            await asyncio.wait_for(bus.connected.wait(), 5)
+        # 只有一个进程当选中转
+        assert sum(bus.broker is not None for bus in buses.values()) == 1
+        await buses["b"].publish("room", {"type": "update", "seq": 1})
+        await buses["c"].publish("room", {"type": "update", "seq": 2})
+        await asyncio.sleep(0.2)
+        # 不同发送方之间不保证顺序（客户端按 seq 处理）
+        for name in received:
+            assert sorted(received[name]) == [("room", 1), ("room", 2)]
+        # 中转所在的进程退出后，其余进程重新选出中转
+        host = next(name for name, bus in buses.items() if bus.broker is not None)
+        await buses.pop(host).close()
+        rest = list(buses.values())
+        for _ in range(50):
+            if all(bus.connected.is_set() for bus in rest) and any(bus.broker for bus in rest):
+                break
+            await asyncio.sleep(0.1)
+        await rest[0].publish("room", {"type": "update", "seq": 3})
+        await asyncio.sleep(0.2)
+        assert all(received[name][-1] == ("room", 3) for name in buses)
+        for bus in rest:
+            await bus.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, "bus.sock")))
+    print("Socket bus passed!")
+
+def test_socket_bus_survives_bad_messages():
+    async def scenario(path):
+        received = []
+        async def handler(room_id, message):
+            if message.get("fail"):
+                raise RuntimeError("处理函数出错")
+            received.append(message["seq"])
+        listener, sender = SocketBus(path), SocketBus(path)
+        await listener.start(handler)
+        await sender.start(lambda room_id, message: asyncio.sleep(0)) # 发送方本进程的推送不参与检查
+        for bus in (listener, sender):
+            await asyncio.wait_for(bus.connected.wait(), 5)
+        # 格式错误、缺少字段与处理函数抛出的异常都只丢弃那一条消息
+        for line in (b"not json\n", b'{"room": "room"}\n'):
+            sender._writer.write(line)
+        await sender.publish("room", {"fail": True})
+        await sender.publish("room", {"seq": 1})
+        await asyncio.sleep(0.2)
+        assert received == [1] and listener.received == 2
+        assert not listener._task.done()
+        for bus in (listener, sender):
+            await bus.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, "bus.sock")))
+    print("Socket bus bad messages passed!")
+
+if __name__ == "__main__":
+    test_evict_and_rehydrate()
+    test_restore_promotion_and_bitboard()
+    test_sweep_ttl_and_capacity()
+    test_disconnect_drops_empty_rooms()
+    test_shared_store_across_workers()
+    test_failed_restore_keeps_stored_state()
+    test_socket_bus_fans_out_across_workers()
+    test_socket_bus_survives_bad_messages()
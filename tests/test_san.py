@@ -0,0 +1,65 @@
+import os
+import random
+import sys
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.bitboard import BitBoard
+from backend.logic.board import Board
+from backend.logic.constants import PieceType
+from backend.logic.game import Game
+from backend.logic.move import MoveCode
+from backend.logic.notation import NotationHandler
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+def brute_force_others(board, move):
+    """旧做法：为每个同类友方棋子生成全部合法走法，找出同样能到达目标格的棋子"""
+    end_sq = move.end[0] * board.cols + move.end[1]
+    return sorted(p.position for p in board.pieces[move.piece.color]
+                  if p is not move.piece and p.type == move.piece.type
+                  and any(MoveCode.end_sq(c) == end_sq for c in board.get_piece_legal_codes(p.position, p.color)))
+
+def test_reverse_lookup_matches_brute_force():
+    rng = random.Random(5)
+    checked = 0
+    for board_cls in (Board, BitBoard):
+        for _ in range(6):
+            game = Game(board_cls)
+            for _ in range(120):
+                moves = game.board.get_legal_moves(game.turn)
+                if not moves:
+                    break
+                for start in sorted(moves):
+                    for move in moves[start]:
+                        if move.piece.type in (PieceType.PAWN, PieceType.KING):
+                            continue
+                        san = NotationHandler.generate_san(game.board, move)
+                        others = brute_force_others(game.board, move)
+                        prefix = san.rstrip("+#")[1:-2].rstrip("x")
+                        # 有其他候选时必须带消歧，否则不带
+                        assert bool(prefix) == bool(others), (san, others)
+                        checked += 1
+                start = rng.choice(sorted(moves))
+                game.make_move(start, rng.choice(moves[start]).end, "Q")
+    assert checked > 1000
+    print(f"Reverse-lookup disambiguation matched brute force on {checked} moves!")
+
+def test_moves_to_san():
+    sans = Game.moves_to_san(START, ["e2e4", "e7e5", "f1c4", "b8c6", "d1h5", "g8f6", "h5f7"])
+    assert sans == ["e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6", "Qxf7#"]
+    assert Game.moves_to_san("4k3/8/8/8/8/5N2/8/1N2K3 w - - 0 1", ["b1d2"]) == ["Nbd2"]
+    # 被牵制的马不参与消歧
+    assert Game.moves_to_san("k7/4r3/8/8/8/5N2/4N3/4K3 w - - 0 1", ["f3d4"]) == ["Nd4"]
+    assert Game.moves_to_san("8/P6k/8/8/8/8/8/K7 w - - 0 1", ["a7a8n"]) == ["a8=N"]
+    try:
+        Game.moves_to_san(START, ["e2e4", "e7e4"])
+        assert False, "应当拒绝非法走法"
+    except ValueError as e:
+        assert "第 2 步" in str(e)
+    print("Bulk moves -> SAN passed!")
+
+if __name__ == "__main__":
+    test_reverse_lookup_matches_brute_force()
+    test_moves_to_san()
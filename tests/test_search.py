@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.bitboard import BitBoard
+from backend.logic.board import Board
+from backend.logic.constants import GameStatus
+from backend.logic.game import Game
+from backend.logic.perft import move_to_uci, setup
+from backend.logic.search import MATE_BOUND, Searcher, TranspositionTable
+
+def best_uci(fen, board_cls=Board, **budget):
+    board, turn = setup(fen, board_cls)
+    before = board.hash
+    result = Searcher(board).search(turn, **budget)
+    assert board.hash == before # 搜索结束后棋盘恢复原状
+    return move_to_uci(result.code, board.rows, board.cols), result
+
+def test_finds_tactics():
+    for board_cls in (Board, BitBoard):
+        # 一步杀：Qxf7#
+        uci, result = best_uci("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5Q2/PPPP1PPP/RNB1K1NR w KQkq - 0 1", board_cls, max_depth=3)
+        assert uci == "f3f7" and result.score >= MATE_BOUND
+        # 底线杀需要看到两步之后
+        uci, result = best_uci("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", board_cls, max_depth=3)
+        assert uci == "d1d8"
+        # 白吃掉无保护的后
+        uci, _ = best_uci("4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1", board_cls, max_depth=2)
+        assert uci == "d2d5"
+        # 吃子升变
+        uci, _ = best_uci("1r5k/P7/8/8/8/8/8/K7 w - - 0 1", board_cls, max_depth=2)
+        assert uci == "a7b8q"
+    print("Search tactics passed!")
+
+def test_time_budget_and_tt():
+    start = time.perf_counter()
+    _, result = best_uci("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", time_limit=0.3)
+    assert time.perf_counter() - start < 1.0
+    assert result.code is not None and result.depth >= 1
+
+    tt = TranspositionTable(size=64)
+    board, turn = setup("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+    Searcher(board, tt).search(turn, max_depth=3)
+    assert len(tt.slots) == 64
+    print(f"Timed search reached depth {result.depth} with {result.nps} nps")
+
+def test_game_ai_move():
+    game = Game()
+    for _ in range(4):
+        result = game.search_best_move(max_depth=2)
+        success, _ = game.play_code(result.code)
+        assert success
+    assert len(game.history) == 4
+
+    game.load_fen("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1") # 僵局：黑方无子可动
+    assert game.search_best_move(max_depth=2).code is None
+
+    game.load_fen("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+    game.play_code(game.search_best_move(max_depth=3).code)
+    assert game.status == GameStatus.WHITE_WIN
+    print("Game AI moves passed!")
+
+if __name__ == "__main__":
+    test_finds_tactics()
+    test_time_budget_and_tt()
+    test_game_ai_move()
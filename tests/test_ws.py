@@ -0,0 +1,122 @@
+import importlib
+import json
+import os
+import sys
+import tempfile
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+# 应用在导入时按相对路径创建存档目录、索引与房间存储：全部放进临时目录
+WORKDIR = tempfile.TemporaryDirectory()
+
+def run_in_workdir(fn):
+    def wrapper():
+        cwd = os.getcwd()
+        os.chdir(WORKDIR.name)
+        try:
+            app = importlib.import_module("backend.app")
+            with TestClient(app.app) as client:
+                fn(app, client)
+        finally:
+            os.chdir(cwd)
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+@run_in_workdir
+def test_ws_move_round_trip(app, client):
+    with client.websocket_connect("/ws/ws-move") as ws:
+        init = json.loads(ws.receive_text())
+        assert init["type"] == "init" and init["seq"] == 0
+        ws.send_text(json.dumps({"type": "get_moves", "pos": [6, 4]}))
+        moves = json.loads(ws.receive_text())
+        assert sorted(m["end"] for m in moves["moves"]) == [[4, 4], [5, 4]]
+        ws.send_text(json.dumps({"type": "move", "start": [6, 4], "end": [4, 4]}))
+        update = json.loads(ws.receive_text())
+        assert update["type"] == "update" and update["op"] == "move"
+        assert update["seq"] == 1 and update["san"] == "e4"
+        ws.send_text(json.dumps({"type": "undo"}))
+        undo = json.loads(ws.receive_text())
+        assert undo["op"] == "undo" and undo["ply"] == 0
+    print("WebSocket move round trip passed!")
+
+@run_in_workdir
+def test_ws_depth_only_ai_move_is_time_limited(app, client):
+    with client.websocket_connect("/ws/ws-ai") as ws:
+        ws.receive_text()
+        ws.send_text(json.dumps({"type": "ai_move", "depth": 50}))
+        update = json.loads(ws.receive_text())
+        assert update["type"] == "update" and update["ply"] == 1
+        assert update["ai"]["depth"] <= app.AI_MAX_DEPTH
+        assert update["ai"]["time"] <= app.AI_DEFAULT_TIME + 0.5
+    print("Depth-only ai_move time limit passed!")
+
+@run_in_workdir
+def test_indexes_are_not_served(app, client):
+    assert os.path.exists(app.catalog.path)
+    assert client.get("/thumbnails/catalog.sqlite3").status_code == 404
+    assert client.get("/thumbnails/" + os.path.basename(app.positions.path)).status_code == 404
+    print("Indexes not served passed!")
+
+@run_in_workdir
+def test_archive_ids_stay_inside_archive_dir(app, client):
+    with client.websocket_connect("/ws/ws-save") as ws:
+        ws.receive_text()
+        saved = client.post("/archives/save/ws-save", data={"filename": "../escaped"}).json()
+    assert "error" not in saved and not os.path.exists("escaped")
+    assert os.path.exists(os.path.join("saved_games", "escaped", "game.bin"))
+    # %2e%2e 在路由参数中解码为 ".."，不能指向存档目录之外
+    assert client.delete("/archives/%2e%2e").json()[0] == {"error": "未找到对局存档"}
+    assert client.get("/archives/%2e%2e/ply/0").json()[0] == {"error": "未找到存档"}
+    assert os.path.isdir("saved_games") and os.path.isdir("saved_indexes")
+    print("Archive id sanitizing passed!")
+
+@run_in_workdir
+def test_malformed_frames_keep_connection(app, client):
+    with client.websocket_connect("/ws/ws-bad") as ws:
+        ws.receive_text()
+        for frame in ("not json", "[1, 2]", json.dumps({"type": "move", "start": [6, 4]})):
+            ws.send_text(frame)
+            reply = json.loads(ws.receive_text())
+            assert reply["type"] == "error"
+        # 连接仍可用
+        ws.send_text(json.dumps({"type": "move", "start": [6, 4], "end": [4, 4]}))
+        assert json.loads(ws.receive_text())["san"] == "e4"
+    # 断开后不在连接表中，房间可以被逐出
+    assert "ws-bad" not in app.manager.active_connections
+    assert "ws-bad" in app.rooms.sweep(set(app.manager.active_connections), app.rooms.last_active["ws-bad"] + app.rooms.ttl)
+    print("Malformed frames passed!")
+
+@run_in_workdir
+def test_evicted_room_is_reopened(app, client):
+    with client.websocket_connect("/ws/ws-evict") as ws:
+        ws.receive_text()
+        ws.send_text(json.dumps({"type": "move", "start": [6, 4], "end": [4, 4]}))
+        assert json.loads(ws.receive_text())["seq"] == 1
+        # 收到消息前已被逐出：重新打开后照常处理
+        assert app.rooms.evict("ws-evict")
+        ws.send_text(json.dumps({"type": "move", "start": [1, 4], "end": [3, 4]}))
+        update = json.loads(ws.receive_text())
+        assert update["type"] == "update" and update["san"] == "e5" and update["seq"] == 2
+        # 取出对局之后、执行之前被逐出：重做这条消息，而不是当作无效消息
+        stale = app.rooms.get("ws-evict")
+        assert app.rooms.evict("ws-evict")
+        app.rooms.get = lambda room_id: stale
+        try:
+            ws.send_text(json.dumps({"type": "move", "start": [7, 6], "end": [5, 5]}))
+            update = json.loads(ws.receive_text())
+        finally:
+            del app.rooms.get
+        assert update["type"] == "update" and update["san"] == "Nf3" and update["seq"] == 3
+        assert app.rooms.get("ws-evict").version == 3
+    print("Evicted room reopened passed!")
+
+if __name__ == "__main__":
+    test_ws_move_round_trip()
+    test_ws_depth_only_ai_move_is_time_limited()
+    test_indexes_are_not_served()
+    test_archive_ids_stay_inside_archive_dir()
+    test_malformed_frames_keep_connection()
+    test_evicted_room_is_reopened()
@@ -0,0 +1,74 @@
+import os
+import sys
+import random
+
+# 将项目根目录添加到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.logic.game import Game
+from backend.logic.board import Board
+from backend.logic.bitboard import BitBoard
+from backend.logic.constants import GameStatus
+from backend.logic.notation import NotationHandler
+
+def test_incremental_hash_matches_full_recompute():
+    rng = random.Random(11)
+    for board_cls in (Board, BitBoard):
+        game = Game(board_cls)
+        seen: dict[int, str] = {}
+        for _ in range(120):
+            board = game.board
+            assert board.hash == board.zobrist.compute(board, game.turn)
+            # 同一哈希必须对应同一 FEN（不含回合计数）
+            fen = " ".join(game.fen_history[-1].split()[:4])
+            assert seen.setdefault(board.hash, fen) == fen
+            moves = board.get_legal_moves(game.turn)
+            if game.status != GameStatus.ONGOING or not moves:
+                break
+            if game.history and rng.random() < 0.15:
+                game.undo_move()
+                continue
+            start = rng.choice(sorted(moves))
+            game.make_move(start, rng.choice(moves[start]).end, "N")
+    print("Incremental Zobrist hash verified!")
+
+def test_threefold_repetition():
+    game = Game()
+    start_hash = game.board.hash
+    shuffle = [((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6))]
+    for _ in range(2):
+        for start, end in shuffle:
+            assert game.make_move(start, end)[0]
+    assert game.board.hash == start_hash
+    assert game.position_counts[start_hash] == 3
+    assert game.status == GameStatus.DRAW
+    # 撤销后计数回退，对局恢复进行中
+    game.undo_move()
+    assert game.position_counts.get(game.board.hash) == 2
+    assert game.status == GameStatus.ONGOING
+    print("Threefold repetition detected!")
+
+def test_repetition_after_king_moved_with_unmoved_rook():
+    for board_cls in (Board, BitBoard):
+        game = Game(board_cls)
+        game.load_fen("4k3/8/8/8/8/8/8/4K2R w K - 0 1")
+        # 王走过后车未动过也没有易位权：车走开再回来与之前是同一局面
+        for san in ("Kd1", "Kd8", "Ke1", "Ke8", "Kd1", "Kd8", "Rh2", "Ke8", "Rh1"):
+            start, end, _ = NotationHandler.parse_san_to_move(san, game.turn, game.board)
+            assert game.make_move(start, end)[0], san
+        fen = " ".join(game.fen_history[-1].split()[:4])
+        assert fen == "4k3/8/8/8/8/8/8/3K3R b - -"
+        assert sum(" ".join(f.split()[:4]) == fen for f in game.fen_history) == 3
+        assert game.position_counts[game.board.hash] == 3
+        assert game.status == GameStatus.DRAW
+        # 撤销到王回到原位之前，易位权键随之恢复
+        while game.history:
+            game.undo_move()
+        assert game.board.hash == game.board.zobrist.compute(game.board, game.turn)
+        assert game.board.castling_hash != 0
+    print("Repetition with lost castling rights detected!")
+
+if __name__ == "__main__":
+    test_incremental_hash_matches_full_recompute()
+    test_threefold_repetition()
+    test_repetition_after_king_moved_with_unmoved_rook()